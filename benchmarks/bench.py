@@ -0,0 +1,322 @@
+"""Benchmarks de los hot paths del simulador.
+
+Mide operaciones por segundo y memoria según ``tracemalloc`` (bytes que asigna cada operación,
+temporarios incluidos; bytes y bloques que el loop deja retenidos; pico del loop) de los swaps del AMM, las lecturas de oráculos, el lending, el
+ciclo de vida de ``Transaction``, los forks del mundo y de una corrida headless completa de cada
+``simulation/scenario_*``.
+
+    python -m benchmarks.bench --out bench.json
+    python -m benchmarks.bench --compare bench.json --tolerance 0.2
+
+Con ``--compare`` se marca como regresión todo benchmark cuyo ops/s cae más de ``tolerance``
+respecto del baseline, o cuyos bytes asignados por operación (``alloc_bytes_per_op``) crecen más de
+``tolerance`` (y más de ``ALLOC_SLACK`` bytes), y el proceso termina con código 1.
+"""
+import argparse
+import copy
+import fnmatch
+import importlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from defi.amm import AMM
+from defi.fixedpoint import WAD_MATH, to_wad
+from defi.lending import LendingProtocol
+from defi.models import Actor
+from defi.oracle import Oracle, TWAPOracle
+from simulation.clock import BlockScheduler
+from simulation.defenses import TWAPDefense
+from simulation.engine import ScenarioSpec, build_world, run_scenario
+from simulation.transaction import Transaction, TransactionError
+
+SCENARIOS = ("flashloan_attack", "circuit", "slippage", "per_tx_cap", "silent", "twap")
+
+# bytes por operación que puede crecer la memoria asignada sin contar como regresión (ruido de
+# cachés internas de Python que se llenan una vez)
+ALLOC_SLACK = 64.0
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registra una fábrica que arma el estado y devuelve la operación a medir."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("amm.swap")
+def _amm_swap():
+    amm = AMM(10_000.0, 10_000.0)
+    def op():
+        amm.swap_a_for_b(amm.swap_b_for_a(10.0))
+    return op
+
+
+@benchmark("amm.swap_fixed")
+def _amm_swap_fixed():
+    amm = AMM(to_wad(10_000.0), to_wad(10_000.0), to_wad(0.003), WAD_MATH)
+    amount = to_wad(10.0)
+    def op():
+        amm.swap_a_for_b(amm.swap_b_for_a(amount))
+    return op
+
+
+@benchmark("amm.quote")
+def _amm_quote():
+    amm = AMM(10_000.0, 10_000.0)
+    return lambda: amm.quote_b_for_a(10.0)
+
+
+@benchmark("oracle.spot")
+def _oracle_spot():
+    oracle = Oracle(AMM(10_000.0, 10_000.0))
+    return oracle.price_a_in_b
+
+
+@benchmark("oracle.twap")
+def _oracle_twap():
+    amm = AMM(10_000.0, 10_000.0)
+    scheduler = BlockScheduler(block_time=1.0)
+    oracle = TWAPOracle(amm, scheduler.clock, window_seconds=300, history_seconds=300)
+    scheduler.subscribe(oracle.on_block)
+    scheduler.advance(300)
+    def op():
+        amm.swap_b_for_a(1.0)
+        scheduler.advance(1)
+        oracle.price_a_in_b()
+    return op
+
+
+@benchmark("lending.max_borrowable_b")
+def _lending_max_borrowable():
+    protocol = LendingProtocol(Oracle(AMM(10_000.0, 10_000.0)))
+    protocol.deposit_collateral_a(1_000.0)
+    return protocol.max_borrowable_b
+
+
+@benchmark("lending.borrow_b")
+def _lending_borrow():
+    protocol = LendingProtocol(Oracle(AMM(10_000.0, 10_000.0)))
+    protocol.deposit_collateral_a(1e15)
+    return lambda: protocol.borrow_b(1e-3)
+
+
+def _tx_world():
+    amm = AMM(10_000.0, 10_000.0)
+    protocol = LendingProtocol(Oracle(amm))
+    return amm, protocol, Actor(a=1_000.0, b=1_000.0)
+
+
+@benchmark("transaction.commit")
+def _tx_commit():
+    amm, protocol, attacker = _tx_world()
+    def op():
+        with Transaction([attacker, amm, protocol]):
+            attacker.b -= 1.0
+            attacker.a += amm.swap_b_for_a(1.0)
+    return op
+
+
+@benchmark("transaction.commit_deepcopy")
+def _tx_commit_deepcopy():
+    amm, protocol, attacker = _tx_world()
+    def op():
+        with Transaction([attacker, amm, protocol], snapshot="deepcopy"):
+            attacker.b -= 1.0
+            attacker.a += amm.swap_b_for_a(1.0)
+    return op
+
+
+@benchmark("transaction.rollback")
+def _tx_rollback():
+    amm, protocol, attacker = _tx_world()
+    def op():
+        try:
+            with Transaction([attacker, amm, protocol], post_check=lambda: False):
+                attacker.b -= 1.0
+                attacker.a += amm.swap_b_for_a(1.0)
+        except TransactionError:
+            pass
+    return op
+
+
+def _fork_world():
+    world = build_world(TWAPDefense())
+    for _ in range(1_000):
+        world.clock.advance(1.0)
+        world.amm.swap_b_for_a(1.0)
+    return world
+
+
+@benchmark("world.fork")
+def _world_fork():
+    return _fork_world().fork
+
+
+@benchmark("world.deepcopy")
+def _world_deepcopy():
+    world = _fork_world()
+    return lambda: copy.deepcopy(world)
+
+
+def _scenario_bench(module_name):
+    def setup():
+        spec = importlib.import_module(f"simulation.scenario_{module_name}").SPEC
+        return lambda: run_scenario(spec)
+    return setup
+
+
+for _name in SCENARIOS:
+    BENCHMARKS[f"scenario.{_name}"] = _scenario_bench(_name)
+
+
+@benchmark("scenario.fixed_point")
+def _scenario_fixed_point():
+    spec = ScenarioSpec("fixed_point", backend="fixed")
+    return lambda: run_scenario(spec)
+
+
+def measure(op, min_time: float = 0.2, repeat: int = 3) -> dict:
+    # calibración al estilo timeit.autorange: número de iteraciones que tarda >= min_time
+    number = 1
+    while True:
+        t = _time(op, number)
+        if t >= min_time:
+            break
+        number *= 2 if t <= 0 else max(2, min(10, int(min_time / t) + 1))
+    best = min([t] + [_time(op, number) for _ in range(repeat - 1)])
+    alloc_bytes, retained_bytes, retained_blocks, peak = _allocations(op, number)
+    return {
+        "ops_per_sec": number / best,
+        "usec_per_op": best / number * 1e6,
+        "peak_bytes": peak,
+        "alloc_bytes_per_op": alloc_bytes,
+        "retained_bytes_per_op": retained_bytes / number,
+        "retained_blocks_per_op": retained_blocks / number,
+        "iterations": number,
+    }
+
+
+def _allocations(op, number):
+    # bytes que asigna una operación: el pico de memoria trazada durante la llamada por encima de
+    # la que había antes (los temporarios cuentan aunque se liberen al volver), promediado sobre
+    # ``samples`` llamadas y descontando lo que mide una llamada vacía. Lo retenido es lo que el
+    # loop deja asignado sin forzar gc.collect(): la basura cíclica que espera al recolector cuenta
+    samples = min(number, 1_000)
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            op()
+        per_op = _peak_per_call(op, samples) - _peak_per_call(_noop, samples)
+        blocks = sys.getallocatedblocks()
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(number):
+            op()
+        end, peak = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        tracemalloc.stop()
+    return max(per_op, 0.0), end - start, blocks, peak - start
+
+
+def _peak_per_call(op, samples):
+    total = 0
+    for _ in range(samples):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        op()
+        total += tracemalloc.get_traced_memory()[1] - before
+    return total / samples
+
+
+def _noop():
+    pass
+
+
+def _time(op, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        op()
+    return time.perf_counter() - start
+
+
+def run(pattern: str = "*", min_time: float = 0.2) -> dict:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if fnmatch.fnmatch(name, pattern):
+            results[name] = measure(setup(), min_time=min_time)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """``(benchmark, métrica, razón contra el baseline)`` de cada regresión: ops/s que cayó más de
+    ``tolerance`` (fracción) o bytes asignados por operación que crecieron más de ``tolerance`` y
+    de ``ALLOC_SLACK``."""
+    regressions = []
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = stats["ops_per_sec"] / base["ops_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions.append((name, "ops_per_sec", ratio))
+        # los baselines sin ``retained_bytes_per_op`` son anteriores a esta métrica (su
+        # ``alloc_bytes_per_op`` era lo retenido) y no se comparan
+        old = base.get("alloc_bytes_per_op") if "retained_bytes_per_op" in base else None
+        new = stats["alloc_bytes_per_op"]
+        if old is not None and new > max(old, 0.0) * (1 + tolerance) + ALLOC_SLACK:
+            regressions.append((name, "alloc_bytes_per_op", new / old if old > 0 else float("inf")))
+    return regressions
+
+
+def format_table(report: dict, baseline: dict = None) -> str:
+    lines = [f"{'benchmark':32} {'ops/s':>12} {'us/op':>10} {'peak KiB':>10} {'bytes/op':>10} "
+             f"{'kept B/op':>10} {'vs base':>8}"]
+    for name, s in report["results"].items():
+        vs = ""
+        if baseline and name in baseline["results"]:
+            vs = f"{s['ops_per_sec'] / baseline['results'][name]['ops_per_sec']:.2f}x"
+        lines.append(f"{name:32} {s['ops_per_sec']:12.0f} {s['usec_per_op']:10.2f} "
+                     f"{s['peak_bytes'] / 1024:10.1f} {s['alloc_bytes_per_op']:10.1f} "
+                     f"{s['retained_bytes_per_op']:10.1f} {vs:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del simulador de flash loans")
+    parser.add_argument("--out", help="guardar los resultados en este JSON")
+    parser.add_argument("--compare", help="JSON de baseline contra el cual comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="caída de ops/s tolerada (fracción)")
+    parser.add_argument("--filter", default="*", help="patrón glob de benchmarks a correr")
+    parser.add_argument("--min-time", type=float, default=0.2, help="segundos mínimos por medición")
+    args = parser.parse_args(argv)
+
+    report = run(args.filter, args.min_time)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_table(report, baseline))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, ratio in regressions:
+            print(f"REGRESIÓN {name} ({metric}): {ratio:.2f}x del baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,128 @@
-"""AMM: implementación de un AMM constante x*y=k con fee."""
+"""AMM: implementación de un AMM constante x*y=k con fee.
+
+Los montos, las reservas y la fee están en las unidades del backend ``num`` (``defi.fixedpoint``):
+floats con ``FLOAT`` o enteros WAD con ``WAD_MATH``, que redondea los swaps a favor del pool.
+"""
+import math
+
+from defi.events import Listeners
+from defi.fixedpoint import FLOAT
+
+
 class AMM:
-    def __init__(self, reserve_a: float, reserve_b: float, fee: float = 0.003):
-        self.a = float(reserve_a)
-        self.b = float(reserve_b)
-        self.fee = float(fee)
+    def __init__(self, reserve_a: float, reserve_b: float, fee: float = 0.003, num=FLOAT):
+        self.num = num
+        self.a = num.unit(reserve_a)
+        self.b = num.unit(reserve_b)
+        self.fee = num.unit(fee)
+        # callbacks(amm) tras cada cambio de reservas (oráculos, TWAP, breakers)
+        self.listeners = Listeners()
     def price_a_in_b(self) -> float:
-        return self.b / self.a
+        return self.num.div(self.b, self.a)
     def swap_a_for_b(self, dx: float) -> float:
         assert dx > 0, "dx must be positive"
-        dx_net = dx * (1 - self.fee)
+        dx_net = self.num.net(dx, self.fee)
         k = self.a * self.b
         new_a = self.a + dx_net
-        new_b = k / new_a
+        new_b = self.num.reserve_out(k, new_a)
         dy = self.b - new_b
         self.a = new_a
         self.b = new_b
+        self.listeners.notify(self)
         return dy
     def swap_b_for_a(self, dy_in: float) -> float:
         assert dy_in > 0, "dy_in must be positive"
-        dy_net = dy_in * (1 - self.fee)
+        dy_net = self.num.net(dy_in, self.fee)
         k = self.a * self.b
         new_b = self.b + dy_net
-        new_a = k / new_b
+        new_a = self.num.reserve_out(k, new_b)
         dx = self.a - new_a
         self.a = new_a
         self.b = new_b
+        self.listeners.notify(self)
         return dx
+    def add_liquidity(self, amount_a: float, amount_b: float):
+        """Suma ``amount_a``/``amount_b`` a las reservas (mueve el precio si no son proporcionales)."""
+        assert amount_a >= 0 and amount_b >= 0, "amounts must be non-negative"
+        self.a += amount_a
+        self.b += amount_b
+        self.listeners.notify(self)
+    def remove_liquidity(self, amount_a: float, amount_b: float):
+        assert 0 <= amount_a < self.a and 0 <= amount_b < self.b, "Not enough liquidity in AMM"
+        self.a -= amount_a
+        self.b -= amount_b
+        self.listeners.notify(self)
+
+    # --- Cotizaciones puras: fórmulas cerradas, no mutan ni snapshotean el pool ---
+    def quote_a_for_b(self, dx: float) -> float:
+        """B que devolvería ``swap_a_for_b(dx)``."""
+        assert dx > 0, "dx must be positive"
+        new_a = self.a + self.num.net(dx, self.fee)
+        return self.b - self.num.reserve_out(self.a * self.b, new_a)
+    def quote_b_for_a(self, dy_in: float) -> float:
+        """A que devolvería ``swap_b_for_a(dy_in)``."""
+        assert dy_in > 0, "dy_in must be positive"
+        new_b = self.b + self.num.net(dy_in, self.fee)
+        return self.a - self.num.reserve_out(self.a * self.b, new_b)
+
+    def amount_in_a_for_b(self, dy_out: float) -> float:
+        """A a entregar para recibir ``dy_out`` de B (en WAD, el mínimo con el que el swap lo entrega)."""
+        assert 0 < dy_out < self.b, "dy_out must be in (0, reserve B)"
+        new_a = self.num.reserve_in(self.a * self.b, self.b - dy_out)
+        return self.num.gross(new_a - self.a, self.fee)
+    def amount_in_b_for_a(self, dx_out: float) -> float:
+        """B a entregar para recibir ``dx_out`` de A (en WAD, el mínimo con el que el swap lo entrega)."""
+        assert 0 < dx_out < self.a, "dx_out must be in (0, reserve A)"
+        new_b = self.num.reserve_in(self.a * self.b, self.a - dx_out)
+        return self.num.gross(new_b - self.b, self.fee)
+    def price_after_a_for_b(self, dx: float) -> float:
+        """``price_a_in_b()`` tras ``swap_a_for_b(dx)``."""
+        new_a = self.a + self.num.net(dx, self.fee)
+        return self.num.div(self.num.reserve_out(self.a * self.b, new_a), new_a)
+    def price_after_b_for_a(self, dy_in: float) -> float:
+        """``price_a_in_b()`` tras ``swap_b_for_a(dy_in)``."""
+        new_b = self.b + self.num.net(dy_in, self.fee)
+        return self.num.div(new_b, self.num.reserve_out(self.a * self.b, new_b))
+
+    # el price impact es una razón: se calcula en float en los dos backends
+    def price_impact_a_for_b(self, dx: float) -> float:
+        """Cambio relativo |p' - p| / p del precio spot tras vender ``dx`` de A."""
+        a, b, fee = self._floats()
+        ratio = a / (a + self.num.to_float(dx) * (1 - fee))
+        return 1 - ratio * ratio
+    def price_impact_b_for_a(self, dy_in: float) -> float:
+        a, b, fee = self._floats()
+        ratio = (b + self.num.to_float(dy_in) * (1 - fee)) / b
+        return ratio * ratio - 1
+    def max_a_in_for_impact(self, max_impact: float) -> float:
+        """Mayor ``dx`` de A cuyo price impact no supera ``max_impact`` (``num.unbounded`` si
+        max_impact >= 1)."""
+        assert max_impact >= 0, "max_impact must be non-negative"
+        if max_impact >= 1:
+            return self.num.unbounded
+        a, b, fee = self._floats()
+        dx = self.num.amount(a * (1 / math.sqrt(1 - max_impact) - 1) / (1 - fee))
+        return self._within_impact(self.price_impact_a_for_b, dx, max_impact)
+    def max_b_in_for_impact(self, max_impact: float) -> float:
+        """Mayor ``dy_in`` de B cuyo price impact no supera ``max_impact``."""
+        assert max_impact >= 0, "max_impact must be non-negative"
+        a, b, fee = self._floats()
+        dy_in = self.num.amount(b * (math.sqrt(1 + max_impact) - 1) / (1 - fee))
+        return self._within_impact(self.price_impact_b_for_a, dy_in, max_impact)
+
+    def _within_impact(self, impact, amount, max_impact):
+        # la fórmula cerrada puede pasarse por unos ulps (o un wei) y una SlippageDefense con el
+        # mismo límite rechazaría el monto: se achica con pasos que se duplican hasta respetarlo
+        step = 1 if isinstance(amount, int) else math.ulp(amount)
+        while amount > 0 and impact(amount) > max_impact:
+            amount = max(amount - step, self.num.zero)
+            step *= 2
+        return amount
+
+    def _floats(self):
+        f = self.num.to_float
+        return f(self.a), f(self.b), f(self.fee)
+
+    def _tx_restored(self):
+        # un rollback reescribió las reservas sin pasar por los swaps: se avisa a los suscriptores
+        self.listeners.notify(self)
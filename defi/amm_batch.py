@@ -0,0 +1,84 @@
+"""AMM vectorizado: N pools x*y=k independientes con reservas y fees en arrays de NumPy.
+
+Usa exactamente las mismas fórmulas (y el mismo orden de operaciones) que ``defi.amm.AMM``,
+así que cada elemento coincide con el AMM escalar equivalente.
+"""
+import numpy as np
+
+from defi.amm import AMM
+
+
+def amount_out(reserve_in, reserve_out, fee, amount_in):
+    """Salida de un swap sobre reservas (in, out) sin mutar nada; admite broadcasting."""
+    amount_net = amount_in * (1 - fee)
+    k = reserve_in * reserve_out
+    new_in = reserve_in + amount_net
+    return reserve_out - k / new_in
+
+
+class BatchAMM:
+    def __init__(self, reserve_a, reserve_b, fee=0.003):
+        self.a = np.array(reserve_a, dtype=np.float64, ndmin=1)
+        self.b = np.array(reserve_b, dtype=np.float64, ndmin=1)
+        self.a, self.b = np.broadcast_arrays(self.a, self.b)
+        self.a = self.a.copy()
+        self.b = self.b.copy()
+        self.fee = np.broadcast_to(np.asarray(fee, dtype=np.float64), self.a.shape).copy()
+
+    @classmethod
+    def from_amms(cls, amms):
+        amms = list(amms)
+        return cls([p.a for p in amms], [p.b for p in amms], [p.fee for p in amms])
+
+    @classmethod
+    def replicate(cls, amm, n: int):
+        """N copias independientes del mismo pool (p. ej. para barrer tamaños de trade)."""
+        return cls(np.full(n, amm.a), np.full(n, amm.b), amm.fee)
+
+    def __len__(self):
+        return self.a.shape[0]
+
+    def to_amm(self, i: int) -> AMM:
+        return AMM(self.a[i], self.b[i], self.fee[i])
+
+    def price_a_in_b(self):
+        return self.b / self.a
+
+    # --- cotizaciones puras (no mutan el estado) ---
+    def quote_a_for_b(self, dx):
+        """B recibido por ``dx`` de A en cada pool; ``dx[:, None]`` da la grilla tamaños x pools."""
+        return amount_out(self.a, self.b, self.fee, np.asarray(dx, dtype=np.float64))
+
+    def quote_b_for_a(self, dy_in):
+        return amount_out(self.b, self.a, self.fee, np.asarray(dy_in, dtype=np.float64))
+
+    # --- swaps (mutan las reservas de los pools seleccionados) ---
+    def swap_a_for_b(self, dx, where=None):
+        """Swap A->B en todos los pools (o solo en ``where``); devuelve el B recibido por pool."""
+        dx = np.broadcast_to(np.asarray(dx, dtype=np.float64), self.a.shape)
+        mask = self._mask(dx, where)
+        dx_net = dx * (1 - self.fee)
+        k = self.a * self.b
+        new_a = self.a + dx_net
+        new_b = k / new_a
+        dy = np.where(mask, self.b - new_b, 0.0)
+        np.copyto(self.a, new_a, where=mask)
+        np.copyto(self.b, new_b, where=mask)
+        return dy
+
+    def swap_b_for_a(self, dy_in, where=None):
+        dy_in = np.broadcast_to(np.asarray(dy_in, dtype=np.float64), self.a.shape)
+        mask = self._mask(dy_in, where)
+        dy_net = dy_in * (1 - self.fee)
+        k = self.a * self.b
+        new_b = self.b + dy_net
+        new_a = k / new_b
+        dx = np.where(mask, self.a - new_a, 0.0)
+        np.copyto(self.a, new_a, where=mask)
+        np.copyto(self.b, new_b, where=mask)
+        return dx
+
+    def _mask(self, amount, where):
+        mask = np.ones(self.a.shape, dtype=bool) if where is None else np.broadcast_to(where, self.a.shape)
+        assert np.all(amount[mask] > 0), "amounts must be positive"
+        return mask
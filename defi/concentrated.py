@@ -0,0 +1,252 @@
+"""AMM de liquidez concentrada (estilo Uniswap v3) con la misma interfaz que ``defi.amm.AMM``.
+
+La liquidez se aporta en rangos de ticks (el precio del tick ``i`` es ``1.0001 ** i`` B por A).
+Dentro de un tramo sin ticks inicializados el pool se comporta como x*y=k con liquidez ``L``
+constante y se resuelve en forma cerrada sobre ``sqrt(precio)``; los ticks inicializados se
+guardan ordenados, así que un swap salta con búsqueda binaria al próximo tick activo en lugar
+de recorrer los ticks uno por uno.
+
+``a`` y ``b`` son los saldos de cada token en el pool (los ve el resto del simulador igual que
+las reservas del AMM full-range). La fee se descuenta del monto de entrada antes de mover el
+precio y, a diferencia de ``AMM`` (cuyas reservas solo suman la entrada neta), queda en el saldo
+del pool sin sumarse a la liquidez. El precio nunca sale de ``[MIN_TICK, MAX_TICK]``: un swap
+que agota la liquidez disponible se rechaza.
+"""
+import math
+from bisect import bisect_right
+
+from defi.events import Listeners
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+_LOG_BASE = math.log(1.0001)
+
+
+def sqrt_price_at(tick: int) -> float:
+    return math.exp(tick * _LOG_BASE / 2)
+
+
+def tick_at(price: float) -> int:
+    """Mayor tick cuyo precio no supera ``price``."""
+    return math.floor(math.log(price) / _LOG_BASE)
+
+
+# sqrt(precio) en los extremos del rango de ticks: un swap no mueve el precio más allá
+_SQRT_PRICE_BOUNDS = (sqrt_price_at(MIN_TICK), sqrt_price_at(MAX_TICK))
+
+
+class ConcentratedAMM:
+    # mint reemplaza estas estructuras en lugar de mutarlas: los forks del mundo las comparten
+    _fork_shared = ("ticks", "tick_sqrt_prices", "liquidity_net")
+
+    def __init__(self, price: float, fee: float = 0.003):
+        assert price > 0, "price must be positive"
+        self.fee = float(fee)
+        self.sqrt_price = math.sqrt(price)
+        self.tick = tick_at(price)
+        self.liquidity = 0.0
+        self.a = 0.0
+        self.b = 0.0
+        # ticks inicializados (ordenados) y liquidez neta que se suma al cruzarlos hacia arriba;
+        # mint los reemplaza en lugar de mutarlos, así Transaction puede revertirlos
+        self.ticks = []
+        self.tick_sqrt_prices = []  # sqrt_price_at(t) de cada tick de ``ticks``
+        self.liquidity_net = {}
+        self.listeners = Listeners()
+
+    @classmethod
+    def from_reserves(cls, reserve_a: float, reserve_b: float, fee: float = 0.003, width: int = None):
+        """Pool al precio ``reserve_b / reserve_a`` con una posición simétrica de ``width`` ticks
+        a cada lado (full-range si es None) que usa como máximo esas reservas."""
+        price = reserve_b / reserve_a
+        pool = cls(price, fee)
+        if width is None:
+            lower, upper = MIN_TICK, MAX_TICK
+        else:
+            lower, upper = pool.tick - width + 1, pool.tick + width
+        sp, sp_lower, sp_upper = pool.sqrt_price, sqrt_price_at(lower), sqrt_price_at(upper)
+        liquidity = min(reserve_a / (1 / sp - 1 / sp_upper), reserve_b / (sp - sp_lower))
+        pool.mint(lower, upper, liquidity)
+        return pool
+
+    # --- posiciones ---
+    def mint(self, tick_lower: int, tick_upper: int, liquidity: float):
+        """Agrega ``liquidity`` en [tick_lower, tick_upper); devuelve los montos (A, B) aportados."""
+        assert MIN_TICK <= tick_lower < tick_upper <= MAX_TICK, "invalid tick range"
+        assert liquidity > 0, "liquidity must be positive"
+        sp, sp_lower, sp_upper = self.sqrt_price, sqrt_price_at(tick_lower), sqrt_price_at(tick_upper)
+        if self.tick < tick_lower:
+            amount_a, amount_b = liquidity * (1 / sp_lower - 1 / sp_upper), 0.0
+        elif self.tick < tick_upper:
+            amount_a = liquidity * (1 / sp - 1 / sp_upper)
+            amount_b = liquidity * (sp - sp_lower)
+            self.liquidity += liquidity
+        else:
+            amount_a, amount_b = 0.0, liquidity * (sp_upper - sp_lower)
+        ticks, sqrt_prices, net = list(self.ticks), list(self.tick_sqrt_prices), dict(self.liquidity_net)
+        for tick, delta in ((tick_lower, liquidity), (tick_upper, -liquidity)):
+            if tick not in net:
+                i = bisect_right(ticks, tick)
+                ticks.insert(i, tick)
+                sqrt_prices.insert(i, sqrt_price_at(tick))
+                net[tick] = 0.0
+            net[tick] += delta
+        self.ticks, self.tick_sqrt_prices, self.liquidity_net = ticks, sqrt_prices, net
+        self.a += amount_a
+        self.b += amount_b
+        self.listeners.notify(self)
+        return amount_a, amount_b
+
+    # --- interfaz de AMM ---
+    def price_a_in_b(self) -> float:
+        return self.sqrt_price * self.sqrt_price
+
+    def swap_a_for_b(self, dx: float) -> float:
+        assert dx > 0, "dx must be positive"
+        used, dy, sqrt_price, liquidity, tick = self._walk(True, dx * (1 - self.fee))
+        assert used >= dx * (1 - self.fee) * (1 - 1e-12), "insufficient liquidity"
+        self.sqrt_price, self.liquidity, self.tick = sqrt_price, liquidity, tick
+        self.a += dx
+        self.b -= dy
+        self.listeners.notify(self)
+        return dy
+
+    def swap_b_for_a(self, dy_in: float) -> float:
+        assert dy_in > 0, "dy_in must be positive"
+        used, dx, sqrt_price, liquidity, tick = self._walk(False, dy_in * (1 - self.fee))
+        assert used >= dy_in * (1 - self.fee) * (1 - 1e-12), "insufficient liquidity"
+        self.sqrt_price, self.liquidity, self.tick = sqrt_price, liquidity, tick
+        self.b += dy_in
+        self.a -= dx
+        self.listeners.notify(self)
+        return dx
+
+    # --- Cotizaciones puras: recorren los ticks sin mutar el pool ---
+    def quote_a_for_b(self, dx: float) -> float:
+        """B que devolvería ``swap_a_for_b(dx)``."""
+        assert dx > 0, "dx must be positive"
+        used, dy, *_ = self._walk(True, dx * (1 - self.fee))
+        assert used >= dx * (1 - self.fee) * (1 - 1e-12), "insufficient liquidity"
+        return dy
+    def quote_b_for_a(self, dy_in: float) -> float:
+        """A que devolvería ``swap_b_for_a(dy_in)``."""
+        assert dy_in > 0, "dy_in must be positive"
+        used, dx, *_ = self._walk(False, dy_in * (1 - self.fee))
+        assert used >= dy_in * (1 - self.fee) * (1 - 1e-12), "insufficient liquidity"
+        return dx
+    def amount_in_a_for_b(self, dy_out: float) -> float:
+        """A a entregar para recibir exactamente ``dy_out`` de B."""
+        assert 0 < dy_out < self.b, "dy_out must be in (0, reserve B)"
+        used, out, *_ = self._walk(True, dy_out, exact_out=True)
+        assert out >= dy_out * (1 - 1e-12), "insufficient liquidity"
+        return used / (1 - self.fee)
+    def amount_in_b_for_a(self, dx_out: float) -> float:
+        """B a entregar para recibir exactamente ``dx_out`` de A."""
+        assert 0 < dx_out < self.a, "dx_out must be in (0, reserve A)"
+        used, out, *_ = self._walk(False, dx_out, exact_out=True)
+        assert out >= dx_out * (1 - 1e-12), "insufficient liquidity"
+        return used / (1 - self.fee)
+    def price_after_a_for_b(self, dx: float) -> float:
+        sp = self._walk(True, dx * (1 - self.fee))[2]
+        return sp * sp
+    def price_after_b_for_a(self, dy_in: float) -> float:
+        sp = self._walk(False, dy_in * (1 - self.fee))[2]
+        return sp * sp
+    def price_impact_a_for_b(self, dx: float) -> float:
+        """Cambio relativo |p' - p| / p del precio spot tras vender ``dx`` de A."""
+        return 1 - self.price_after_a_for_b(dx) / self.price_a_in_b()
+    def price_impact_b_for_a(self, dy_in: float) -> float:
+        return self.price_after_b_for_a(dy_in) / self.price_a_in_b() - 1
+    def max_a_in_for_impact(self, max_impact: float) -> float:
+        """Mayor ``dx`` de A cuyo price impact no supera ``max_impact`` (inf si max_impact >= 1)."""
+        assert max_impact >= 0, "max_impact must be non-negative"
+        if max_impact >= 1:
+            return math.inf
+        limit = self.sqrt_price * math.sqrt(1 - max_impact)
+        return self._walk(True, math.inf, sqrt_limit=limit)[0] / (1 - self.fee)
+    def max_b_in_for_impact(self, max_impact: float) -> float:
+        """Mayor ``dy_in`` de B cuyo price impact no supera ``max_impact``."""
+        assert max_impact >= 0, "max_impact must be non-negative"
+        limit = self.sqrt_price * math.sqrt(1 + max_impact)
+        return self._walk(False, math.inf, sqrt_limit=limit)[0] / (1 - self.fee)
+
+    def _walk(self, a_in: bool, amount: float, exact_out: bool = False, sqrt_limit: float = None):
+        """Recorre los tramos de liquidez desde el precio actual.
+
+        ``amount`` es la entrada neta de fee (o la salida, con ``exact_out``). Devuelve
+        ``(entrada neta usada, salida, sqrt_price, liquidity, tick)`` al terminar; si se acaba la
+        liquidez, se llega a ``sqrt_limit`` o al precio de ``MIN_TICK``/``MAX_TICK``, la entrada
+        usada es menor que la pedida.
+        """
+        sp, liquidity, tick = self.sqrt_price, self.liquidity, self.tick
+        ticks, sqrt_prices, net = self.ticks, self.tick_sqrt_prices, self.liquidity_net
+        remaining, used, out = amount, 0.0, 0.0
+        # a_in: el precio baja y se cruzan ticks <= tick; si no, sube y se cruzan ticks > tick
+        idx = bisect_right(ticks, tick) - 1 if a_in else bisect_right(ticks, tick)
+        while remaining > 0:
+            boundary = ticks[idx] if 0 <= idx < len(ticks) else None
+            target = sqrt_prices[idx] if boundary is not None else _SQRT_PRICE_BOUNDS[not a_in]
+            limited = sqrt_limit is not None and (sqrt_limit > target if a_in else sqrt_limit < target)
+            if limited:
+                target = sqrt_limit
+            if liquidity > 0:
+                if a_in:
+                    max_in = liquidity * (1 / target - 1 / sp)
+                    max_out = liquidity * (sp - target)
+                else:
+                    max_in = liquidity * (target - sp)
+                    max_out = liquidity * (1 / sp - 1 / target)
+                if remaining < (max_out if exact_out else max_in):
+                    if a_in and exact_out:
+                        new_sp = sp - remaining / liquidity
+                        step_in, step_out = liquidity * (1 / new_sp - 1 / sp), remaining
+                    elif a_in:
+                        new_sp = liquidity * sp / (liquidity + remaining * sp)
+                        step_in, step_out = remaining, liquidity * (sp - new_sp)
+                    elif exact_out:
+                        new_sp = 1 / (1 / sp - remaining / liquidity)
+                        step_in, step_out = liquidity * (new_sp - sp), remaining
+                    else:
+                        new_sp = sp + remaining / liquidity
+                        step_in, step_out = remaining, liquidity * (1 / sp - 1 / new_sp)
+                    used, out, sp = used + step_in, out + step_out, new_sp
+                    break
+                used, out = used + max_in, out + max_out
+                remaining -= max_out if exact_out else max_in
+            if limited:
+                sp = target
+                break
+            if boundary is None:
+                break
+            # cruza el tick: la liquidez de las posiciones que empiezan/terminan ahí entra o sale
+            sp = target
+            if a_in:
+                liquidity -= net[boundary]
+                tick = boundary - 1
+                idx -= 1
+            else:
+                liquidity += net[boundary]
+                tick = boundary
+                idx += 1
+            # fuera del último tick inicializado no queda ninguna posición: el residuo de redondeo
+            # de sumar y restar la liquidez neta no puede seguir moviendo el precio
+            if not 0 <= idx < len(ticks) or liquidity <= 1e-12 * abs(net[boundary]):
+                liquidity = 0.0
+        if 0 < sp < math.inf:
+            # tick del precio final, acotado entre el último tick cruzado y el próximo sin cruzar
+            # (el redondeo de log() no puede dejar el tick del lado equivocado de un cruce)
+            final = tick_at(sp * sp)
+            if a_in:
+                final = min(final, tick)
+                if idx >= 0:
+                    final = max(final, ticks[idx])
+            else:
+                final = max(final, tick)
+                if idx < len(ticks):
+                    final = min(final, ticks[idx] - 1)
+            tick = min(max(final, MIN_TICK), MAX_TICK)
+        return used, out, sp, liquidity, tick
+
+    def _tx_restored(self):
+        # un rollback reescribió el estado sin pasar por los swaps: se avisa a los suscriptores
+        self.listeners.notify(self)
@@ -0,0 +1,35 @@
+"""Pub-sub mínimo entre componentes: el AMM publica cada cambio de reservas y los oráculos y
+breakers suscritos actualizan sus precios cacheados en el momento, en lugar de consultar el
+spot en cada lectura.
+"""
+from copy import deepcopy
+
+# marca para el memo de ``deepcopy`` de los snapshots de Transaction: ahí los suscriptores no son
+# parte del estado del componente y la copia conserva la misma lista
+KEEP_SUBSCRIBERS = object()
+
+
+def snapshot_memo() -> dict:
+    """Memo para ``deepcopy`` que deja los ``Listeners`` sin copiar."""
+    return {KEEP_SUBSCRIBERS: True}
+
+
+class Listeners(list):
+    """Callbacks suscritos a un componente, llamados en orden de suscripción.
+
+    ``deepcopy`` copia a los suscriptores junto con el componente (un método ligado queda
+    ligado a la copia de su objeto), así que un AMM o un mundo copiado publica solo a sus
+    propios oráculos y breakers, como ``simulation.fork``. Con ``snapshot_memo()`` la copia
+    devuelve la misma lista.
+    """
+    def notify(self, *args):
+        for listener in self:
+            listener(*args)
+
+    def __deepcopy__(self, memo):
+        if KEEP_SUBSCRIBERS in memo:
+            return self
+        new = Listeners()
+        memo[id(self)] = new
+        new.extend(deepcopy(listener, memo) for listener in self)
+        return new
@@ -0,0 +1,158 @@
+"""Backends numéricos de los componentes: floats o punto fijo con 18 decimales (WAD).
+
+``AMM``, ``FlashLoanPool`` y ``LendingProtocol`` (y sus variantes con defensas) reciben
+``num=FLOAT`` (por defecto) o ``num=WAD_MATH`` y hacen toda su aritmética a través de él:
+
+- ``FLOAT``: montos ``float`` con las fórmulas de siempre (mismo resultado bit a bit);
+- ``WAD_MATH``: montos ``int`` de Python escalados por ``WAD = 10**18``, como los ``uint256`` de un
+  contrato. Cada multiplicación o división indica hacia dónde redondea, siempre a favor del
+  protocolo (el pool entrega de menos, la deuda y las fees se cobran de más), así que las
+  comparaciones son exactas y no hacen falta las tolerancias del backend float.
+
+Los precios que llegan de oráculos que promedian (TWAP, mediana) pueden no ser enteros; el lending
+los lleva al backend con ``num.unit`` (en WAD, truncando: el colateral se valúa de menos).
+Las cotizaciones del AMM usan las mismas operaciones enteras que los swaps: las salidas y los
+precios tras un swap redondean hacia abajo y los montos de entrada para una salida exacta hacia
+arriba (entregarlos alcanza para recibirla). El price impact es una razón y se calcula en float; los
+montos máximos por impact se redondean al WAD más cercano y se achican hasta respetar la cota.
+
+Los caminos ``*_many`` operan sobre arrays de NumPy de dtype ``object`` (enteros de Python sin
+límite: un WAD no entra en int64 pasado ~9.2 unidades).
+"""
+import math
+from decimal import Decimal
+
+import numpy as np
+
+WAD = 10**18
+
+
+def to_wad(x) -> int:
+    """``x`` (float, int, str o Decimal) en WAD, redondeando al entero más cercano."""
+    if isinstance(x, int):
+        return x * WAD
+    # vía Decimal(str) para no arrastrar el error binario del float: to_wad(0.003) == 3 * 10**15
+    return int((Decimal(str(x)) * WAD).to_integral_value())
+
+
+def from_wad(x: int) -> float:
+    return x / WAD
+
+
+def mul_down(a: int, b: int) -> int:
+    return a * b // WAD
+
+
+def mul_up(a: int, b: int) -> int:
+    return -(-a * b // WAD)
+
+
+def div_down(a: int, b: int) -> int:
+    return a * WAD // b
+
+
+def div_up(a: int, b: int) -> int:
+    return -(-a * WAD // b)
+
+
+# --- backends ---
+class FloatMath:
+    """Montos como float (el comportamiento de siempre)."""
+    zero = 0.0
+    # monto sin cota (p. ej. el máximo por price impact cuando ningún monto lo alcanza)
+    unbounded = math.inf
+
+    def unit(self, x) -> float:
+        """``x`` (ya en las unidades del backend) como valor del backend."""
+        return float(x)
+    def amount(self, x) -> float:
+        """``x`` unidades de un token."""
+        return float(x)
+    def to_float(self, x) -> float:
+        return float(x)
+    def mul(self, x, y):
+        return x * y
+    def div(self, x, y):
+        return x / y
+    def reserve_out(self, k, new_in):
+        """Reserva de salida que conserva ``k`` tras un swap."""
+        return k / new_in
+    def reserve_in(self, k, new_out):
+        """Reserva de entrada necesaria para conservar ``k`` con ``new_out`` del lado de salida."""
+        return k / new_out
+    def net(self, x, fee):
+        """``x`` descontada la fee."""
+        return x * (1 - fee)
+    def gross(self, x, fee):
+        """Monto que, descontada la fee, deja al menos ``x``."""
+        return x / (1 - fee)
+    def scale(self, x, fraction: float):
+        return x * fraction
+    def fee(self, x, rate):
+        return x * rate
+    def slack(self, eps: float) -> float:
+        """Tolerancia de las comparaciones contra el redondeo."""
+        return eps
+
+    # sin estado: las copias de un componente comparten el backend
+    def __copy__(self):
+        return self
+    def __deepcopy__(self, memo):
+        return self
+
+
+class WadMath(FloatMath):
+    """Montos en WAD: fracciones, valuaciones y salidas redondeadas hacia abajo; reservas que
+    quedan en el pool y fees hacia arriba."""
+    zero = 0
+    # como ``type(uint256).max`` en un contrato: los enteros no tienen infinito
+    unbounded = 2**256 - 1
+
+    def unit(self, x) -> int:
+        return int(x)
+    def amount(self, x) -> int:
+        return to_wad(x)
+    def to_float(self, x) -> float:
+        return from_wad(x)
+    def mul(self, x: int, y: int) -> int:
+        return x * y // WAD
+    def div(self, x: int, y: int) -> int:
+        return x * WAD // y
+    def reserve_out(self, k: int, new_in: int) -> int:
+        # k es el producto de dos WAD: el cociente ya es un WAD, redondeado hacia arriba
+        return -(-k // new_in)
+    def reserve_in(self, k: int, new_out: int) -> int:
+        return -(-k // new_out)
+    def net(self, x: int, fee: int) -> int:
+        return x * (WAD - fee) // WAD
+    def gross(self, x: int, fee: int) -> int:
+        return -(-x * WAD // (WAD - fee))
+    def scale(self, x: int, fraction: float) -> int:
+        return mul_down(x, to_wad(fraction))
+    def fee(self, x: int, rate: int) -> int:
+        return mul_up(x, rate)
+    def slack(self, eps: float) -> int:
+        return 0
+
+
+FLOAT = FloatMath()
+WAD_MATH = WadMath()
+BACKENDS = {"float": FLOAT, "fixed": WAD_MATH}
+
+
+# --- caminos en bloque sobre arrays de enteros (dtype=object) ---
+def mul_down_many(a, b):
+    return np.asarray(a, dtype=object) * np.asarray(b, dtype=object) // WAD
+
+
+def quote_a_for_b_many(reserve_a, reserve_b, fee, dx):
+    """``AMM(..., num=WAD_MATH).quote_a_for_b`` para arrays de pools y/o de montos."""
+    reserve_a = np.asarray(reserve_a, dtype=object)
+    reserve_b = np.asarray(reserve_b, dtype=object)
+    net = np.asarray(dx, dtype=object) * (WAD - np.asarray(fee, dtype=object)) // WAD
+    new_a = reserve_a + net
+    return reserve_b - (-(-reserve_a * reserve_b // new_a))
+
+
+def quote_b_for_a_many(reserve_a, reserve_b, fee, dy_in):
+    return quote_a_for_b_many(reserve_b, reserve_a, fee, dy_in)
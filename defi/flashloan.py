@@ -1,10 +1,15 @@
 """Pool de flash loans (modelo simple)."""
+from defi.fixedpoint import FLOAT
+
+
 class FlashLoanPool:
-    def __init__(self, liquidity_b: float, fee: float = 0.0009):
-        self.b = float(liquidity_b)
-        self.fee = float(fee)
+    def __init__(self, liquidity_b: float, fee: float = 0.0009, num=FLOAT):
+        # montos y fee en las unidades del backend ``num`` (defi.fixedpoint)
+        self.num = num
+        self.b = num.unit(liquidity_b)
+        self.fee = num.unit(fee)
     def borrow(self, amount_b: float) -> float:
-        assert amount_b <= self.b + 1e-12, "Not enough liquidity in flash pool"
+        assert amount_b <= self.b + self.num.slack(1e-12), "Not enough liquidity in flash pool"
         self.b -= amount_b
         return amount_b
     def repay(self, amount_b: float):
@@ -1,36 +1,153 @@
-"""Protocolo de lending vulnerable que usa el oráculo para valorar colateral A en B."""
+"""Protocolo de lending vulnerable que usa el oráculo para valorar colateral A en B.
+
+Montos, LTV y precios en las unidades del backend ``num`` (``defi.fixedpoint``); con ``WAD_MATH``
+el colateral se valúa redondeando hacia abajo y el LTV se respeta sin tolerancia.
+"""
+import math
+
+from defi.fixedpoint import FLOAT
+
+
 class LendingProtocol:
-    def __init__(self, oracle, ltv: float = 0.7):
+    def __init__(self, oracle, ltv: float = 0.7, num=FLOAT):
+        self.num = num
         self.oracle = oracle
-        self.ltv = float(ltv)
-        self.collateral_a = 0.0
-        self.debt_b = 0.0
+        self.ltv = num.unit(ltv)
+        self.collateral_a = num.zero
+        self.debt_b = num.zero
     def deposit_collateral_a(self, amount_a: float):
         self.collateral_a += amount_a
     def max_borrowable_b(self) -> float:
-        value_b = self.collateral_a * self.oracle.price_a_in_b()
-        return max(0.0, value_b * self.ltv - self.debt_b)
+        num = self.num
+        value_b = num.mul(self.collateral_a, num.unit(self.oracle.price_a_in_b()))
+        return max(num.zero, num.mul(value_b, self.ltv) - self.debt_b)
     def borrow_b(self, amount_b: float):
-        assert amount_b <= self.max_borrowable_b() + 1e-9, "Would exceed LTV"
+        assert amount_b <= self.max_borrowable_b() + self.num.slack(1e-9), "Would exceed LTV"
         self.debt_b += amount_b
     def liquidatable(self) -> bool:
-        value_b = self.collateral_a * self.oracle.price_a_in_b()
-        return self.debt_b > value_b * self.ltv + 1e-9
-
-
-# --- Defensa (comentada) ---
-# Circuit breaker simple: no permitir nuevos préstamos si el precio se movió más de X% en una ventana.
-# Descomenta e integra según convenga.
-# class LendingProtocolWithCircuit(LendingProtocol):
-#     def __init__(self, oracle, ltv=0.7, circuit_threshold=0.2):
-#         super().__init__(oracle, ltv)
-#         self.circuit_threshold = circuit_threshold
-#         self.last_price = oracle.price_a_in_b()
-#     def borrow_b(self, amount_b: float):
-#         current = self.oracle.price_a_in_b()
-#         if abs(current - self.last_price) / max(self.last_price, 1e-12) > self.circuit_threshold:
-#             raise Exception("Circuit breaker: price moved too much, borrowing paused")
-#         super().borrow_b(amount_b)
-#     def update_last_price(self):
-#         self.last_price = self.oracle.price_a_in_b()
-# ---------------------------
+        num = self.num
+        value_b = num.mul(self.collateral_a, num.unit(self.oracle.price_a_in_b()))
+        return self.debt_b > num.mul(value_b, self.ltv) + num.slack(1e-9)
+    def paused(self) -> bool:
+        """True si un borrow ahora sería rechazado por una defensa del protocolo."""
+        return False
+
+
+class CircuitBreakerError(Exception):
+    pass
+
+
+# --- Defensa: circuit breaker ---
+# Circuit breaker simple: no permitir nuevos préstamos si el precio se movió más de X% respecto al
+# último precio de referencia (``update_last_price`` la refresca). Si el oráculo publica sus precios
+# (``oracle.listeners``), el breaker ve cada movimiento al instante y queda disparado (``tripped``)
+# hasta la próxima referencia, aunque el precio vuelva antes del borrow.
+class LendingProtocolWithCircuit(LendingProtocol):
+    def __init__(self, oracle, ltv=0.7, circuit_threshold=0.2, num=FLOAT):
+        super().__init__(oracle, ltv, num)
+        self.circuit_threshold = circuit_threshold
+        self.last_price = oracle.price_a_in_b()
+        self.tripped = False
+        listeners = getattr(oracle, "listeners", None)
+        if listeners is not None:
+            listeners.append(self.on_price)
+    def borrow_b(self, amount_b: float):
+        if self.paused():
+            raise CircuitBreakerError("Circuit breaker: el precio cambió demasiado, borrowing pausado")
+        super().borrow_b(amount_b)
+    def on_price(self, price: float):
+        if not self.tripped and self._deviates(price):
+            self.tripped = True
+    def paused(self) -> bool:
+        return self.tripped or self._deviates(self.oracle.price_a_in_b())
+    def update_last_price(self):
+        self.last_price = self.oracle.price_a_in_b()
+        self.tripped = False
+    def on_block(self, block, timestamp):
+        # la referencia se refresca en cada bloque: el breaker mide movimientos dentro del bloque
+        self.update_last_price()
+    def _deviates(self, price: float) -> bool:
+        return abs(price - self.last_price) / max(self.last_price, 1e-12) > self.circuit_threshold
+
+
+# --- Defensa: circuit breaker por volatilidad ---
+class LendingProtocolWithVolatilityCircuit(LendingProtocol):
+    """Pausa el borrow si el precio se aleja más de ``max_sigma`` desvíos estándar de su media.
+
+    Por cada ventana de ``windows`` (segundos de simulación) mantiene media y varianza con pesos
+    exponenciales en el tiempo: cada precio pesa según cuánto tiempo estuvo vigente, con
+    ``alpha = 1 - exp(-dt / ventana)``. Actualizar y chequear es O(len(windows)) sin guardar
+    historia. Un precio nuevo se compara contra las estadísticas de los anteriores (no entra en
+    ellas hasta que pasa tiempo), así que una manipulación dentro del bloque no se diluye.
+
+    Sirve con cualquier oráculo: si publica sus precios (``oracle.listeners``) se suscribe; si no,
+    muestrea en ``on_block`` y en cada borrow. ``clock`` da el tiempo de simulación (sin clock se
+    usan los timestamps de los bloques). Disparado, queda pausado ``cooldown`` segundos (por
+    defecto, la ventana más corta). ``min_rel_std`` acota el desvío por abajo (fracción de la
+    media) para que un historial plano no dispare con cualquier ruido.
+    """
+    def __init__(self, oracle, ltv=0.7, clock=None, windows=(300.0,), max_sigma=4.0,
+                 min_rel_std=0.005, cooldown=None, num=FLOAT):
+        super().__init__(oracle, ltv, num)
+        assert windows and min(windows) > 0, "windows must be positive"
+        self.clock = clock
+        self.windows = tuple(float(w) for w in windows)
+        self.max_sigma = float(max_sigma)
+        self.min_rel_std = float(min_rel_std)
+        self.cooldown = min(self.windows) if cooldown is None else float(cooldown)
+        price = oracle.price_a_in_b()
+        self.last_time = clock() if clock is not None else 0.0
+        self.last_price = price
+        self.means = (price,) * len(self.windows)
+        self.variances = (0.0,) * len(self.windows)
+        self.tripped_until = -math.inf
+        listeners = getattr(oracle, "listeners", None)
+        if listeners is not None:
+            listeners.append(self.on_price)
+
+    def borrow_b(self, amount_b: float):
+        self.observe(self.oracle.price_a_in_b())
+        if self.paused():
+            raise CircuitBreakerError("Circuit breaker: volatilidad anómala del precio, borrowing pausado")
+        super().borrow_b(amount_b)
+
+    def on_price(self, price: float):
+        self.observe(price)
+
+    def on_block(self, block, timestamp):
+        self.observe(self.oracle.price_a_in_b(), timestamp)
+
+    def observe(self, price: float, timestamp: float = None):
+        """Registra ``price`` en ``timestamp`` (por defecto, ahora) y dispara si es anómalo."""
+        t = self._now() if timestamp is None else timestamp
+        dt = t - self.last_time
+        if dt > 0:
+            # el precio anterior estuvo vigente dt segundos: entra en las estadísticas
+            x = self.last_price
+            means, variances = [], []
+            for window, mean, var in zip(self.windows, self.means, self.variances):
+                alpha = -math.expm1(-dt / window)
+                diff = x - mean
+                incr = alpha * diff
+                means.append(mean + incr)
+                variances.append((1 - alpha) * (var + diff * incr))
+            self.means = tuple(means)
+            self.variances = tuple(variances)
+            self.last_time = t
+        self.last_price = price
+        if self.zscore(price) > self.max_sigma:
+            self.tripped_until = t + self.cooldown
+
+    def zscore(self, price: float) -> float:
+        """Mayor desvío de ``price`` respecto de la media, en desvíos estándar, entre las ventanas."""
+        z = 0.0
+        for mean, var in zip(self.means, self.variances):
+            std = max(math.sqrt(var), self.min_rel_std * abs(mean), 1e-12)
+            z = max(z, abs(price - mean) / std)
+        return z
+
+    def paused(self) -> bool:
+        return self._now() < self.tripped_until or self.zscore(self.last_price) > self.max_sigma
+
+    def _now(self):
+        return self.clock() if self.clock is not None else self.last_time
@@ -0,0 +1,241 @@
+"""Índice de precios de liquidación y cascadas de liquidación a través del AMM.
+
+Una cuenta de ``MultiAccountLendingProtocol`` es liquidable cuando el precio de A cae por debajo
+de su precio de liquidación ``p* = deuda / (colateral * ltv)``. ``LiquidationIndex`` guarda los
+``p*`` en un array de NumPy junto con su orden (``argsort``): ante cada precio nuevo las cuentas
+que cruzaron su umbral son un tramo contiguo del orden, que se ubica con ``searchsorted`` sin
+recorrer el book. Las cuentas que cambiaron desde el último ordenamiento quedan pendientes y se
+chequean una por una hasta que son bastantes y se reordena todo.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from defi.events import Listeners
+
+# misma tolerancia que MultiAccountLendingProtocol.liquidatable
+_EPS = 1e-9
+
+
+class LiquidationIndex:
+    """Cuentas liquidables de ``book`` al último precio visto.
+
+    Escucha los cambios del book y, si el oráculo los publica (``oracle.listeners``), sus precios;
+    si no, el precio se registra con ``on_price``/``on_block``. Publica en ``self.listeners`` la
+    lista de cuentas que pasan a ser liquidables con cada precio nuevo.
+    """
+    # se reemplazan al reordenar, nunca se modifican in-place
+    _fork_shared = ("_order", "_sorted")
+
+    def __init__(self, book, price: float = None):
+        self.book = book
+        self.price = book.oracle.price_a_in_b() if price is None else float(price)
+        self.listeners = Listeners()
+        self._threshold = np.empty(0)        # p* por cuenta
+        self._underwater = np.empty(0, dtype=bool)
+        self._order = np.empty(0, dtype=np.intp)   # cuentas ordenadas por p* al último ordenamiento
+        self._sorted = np.empty(0)                 # sus p* en ese momento (ascendentes)
+        self._stale = np.empty(0, dtype=bool)      # cambiaron desde entonces: su lugar en el orden no vale
+        self._pending = set()
+        book.listeners.append(self.update)
+        oracle_listeners = getattr(book.oracle, "listeners", None)
+        if oracle_listeners is not None:
+            oracle_listeners.append(self.on_price)
+        if len(book):
+            self.update(np.arange(len(book)))
+
+    def close(self):
+        """Deja de escuchar los cambios del book y los precios del oráculo."""
+        self.book.listeners.remove(self.update)
+        oracle_listeners = getattr(self.book.oracle, "listeners", None)
+        if oracle_listeners is not None:
+            oracle_listeners.remove(self.on_price)
+
+    def liquidation_price(self, account: int) -> float:
+        return float(self._threshold[account])
+
+    def is_underwater(self, account: int) -> bool:
+        return bool(self._underwater[account])
+
+    def underwater(self) -> List[int]:
+        """Cuentas liquidables al último precio visto."""
+        return np.flatnonzero(self._underwater).tolist()
+
+    def update(self, accounts):
+        """Recalcula ``p*`` de ``accounts`` (índice o array) tras un cambio en su posición."""
+        book = self.book
+        if isinstance(accounts, (int, np.integer)):
+            # camino rápido de las operaciones por cuenta: sin pasar por arrays
+            i = int(accounts)
+            self._grow(i + 1)
+            p = _threshold(float(book.collateral_a[i]), float(book.debt_b[i]), book.ltv)
+            self._threshold[i] = p
+            self._underwater[i] = p > self.price
+            if not self._stale[i]:
+                self._stale[i] = True
+                self._pending.add(i)
+                if len(self._pending) > self._max_pending():
+                    self._resort()
+        else:
+            accounts = np.asarray(accounts, dtype=np.intp)
+            if accounts.size == 0:
+                return
+            self._grow(int(accounts.max()) + 1)
+            p = _thresholds(book.collateral_a[accounts], book.debt_b[accounts], book.ltv)
+            self._threshold[accounts] = p
+            self._underwater[accounts] = p > self.price
+            fresh = accounts[~self._stale[accounts]]
+            if len(self._pending) + fresh.size > self._max_pending():
+                self._resort()
+            else:
+                self._stale[fresh] = True
+                self._pending.update(fresh.tolist())
+
+    def on_price(self, price: float = None) -> List[int]:
+        """Registra un precio nuevo y devuelve las cuentas que pasaron a ser liquidables.
+
+        Las cuentas salen en orden de ``p*`` decreciente (las más hundidas primero). Las que se
+        reponen por una suba del precio dejan de ser liquidables sin reportarse.
+        """
+        price = self.book.oracle.price_a_in_b() if price is None else float(price)
+        old, self.price = self.price, price
+        if price == old:
+            return []
+        # las cuentas con p* entre los dos precios cambian de lado
+        low, high = min(price, old), max(price, old)
+        sorted_p = self._sorted
+        moved = self._order[np.searchsorted(sorted_p, low, "right"):np.searchsorted(sorted_p, high, "right")]
+        moved = moved[~self._stale[moved]]
+        if self._pending:
+            pending = np.fromiter(self._pending, dtype=np.intp, count=len(self._pending))
+            p = self._threshold[pending]
+            moved = np.concatenate([moved, pending[(p > low) & (p <= high)]])
+        under = price < old
+        self._underwater[moved] = under
+        if not under or not moved.size:
+            return []
+        crossed = moved[np.argsort(-self._threshold[moved], kind="stable")].tolist()
+        self.listeners.notify(crossed)
+        return crossed
+
+    def on_block(self, block: int, timestamp: float):
+        self.on_price()
+
+    def _grow(self, size):
+        capacity = self._threshold.size
+        if size > capacity:
+            extra = max(size, 2 * capacity) - capacity
+            self._threshold = np.concatenate([self._threshold, np.full(extra, -np.inf)])
+            self._underwater = np.concatenate([self._underwater, np.zeros(extra, dtype=bool)])
+            self._stale = np.concatenate([self._stale, np.zeros(extra, dtype=bool)])
+
+    def _max_pending(self):
+        # chequear las pendientes una por una cuesta más que reordenar pasado este número
+        return max(1024, self._threshold.size // 16)
+
+    def _resort(self):
+        self._order = np.argsort(self._threshold, kind="stable")
+        self._sorted = self._threshold[self._order]
+        self._stale[:] = False
+        self._pending = set()
+
+
+def _threshold(collateral_a, debt_b, ltv):
+    excess = debt_b - _EPS
+    if excess <= 0:
+        return -np.inf
+    return excess / (collateral_a * ltv) if collateral_a > 0 else np.inf
+
+
+def _thresholds(collateral_a, debt_b, ltv):
+    # liquidable si deuda > colateral * precio * ltv + eps  <=>  precio < (deuda - eps) / (colateral * ltv)
+    excess = debt_b - _EPS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = excess / (collateral_a * ltv)
+    p = np.where(collateral_a > 0, p, np.inf)
+    return np.where(excess > 0, p, -np.inf)
+
+
+def index_for(book) -> LiquidationIndex:
+    """Índice ya enganchado a ``book`` o uno nuevo."""
+    for listener in book.listeners:
+        owner = getattr(listener, "__self__", None)
+        if isinstance(owner, LiquidationIndex):
+            return owner
+    return LiquidationIndex(book)
+
+
+# --- Liquidaciones ---
+@dataclass
+class Liquidation:
+    account: int
+    repaid_b: float
+    seized_a: float
+    proceeds_b: float
+    price: float  # precio del oráculo con el que se valuó el colateral
+
+
+@dataclass
+class CascadeReport:
+    liquidations: List[Liquidation] = field(default_factory=list)
+    start_price: float = 0.0
+    end_price: float = 0.0
+    bad_debt_b: float = 0.0  # deuda que quedó sin colateral en las cuentas liquidadas
+
+    @property
+    def accounts(self) -> List[int]:
+        return sorted({l.account for l in self.liquidations})
+
+
+def liquidate(book, account: int, amm, close_factor: float = 0.5, bonus: float = 0.05) -> Liquidation:
+    """Un liquidador repaga ``close_factor`` de la deuda, cobra el colateral equivalente más
+    ``bonus`` y lo vende en ``amm`` (lo que a su vez baja el precio de A)."""
+    assert 0 < close_factor <= 1, "close_factor must be in (0, 1]"
+    price = book.oracle.price_a_in_b()
+    repay = float(book.debt_b[account]) * close_factor
+    seize = repay * (1 + bonus) / price
+    collateral = float(book.collateral_a[account])
+    if seize > collateral:
+        # no alcanza el colateral: se repaga solo lo que cubre; el resto queda como deuda incobrable
+        seize = collateral
+        repay = seize * price / (1 + bonus)
+    repaid = book.repay_b(account, repay)
+    seized = book.seize_collateral_a(account, seize)
+    proceeds = amm.swap_a_for_b(seized) if seized > 0 else 0.0
+    return Liquidation(account, repaid, seized, proceeds, price)
+
+
+def cascade(index: LiquidationIndex, amm, close_factor: float = 0.5, bonus: float = 0.05,
+            max_liquidations: int = 100_000) -> CascadeReport:
+    """Liquida las cuentas que cruzaron su umbral hasta que el precio deja de arrastrar a otras.
+
+    Cada venta de colateral mueve el AMM; el oráculo del book se vuelve a leer tras cada
+    liquidación y las cuentas que cruzan con el precio nuevo se encolan.
+    """
+    book = index.book
+    index.on_price()
+    report = CascadeReport(start_price=index.price)
+    # las más hundidas primero, incluidas las que ya estaban bajo el umbral antes de este precio
+    queue = deque(sorted(index.underwater(), key=index.liquidation_price, reverse=True))
+    # las que cruzan con cada venta llegan por el índice, lo empuje el oráculo o on_price()
+    enqueue = queue.extend
+    index.listeners.append(enqueue)
+    try:
+        while queue and len(report.liquidations) < max_liquidations:
+            account = queue.popleft()
+            if not index.is_underwater(account) or book.collateral_a[account] <= 0:
+                continue
+            report.liquidations.append(liquidate(book, account, amm, close_factor, bonus))
+            index.on_price()
+            if index.is_underwater(account):
+                queue.append(account)
+    finally:
+        index.listeners.remove(enqueue)
+    report.end_price = index.price
+    accounts = np.asarray(report.accounts, dtype=np.int64)
+    if accounts.size:
+        empty = book.collateral_a[accounts] <= 0
+        report.bad_debt_b = float(book.debt_b[accounts][empty].sum())
+    return report
@@ -0,0 +1,210 @@
+"""Protocolo de lending multi-cuenta: posiciones en arrays de NumPy (una fila por cuenta).
+
+Pensado para 10^5-10^6 prestatarios: cada cuenta ocupa 16 bytes (colateral en A y deuda en B)
+y los health factors de todas las cuentas se calculan en una sola pasada vectorizada.
+``account(i)`` devuelve una vista con la interfaz de ``LendingProtocol`` para usar una cuenta
+(p. ej. la del atacante) en el motor de escenarios.
+"""
+import numpy as np
+
+from defi.events import Listeners
+
+
+class MultiAccountLendingProtocol:
+    def __init__(self, oracle, ltv: float = 0.7, capacity: int = 1024):
+        self.oracle = oracle
+        self.ltv = float(ltv)
+        self.collateral_a = np.zeros(max(1, capacity))
+        self.debt_b = np.zeros(max(1, capacity))
+        self.n = 0
+        # cuentas abiertas alguna vez, rollbacks incluidos: se escribe sin pasar por el journal para
+        # que un rollback sepa qué cuentas cierra y se las avise a los suscriptores
+        self._opened = 0
+        # callbacks(accounts) tras cada cambio de posición (p. ej. el índice de liquidación)
+        self.listeners = Listeners()
+
+    def __len__(self):
+        return self.n
+
+    # --- cuentas ---
+    def open_account(self, collateral_a: float = 0.0, debt_b: float = 0.0) -> int:
+        self._reserve(self.n + 1)
+        i = self.n
+        self.collateral_a[i] = collateral_a
+        self.debt_b[i] = debt_b
+        self.n += 1
+        self._opened_up_to(self.n)
+        self._changed(i)
+        return i
+
+    def open_accounts(self, collateral_a, debt_b=0.0) -> range:
+        """Abre cuentas en bloque con posiciones iniciales (arrays o escalares)."""
+        collateral_a = np.asarray(collateral_a, dtype=np.float64)
+        count = collateral_a.size
+        start = self.n
+        self._reserve(start + count)
+        self.collateral_a[start:start + count] = collateral_a
+        self.debt_b[start:start + count] = debt_b
+        self.n += count
+        self._opened_up_to(self.n)
+        self._changed(np.arange(start, start + count))
+        return range(start, start + count)
+
+    def account(self, i: int) -> "AccountView":
+        self._check(i)
+        return AccountView(self, i)
+
+    # --- operaciones por cuenta ---
+    def deposit_collateral_a(self, i: int, amount_a: float):
+        self._check(i)
+        assert amount_a >= 0, "amount must be non-negative"
+        self.collateral_a[i] += amount_a
+        self._changed(i)
+
+    def max_borrowable_b(self, i: int) -> float:
+        self._check(i)
+        value_b = self.collateral_a[i] * self.oracle.price_a_in_b()
+        return max(0.0, float(value_b * self.ltv - self.debt_b[i]))
+
+    def borrow_b(self, i: int, amount_b: float):
+        assert amount_b <= self.max_borrowable_b(i) + 1e-9, "Would exceed LTV"
+        self.debt_b[i] += amount_b
+        self._changed(i)
+
+    def repay_b(self, i: int, amount_b: float) -> float:
+        """Repaga hasta ``amount_b`` de la deuda; devuelve lo efectivamente repagado."""
+        self._check(i)
+        assert amount_b >= 0, "amount must be non-negative"
+        paid = min(float(amount_b), float(self.debt_b[i]))
+        self.debt_b[i] -= paid
+        self._changed(i)
+        return paid
+
+    def seize_collateral_a(self, i: int, amount_a: float) -> float:
+        """Retira hasta ``amount_a`` de colateral (liquidaciones); devuelve lo retirado."""
+        self._check(i)
+        seized = min(float(amount_a), float(self.collateral_a[i]))
+        self.collateral_a[i] -= seized
+        self._changed(i)
+        return seized
+
+    # --- operaciones en bloque ---
+    def deposit_many(self, accounts, amounts_a):
+        accounts = self._check_many(accounts)
+        amounts_a = np.broadcast_to(np.asarray(amounts_a, dtype=np.float64), accounts.shape)
+        assert np.all(amounts_a >= 0), "amount must be non-negative"
+        np.add.at(self.collateral_a, accounts, amounts_a)
+        self._changed(accounts)
+
+    def borrow_many(self, accounts, amounts_b):
+        """Borrows en bloque; una cuenta puede repetirse y se controla el total que pide contra
+        su margen, como si fueran borrows sucesivos."""
+        accounts = self._check_many(accounts)
+        amounts_b = np.broadcast_to(np.asarray(amounts_b, dtype=np.float64), accounts.shape)
+        totals = np.bincount(accounts, amounts_b, minlength=self.n)
+        touched = np.unique(accounts)
+        headroom = self.collateral_a[touched] * self.oracle.price_a_in_b() * self.ltv - self.debt_b[touched]
+        assert np.all(totals[touched] <= headroom + 1e-9), "Would exceed LTV"
+        self.debt_b[:self.n] += totals
+        self._changed(touched)
+
+    # --- vistas vectorizadas sobre todas las cuentas ---
+    def health_factors(self, price: float = None) -> np.ndarray:
+        """Valor del colateral * LTV / deuda por cuenta (inf para cuentas sin deuda)."""
+        price = self.oracle.price_a_in_b() if price is None else price
+        debt = self.debt_b[:self.n]
+        capacity = self.collateral_a[:self.n] * (price * self.ltv)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(debt > 0, capacity / debt, np.inf)
+
+    def liquidatable(self, price: float = None) -> np.ndarray:
+        price = self.oracle.price_a_in_b() if price is None else price
+        value_b = self.collateral_a[:self.n] * price
+        return self.debt_b[:self.n] > value_b * self.ltv + 1e-9
+
+    def total_collateral_a(self) -> float:
+        return float(self.collateral_a[:self.n].sum())
+
+    def total_debt_b(self) -> float:
+        return float(self.debt_b[:self.n].sum())
+
+    def _reserve(self, size):
+        capacity = self.collateral_a.shape[0]
+        if size > capacity:
+            new_capacity = max(size, capacity * 2)
+            self.collateral_a = np.concatenate([self.collateral_a, np.zeros(new_capacity - capacity)])
+            self.debt_b = np.concatenate([self.debt_b, np.zeros(new_capacity - capacity)])
+
+    # --- estado para Transaction: copia de las filas abiertas (O(n), solo si se enlista el book) ---
+    def _tx_snapshot(self) -> dict:
+        return {"collateral_a": self.collateral_a[:self.n].copy(), "debt_b": self.debt_b[:self.n].copy()}
+
+    def _tx_restore(self, state: dict):
+        n = state["collateral_a"].size  # la capacidad solo crece: n cabe en los arrays actuales
+        # el journal pudo haber restaurado ya ``n`` y los arrays: las cuentas que se cierran son
+        # las abiertas alguna vez después del snapshot
+        opened = max(self._opened, self.n)
+        self.collateral_a[n:opened] = 0.0
+        self.debt_b[n:opened] = 0.0
+        self.collateral_a[:n] = state["collateral_a"]
+        self.debt_b[:n] = state["debt_b"]
+        # sin pasar por el __setattr__ del journal: esto ya es parte de un rollback
+        object.__setattr__(self, "n", n)
+        object.__setattr__(self, "_opened", n)
+        self._changed(np.arange(opened))
+
+    def _opened_up_to(self, n):
+        if n > self._opened:
+            object.__setattr__(self, "_opened", n)
+
+    def _changed(self, accounts):
+        self.listeners.notify(accounts)
+
+    def _check(self, i):
+        assert 0 <= i < self.n, f"Unknown account {i}"
+
+    def _check_many(self, accounts):
+        accounts = np.asarray(accounts, dtype=np.intp)
+        assert accounts.size == 0 or (accounts.min() >= 0 and accounts.max() < self.n), "Unknown account"
+        return accounts
+
+
+class AccountView:
+    """Una cuenta de ``MultiAccountLendingProtocol`` con la interfaz de ``LendingProtocol``.
+
+    Define ``_tx_snapshot``/``_tx_restore`` para que ``Transaction`` guarde y restaure solo la
+    fila de la cuenta, no los arrays completos.
+    """
+    def __init__(self, book: MultiAccountLendingProtocol, account: int):
+        self.book = book
+        self.account = account
+        self.oracle = book.oracle
+        self.ltv = book.ltv
+
+    @property
+    def collateral_a(self) -> float:
+        return float(self.book.collateral_a[self.account])
+
+    @property
+    def debt_b(self) -> float:
+        return float(self.book.debt_b[self.account])
+
+    def deposit_collateral_a(self, amount_a: float):
+        self.book.deposit_collateral_a(self.account, amount_a)
+    def max_borrowable_b(self) -> float:
+        return self.book.max_borrowable_b(self.account)
+    def borrow_b(self, amount_b: float):
+        self.book.borrow_b(self.account, amount_b)
+    def repay_b(self, amount_b: float) -> float:
+        return self.book.repay_b(self.account, amount_b)
+    def liquidatable(self) -> bool:
+        value_b = self.collateral_a * self.oracle.price_a_in_b()
+        return self.debt_b > value_b * self.ltv + 1e-9
+
+    def _tx_snapshot(self) -> dict:
+        return {"collateral_a": self.collateral_a, "debt_b": self.debt_b}
+
+    def _tx_restore(self, state: dict):
+        self.book.collateral_a[self.account] = state["collateral_a"]
+        self.book.debt_b[self.account] = state["debt_b"]
+        self.book._changed(self.account)
@@ -1,29 +1,219 @@
-"""Oracle ingenuo que lee el price spot desde el AMM."""
+"""Oráculos: spot ingenuo que lee el precio desde el AMM, TWAP con acumulador de precio y
+mediana (o media recortada) de varios feeds.
+
+Ambos se suscriben a los cambios de reservas del AMM (``amm.listeners``) y cachean su precio, así
+que una lectura no recalcula nada; a su vez publican cada precio nuevo en ``self.listeners``
+(p. ej. para los circuit breakers).
+"""
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import partial
+
+from defi.events import Listeners
+
+
 class Oracle:
     def __init__(self, amm):
         self.amm = amm
+        self.listeners = Listeners()
+        self._price = amm.price_a_in_b()
+        amm.listeners.append(self.on_reserves)
     def price_a_in_b(self) -> float:
-        # Oráculo ingenuo: devuelve el precio spot del AMM
-        return self.amm.price_a_in_b()
-
-
-# --- Defensa (comentada) ---
-# Ejemplo de TWAP simple: mantener ventanas de precios y devolver promedio ponderado.
-# Descomenta y adapta según necesites.
-# import collections, time
-# class TWAPOracle:
-#     def __init__(self, amm, window_seconds=60):
-#         self.amm = amm
-#         self.window = window_seconds
-#         self.samples = collections.deque()  # (timestamp, price)
-#     def sample(self):
-#         self.samples.append((time.time(), self.amm.price_a_in_b()))
-#         # eliminar muestras viejas
-#         while self.samples and self.samples[0][0] < time.time() - self.window:
-#             self.samples.popleft()
-#     def price_a_in_b(self):
-#         self.sample()
-#         if not self.samples:
-#             return self.amm.price_a_in_b()
-#         return sum(p for (_, p) in self.samples) / len(self.samples)
-# ---------------------------
+        # Oráculo ingenuo: devuelve el precio spot del AMM (cacheado tras cada swap)
+        return self._price
+    def on_reserves(self, amm):
+        self._price = amm.price_a_in_b()
+        self.listeners.notify(self._price)
+
+
+# --- Defensa: TWAP ---
+class TWAPOracle:
+    """TWAP con acumulador de precio (estilo Uniswap v2) y reloj de simulación inyectable.
+
+    Cada ``update()`` integra el precio vigente desde la observación anterior, así que la
+    consulta de la ventana por defecto es O(1) amortizado sin importar su largo; cualquier otra
+    ventana (hasta ``max_window``) se resuelve con una búsqueda binaria sobre las observaciones.
+    ``clock`` es cualquier callable que devuelva el tiempo actual (p. ej. ``SimClock``).
+    """
+    # la historia es copy-on-write (ver _append): los forks del mundo la comparten
+    _fork_shared = ("_times", "_cums")
+
+    def __init__(self, amm, clock, window_seconds=60.0, history_seconds=0.0, initial_price=None, max_window=None):
+        self.amm = amm
+        self.clock = clock
+        self.window = float(window_seconds)
+        self.max_window = float(max_window if max_window is not None else window_seconds)
+        now = clock()
+        # observaciones (tiempo, precio acumulado); el precio vigente desde la última es _price
+        self._times = array("d", [now - history_seconds])
+        self._cums = array("d", [0.0])
+        self._n = 1      # largo lógico: las entradas < _n nunca se modifican in-place
+        self._start = 0  # observación donde empieza la ventana por defecto
+        self._price = initial_price if initial_price is not None else amm.price_a_in_b()
+        self._cached_at = None  # instante del último TWAP de la ventana por defecto calculado
+        self._cached = 0.0
+        self.listeners = Listeners()
+        self.update()
+        amm.listeners.append(self.on_reserves)
+
+    def update(self):
+        """Integra el precio vigente hasta ahora y toma el spot actual del AMM."""
+        now = self.clock()
+        n = self._n
+        last_t = self._times[n - 1]
+        if now > last_t:
+            self._append(now, self._cums[n - 1] + self._price * (now - last_t))
+        self._price = self.amm.price_a_in_b()
+        self._cached_at = None
+
+    def on_reserves(self, amm):
+        self.update()
+        if self.listeners:
+            self.listeners.notify(self.price_a_in_b())
+
+    def on_block(self, block, timestamp):
+        self.update()
+
+    def cumulative_price(self, timestamp=None) -> float:
+        """Integral del precio desde la primera observación hasta ``timestamp`` (por defecto, ahora)."""
+        n = self._n
+        t = self.clock() if timestamp is None else timestamp
+        if t >= self._times[n - 1]:
+            return self._cums[n - 1] + self._price * (t - self._times[n - 1])
+        return self._interpolate(max(bisect_right(self._times, t, 0, n) - 1, 0), t)
+
+    def price_a_in_b(self, window_seconds=None) -> float:
+        # el precio vigente llega por on_reserves: leer no agrega observaciones
+        now = self.clock()
+        if window_seconds is None and now == self._cached_at:
+            return self._cached
+        n = self._n
+        window = self.window if window_seconds is None else float(window_seconds)
+        start = max(now - window, self._times[0])
+        if now <= start:
+            return self._price
+        cum_now = self._cums[n - 1] + self._price * (now - self._times[n - 1])
+        if window_seconds is None:
+            # ventana por defecto: su inicio solo avanza, basta mover el índice
+            i = self._start
+            while i + 1 < n and self._times[i + 1] <= start:
+                i += 1
+            self._start = i
+            cum_start = self._interpolate(i, start)
+            self._compact(now)
+            self._cached_at, self._cached = now, (cum_now - cum_start) / (now - start)
+            return self._cached
+        cum_start = self.cumulative_price(start)
+        return (cum_now - cum_start) / (now - start)
+
+    def _interpolate(self, i, t):
+        if i + 1 >= self._n:
+            return self._cums[i] + self._price * (t - self._times[i])
+        t0, t1 = self._times[i], self._times[i + 1]
+        c0, c1 = self._cums[i], self._cums[i + 1]
+        return c0 + (c1 - c0) * (t - t0) / (t1 - t0)
+
+    def _append(self, t, cum):
+        n = self._n
+        if len(self._times) != n:
+            # quedaron entradas de un estado revertido: se trabaja sobre copias nuevas
+            self._times = self._times[:n]
+            self._cums = self._cums[:n]
+        self._times.append(t)
+        self._cums.append(cum)
+        self._n = n + 1
+
+    def _compact(self, now):
+        # descarta observaciones más viejas que max_window (reemplazando los arrays, no in-place)
+        keep = max(bisect_right(self._times, now - self.max_window, 0, self._n) - 1, 0)
+        keep = min(keep, self._start)
+        if keep > 1024 and keep * 2 > self._n:
+            self._times = self._times[keep:self._n]
+            self._cums = self._cums[keep:self._n]
+            self._n -= keep
+            self._start -= keep
+
+
+# --- Defensa: varias fuentes de precio ---
+class ExternalFeed:
+    """Feed de precio externo (off-chain) de referencia: solo cambia cuando se lo fija."""
+    def __init__(self, price: float):
+        self.price = float(price)
+        self.listeners = Listeners()
+    def price_a_in_b(self) -> float:
+        return self.price
+    def set_price(self, price: float):
+        self.price = float(price)
+        self.listeners.notify(self.price)
+
+
+class MedianOracle:
+    """Agrega ``feeds`` (oráculos, AMMs, ``ExternalFeed``...) con la mediana o, si ``trim > 0``,
+    la media descartando esa fracción de valores en cada extremo.
+
+    Los valores de los feeds se mantienen ordenados: cuando un feed publica un precio nuevo se
+    reubica solo ese valor (búsqueda binaria), y la mediana se lee en O(1). La media recortada se
+    recalcula únicamente en la primera lectura después de un cambio. Los feeds que no publican
+    sus precios (y los TWAP, que cambian con el tiempo) se releen en ``refresh()``/``on_block``.
+    """
+    def __init__(self, feeds, trim: float = 0.0):
+        self.feeds = list(feeds)
+        assert self.feeds, "at least one feed is required"
+        assert 0 <= trim < 0.5, "trim must be in [0, 0.5)"
+        self.trim = float(trim)
+        self.listeners = Listeners()
+        self._values = [feed.price_a_in_b() for feed in self.feeds]
+        self._sorted = sorted(self._values)
+        self._mean = None
+        for i, feed in enumerate(self.feeds):
+            listeners = getattr(feed, "listeners", None)
+            if listeners is not None:
+                listeners.append(partial(self._on_feed, i))
+
+    def price_a_in_b(self) -> float:
+        return self.trimmed_mean() if self.trim else self.median()
+
+    def median(self) -> float:
+        values = self._sorted
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+    def trimmed_mean(self) -> float:
+        if self._mean is None:
+            k = int(len(self._sorted) * self.trim)
+            kept = self._sorted[k:len(self._sorted) - k]
+            self._mean = sum(kept) / len(kept)
+        return self._mean
+
+    def refresh(self):
+        """Relee todos los feeds."""
+        changed = False
+        for i, feed in enumerate(self.feeds):
+            changed = self._set(i, feed.price_a_in_b()) or changed
+        if changed and self.listeners:
+            self.listeners.notify(self.price_a_in_b())
+
+    def on_block(self, block, timestamp):
+        self.refresh()
+
+    def _on_feed(self, i, *event):
+        if self._set(i, self.feeds[i].price_a_in_b()) and self.listeners:
+            self.listeners.notify(self.price_a_in_b())
+
+    # los valores se reordenan in-place: el journal de Transaction guarda una copia
+    def _tx_snapshot(self) -> dict:
+        return {"_values": list(self._values), "_sorted": list(self._sorted), "_mean": self._mean}
+
+    def _tx_restore(self, state: dict):
+        self.__dict__.update(state)
+
+    def _set(self, i, price):
+        old = self._values[i]
+        if price == old:
+            return False
+        values = self._sorted
+        del values[bisect_left(values, old)]
+        insort(values, price)
+        self._values[i] = price
+        self._mean = None
+        return True
@@ -0,0 +1,190 @@
+"""Registro de pools constant-product sobre muchos tokens, visto como un grafo.
+
+Cada pool (un ``AMM`` cuyo lado ``a`` es ``token_a`` y su lado ``b`` es ``token_b``) aporta dos
+aristas dirigidas. ``best_route`` cotiza rutas de hasta ``max_hops`` saltos con programación
+dinámica por capas sobre montos exactos; ``find_arbitrage`` busca un ciclo con producto de tasas
+marginales > 1 (ciclo negativo con pesos ``-log(tasa)``).
+
+La detección de ciclos es incremental: el grafo guarda potenciales ``h`` que cumplen
+``h[v] <= h[u] + w(u, v)`` en todas las aristas mientras no haya arbitraje. Un swap solo cambia
+las aristas de su pool (el registro escucha ``amm.listeners``), así que basta relajar desde las
+aristas de los pools tocados que ahora violan la condición; si la relajación da la vuelta a un
+ciclo, hay arbitraje.
+"""
+import math
+from collections import defaultdict, deque
+from functools import partial
+from typing import List, Optional, Tuple
+
+# holgura en las relajaciones: ciclos con peso en [-_EPS, 0) son ruido de redondeo
+_EPS = 1e-12
+
+# un salto de una ruta: (pool, token de entrada, token de salida)
+Hop = Tuple[int, str, str]
+
+
+class PoolGraph:
+    def __init__(self):
+        self.pools = []       # pool -> AMM
+        self.pairs = []       # pool -> (token_a, token_b)
+        self.tokens = {}      # token -> índice en los potenciales
+        self.adjacency = defaultdict(list)   # token -> [(pool, token de salida)]
+        self._h = None        # potenciales; None si hay que recalcularlos desde cero
+        self._dirty = set()   # pools con reservas cambiadas desde la última búsqueda
+
+    def add_pool(self, token_a: str, token_b: str, amm) -> int:
+        assert token_a != token_b, "a pool needs two different tokens"
+        pool = len(self.pools)
+        self.pools.append(amm)
+        self.pairs.append((token_a, token_b))
+        for token in (token_a, token_b):
+            if token not in self.tokens:
+                self.tokens[token] = len(self.tokens)
+                if self._h is not None:
+                    self._h.append(0.0)
+        self.adjacency[token_a].append((pool, token_b))
+        self.adjacency[token_b].append((pool, token_a))
+        amm.listeners.append(partial(self._touched, pool))
+        self._dirty.add(pool)
+        return pool
+
+    def pools_between(self, token_x: str, token_y: str) -> List[int]:
+        return [pool for pool, other in self.adjacency[token_x] if other == token_y]
+
+    # --- cotizaciones ---
+    def rate(self, pool: int, token_in: str) -> float:
+        """Tasa marginal (con fee) de ``token_in`` al otro token del pool."""
+        amm = self.pools[pool]
+        if token_in == self.pairs[pool][0]:
+            return (1 - amm.fee) * amm.b / amm.a
+        return (1 - amm.fee) * amm.a / amm.b
+
+    def quote(self, pool: int, token_in: str, amount: float) -> float:
+        amm = self.pools[pool]
+        if token_in == self.pairs[pool][0]:
+            return amm.quote_a_for_b(amount)
+        return amm.quote_b_for_a(amount)
+
+    def swap(self, pool: int, token_in: str, amount: float) -> float:
+        amm = self.pools[pool]
+        if token_in == self.pairs[pool][0]:
+            return amm.swap_a_for_b(amount)
+        return amm.swap_b_for_a(amount)
+
+    def quote_path(self, path: List[Hop], amount: float) -> float:
+        """Monto final de recorrer ``path`` (sin repetir pools, así cada salto se cotiza aparte)."""
+        for pool, token_in, _ in path:
+            amount = self.quote(pool, token_in, amount)
+        return amount
+
+    def execute(self, path: List[Hop], amount: float) -> float:
+        for pool, token_in, _ in path:
+            amount = self.swap(pool, token_in, amount)
+        return amount
+
+    def best_route(self, token_in: str, token_out: str, amount: float,
+                   max_hops: int = 3) -> Tuple[float, List[Hop]]:
+        """Mejor ruta de ``token_in`` a ``token_out`` con hasta ``max_hops`` saltos.
+
+        Capa por capa se guarda, por token, el mayor monto alcanzable y su ruta; una ruta no usa
+        dos veces el mismo pool. Devuelve ``(monto, ruta)``, o ``(0.0, [])`` si no hay ruta.
+        """
+        assert amount > 0, "amount must be positive"
+        best_out, best_path = 0.0, []
+        frontier = {token_in: (amount, [])}
+        for _ in range(max_hops):
+            layer = {}
+            for token, (held, path) in frontier.items():
+                used = {hop[0] for hop in path}
+                for pool, other in self.adjacency[token]:
+                    if pool in used or other == token_in:
+                        continue
+                    out = self.quote(pool, token, held)
+                    if other not in layer or out > layer[other][0]:
+                        layer[other] = (out, path + [(pool, token, other)])
+            if token_out in layer and layer[token_out][0] > best_out:
+                best_out, best_path = layer.pop(token_out)
+            else:
+                layer.pop(token_out, None)
+            if not layer:
+                break
+            frontier = layer
+        return best_out, best_path
+
+    # --- arbitraje ---
+    def find_arbitrage(self) -> Optional[Tuple[float, List[Hop]]]:
+        """Un ciclo con producto de tasas marginales > 1 como ``(producto, ruta)``, o None.
+
+        Solo revisa los pools tocados desde la última llamada mientras los potenciales sigan
+        siendo válidos; tras encontrar un ciclo se recalculan desde cero en la próxima llamada.
+        """
+        dirty, self._dirty = self._dirty, set()
+        if self._h is None:
+            self._h = [0.0] * len(self.tokens)
+            starts = list(self.tokens)
+        else:
+            starts = []
+            h = self._h
+            for pool in dirty:
+                for token_in, token_out in (self.pairs[pool], self.pairs[pool][::-1]):
+                    w = self._weight(pool, token_in)
+                    if h[self.tokens[token_in]] + w < h[self.tokens[token_out]] - _EPS:
+                        starts.append(token_in)
+        if not starts:
+            return None
+        cycle = self._relax(starts)
+        if cycle is None:
+            return None
+        self._h = None
+        product = math.prod(self.rate(pool, token_in) for pool, token_in, _ in cycle)
+        return product, cycle
+
+    def _relax(self, starts):
+        # SPFA desde los tokens de ``starts``; un camino de relajaciones con tantas aristas como
+        # tokens implica un ciclo negativo
+        h, index = self._h, self.tokens
+        n = len(index)
+        length = defaultdict(int)
+        parent = {}
+        queue = deque(dict.fromkeys(starts))
+        queued = set(queue)
+        while queue:
+            u = queue.popleft()
+            queued.discard(u)
+            hu = h[index[u]]
+            for pool, v in self.adjacency[u]:
+                candidate = hu + self._weight(pool, u)
+                iv = index[v]
+                if candidate < h[iv] - _EPS:
+                    h[iv] = candidate
+                    parent[v] = (pool, u)
+                    length[v] = length[u] + 1
+                    if length[v] >= n:
+                        cycle = self._cycle_from(v, parent)
+                        if cycle is not None:
+                            return cycle
+                    if v not in queued:
+                        queue.append(v)
+                        queued.add(v)
+        return None
+
+    def _cycle_from(self, token, parent):
+        # sigue los punteros a padre hasta repetir un token: el tramo repetido es el ciclo
+        seen = {}
+        chain = []
+        while token in parent and token not in seen:
+            seen[token] = len(chain)
+            pool, prev = parent[token]
+            chain.append((pool, prev, token))
+            token = prev
+        if token not in seen:
+            return None
+        cycle = chain[seen[token]:]
+        cycle.reverse()
+        return cycle
+
+    def _weight(self, pool, token_in):
+        return -math.log(self.rate(pool, token_in))
+
+    def _touched(self, pool, *event):
+        self._dirty.add(pool)
@@ -0,0 +1,162 @@
+"""Pool StableSwap (invariante amplificado de Curve, dos tokens) con la interfaz de ``AMM``.
+
+    4·amp·(x + y) + D = 4·amp·D + D³ / (4·x·y)
+
+``get_d`` y ``get_y`` resuelven el invariante con Newton y aceptan arrays de NumPy: con arrays
+de montos (o de pools) resuelven todas las operaciones en un solo loop, iterando hasta que la
+última converge. Ambos toman un punto de partida (``d0``/``y0``): el pool guarda su ``D`` y
+arranca cada solve desde el ``D`` y las reservas actuales, así un swap típico converge en una o
+dos iteraciones en lugar de partir desde ``x + y``.
+"""
+import math
+
+import numpy as np
+
+from defi.events import Listeners
+
+_TOL = 1e-13
+_MAX_ITER = 256
+
+
+def _converged(new, old, tol):
+    if isinstance(new, np.ndarray):
+        return bool(np.all(np.abs(new - old) <= tol * np.abs(new)))
+    return abs(new - old) <= tol * abs(new)
+
+
+def get_d(x, y, amp, d0=None, tol: float = _TOL):
+    """Invariante ``D`` para reservas ``(x, y)`` (escalares o arrays)."""
+    ann = 4 * amp
+    s = x + y
+    d = s if d0 is None else d0
+    for _ in range(_MAX_ITER):
+        d_p = d * d * d / (4 * x * y)
+        prev = d
+        d = (ann * s + 2 * d_p) * d / ((ann - 1) * d + 3 * d_p)
+        if _converged(d, prev, tol):
+            return d
+    raise ArithmeticError("StableSwap: get_d no convergió")
+
+
+def get_y(x, d, amp, y0=None, tol: float = _TOL):
+    """Reserva del otro token que mantiene ``D`` cuando una reserva pasa a ser ``x``."""
+    ann = 4 * amp
+    c = d * d * d / (4 * x * ann)
+    b = x + d / ann
+    y = d if y0 is None else y0
+    for _ in range(_MAX_ITER):
+        prev = y
+        y = (y * y + c) / (2 * y + b - d)
+        if _converged(y, prev, tol):
+            return y
+    raise ArithmeticError("StableSwap: get_y no convergió")
+
+
+def spot_price(x, y, d, amp):
+    """Precio marginal de X en Y: -dy/dx sobre la curva (cociente de derivadas del invariante)."""
+    ann = 4 * amp
+    k = d * d * d / (4 * x * y)
+    return (ann + k / x) / (ann + k / y)
+
+
+class StableSwapAMM:
+    def __init__(self, reserve_a: float, reserve_b: float, fee: float = 0.0004, amp: float = 100.0):
+        self.a = float(reserve_a)
+        self.b = float(reserve_b)
+        self.fee = float(fee)
+        self.amp = float(amp)
+        self.d = get_d(self.a, self.b, self.amp)
+        # callbacks(amm) tras cada cambio de reservas (oráculos, TWAP, breakers)
+        self.listeners = Listeners()
+
+    @classmethod
+    def factory(cls, amp: float = 100.0):
+        """``(reserve_a, reserve_b, fee) -> StableSwapAMM`` para ``ScenarioSpec.amm_factory``."""
+        return lambda reserve_a, reserve_b, fee: cls(reserve_a, reserve_b, fee, amp)
+
+    def price_a_in_b(self) -> float:
+        return spot_price(self.a, self.b, self.d, self.amp)
+    def swap_a_for_b(self, dx: float) -> float:
+        assert dx > 0, "dx must be positive"
+        new_b = get_y(self.a + dx * (1 - self.fee), self.d, self.amp, y0=self.b)
+        dy = self.b - new_b
+        self.a += dx
+        self.b = new_b
+        # la fee queda en el pool: D crece un poco, se re-resuelve desde el D anterior
+        self.d = get_d(self.a, self.b, self.amp, d0=self.d)
+        self.listeners.notify(self)
+        return dy
+    def swap_b_for_a(self, dy_in: float) -> float:
+        assert dy_in > 0, "dy_in must be positive"
+        new_a = get_y(self.b + dy_in * (1 - self.fee), self.d, self.amp, y0=self.a)
+        dx = self.a - new_a
+        self.b += dy_in
+        self.a = new_a
+        self.d = get_d(self.a, self.b, self.amp, d0=self.d)
+        self.listeners.notify(self)
+        return dx
+
+    # --- Cotizaciones puras (escalares o arrays de montos): no mutan el pool ---
+    def quote_a_for_b(self, dx):
+        """B que devolvería ``swap_a_for_b(dx)``."""
+        assert np.all(np.asarray(dx) > 0), "dx must be positive"
+        return self.b - get_y(self.a + dx * (1 - self.fee), self.d, self.amp, y0=self.b)
+    def quote_b_for_a(self, dy_in):
+        """A que devolvería ``swap_b_for_a(dy_in)``."""
+        assert np.all(np.asarray(dy_in) > 0), "dy_in must be positive"
+        return self.a - get_y(self.b + dy_in * (1 - self.fee), self.d, self.amp, y0=self.a)
+    def amount_in_a_for_b(self, dy_out):
+        """A a entregar para recibir exactamente ``dy_out`` de B."""
+        assert np.all((0 < np.asarray(dy_out)) & (np.asarray(dy_out) < self.b)), "dy_out must be in (0, reserve B)"
+        new_a = get_y(self.b - dy_out, self.d, self.amp, y0=self.a)
+        return (new_a - self.a) / (1 - self.fee)
+    def amount_in_b_for_a(self, dx_out):
+        """B a entregar para recibir exactamente ``dx_out`` de A."""
+        assert np.all((0 < np.asarray(dx_out)) & (np.asarray(dx_out) < self.a)), "dx_out must be in (0, reserve A)"
+        new_b = get_y(self.a - dx_out, self.d, self.amp, y0=self.b)
+        return (new_b - self.b) / (1 - self.fee)
+    def price_after_a_for_b(self, dx):
+        new_a = self.a + dx
+        new_b = self.b - self.quote_a_for_b(dx)
+        return spot_price(new_a, new_b, get_d(new_a, new_b, self.amp, d0=self.d), self.amp)
+    def price_after_b_for_a(self, dy_in):
+        new_b = self.b + dy_in
+        new_a = self.a - self.quote_b_for_a(dy_in)
+        return spot_price(new_a, new_b, get_d(new_a, new_b, self.amp, d0=self.d), self.amp)
+    def price_impact_a_for_b(self, dx):
+        """Cambio relativo |p' - p| / p del precio spot tras vender ``dx`` de A."""
+        return 1 - self.price_after_a_for_b(dx) / self.price_a_in_b()
+    def price_impact_b_for_a(self, dy_in):
+        return self.price_after_b_for_a(dy_in) / self.price_a_in_b() - 1
+    def max_a_in_for_impact(self, max_impact: float) -> float:
+        """Mayor ``dx`` de A cuyo price impact no supera ``max_impact`` (inf si max_impact >= 1)."""
+        assert max_impact >= 0, "max_impact must be non-negative"
+        if max_impact >= 1:
+            return math.inf
+        return _bisect_amount(self.price_impact_a_for_b, max_impact, self.a)
+    def max_b_in_for_impact(self, max_impact: float) -> float:
+        """Mayor ``dy_in`` de B cuyo price impact no supera ``max_impact``."""
+        assert max_impact >= 0, "max_impact must be non-negative"
+        return _bisect_amount(self.price_impact_b_for_a, max_impact, self.b)
+
+    def _tx_restored(self):
+        # un rollback reescribió las reservas sin pasar por los swaps: se avisa a los suscriptores
+        self.listeners.notify(self)
+
+
+def _bisect_amount(impact, max_impact, scale):
+    # el impacto crece con el monto: se acota el intervalo duplicando y se bisecta
+    if max_impact == 0:
+        return 0.0
+    lo, hi = 0.0, scale
+    while impact(hi) <= max_impact:
+        lo, hi = hi, hi * 2
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if impact(mid) <= max_impact:
+            lo = mid
+        else:
+            hi = mid
+        if hi - lo <= 1e-12 * hi:
+            break
+    return lo
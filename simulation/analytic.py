@@ -0,0 +1,227 @@
+"""Análisis en forma cerrada del ataque base (``base_attack``) sobre el AMM x*y=k, sin simular.
+
+Con ``γ = 1 - fee`` del AMM, ``k = a0 * b0`` y un préstamo ``L``:
+
+    b1 = b0 + γ·s·L,  a1 = k / b1                    manipulación (B -> A), precio p1 = b1² / k
+    H  = A0 + (a0 - a1)                              A del atacante tras el swap
+    borrow = ltv · d · H · p1                        deposit de d·H valuado al precio manipulado
+    out = b1 - k / (a1 + γ·u·(1 - d)·H)              venta de u·(1 - d)·H (A -> B)
+    profit = L·(1 - s) + borrow + out - L·(1 + φ)    φ = fee del flash loan
+
+``profit`` coincide con ``ScenarioResult.profit_b`` del escenario sin defensas cuando es >= 0; si
+es negativo el atacante no llega a repagar y el escenario se revierte. Las derivadas respecto de
+``L`` también son cerradas, así que el préstamo óptimo sale de Newton sobre ``profit'(L) = 0``.
+El profit es lineal en el LTV y en la fee del flash loan (umbrales exactos); para la fee del AMM
+y la profundidad del pool el umbral se busca por bisección sobre la fórmula.
+
+    python -m simulation.analytic --loan-b 10000
+"""
+import math
+from dataclasses import dataclass, replace
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class AttackParams:
+    reserve_a: float = 10_000.0
+    reserve_b: float = 10_000.0
+    amm_fee: float = 0.003
+    flash_fee: float = 0.0009
+    flash_liquidity_b: float = 20_000.0
+    ltv: float = 0.7
+    attacker_a: float = 1_000.0
+    loan_b: float = 10_000.0
+    swap_fraction: float = 0.99
+    deposit_fraction: float = 0.95
+    sell_fraction: float = 0.90
+
+    @classmethod
+    def from_config(cls, overrides: Optional[dict] = None, **attack):
+        """Parámetros de ``utils.config`` (pisados por ``overrides``) y del ataque (``loan_b``, ...)."""
+        from simulation.engine import config_params
+        p = config_params(overrides)
+        return cls(
+            reserve_a=p["AMM_RESERVE_A"],
+            reserve_b=p["AMM_RESERVE_B"],
+            amm_fee=p["AMM_FEE"],
+            flash_fee=p["FLASH_POOL_FEE"],
+            flash_liquidity_b=p["FLASH_POOL_LIQUIDITY_B"],
+            ltv=p["LENDING_LTV"],
+            attacker_a=p["ATTACKER_INITIAL_A"],
+            **attack,
+        )
+
+
+@dataclass
+class AttackBreakdown:
+    got_a: float            # A recibida en la manipulación
+    manipulated_price: float
+    borrowed_b: float
+    sold_a: float
+    out_b: float            # B recibido en la venta
+    repayment_b: float
+    profit_b: float
+    final_a: float          # A que le queda al atacante
+    d_profit: float         # d profit / d loan_b
+    d2_profit: float        # d² profit / d loan_b²
+
+
+def breakdown(params: AttackParams) -> AttackBreakdown:
+    """Cada paso del ataque y las dos primeras derivadas del profit respecto de ``loan_b``."""
+    a0, b0, L = params.reserve_a, params.reserve_b, params.loan_b
+    s, d, u, ltv = params.swap_fraction, params.deposit_fraction, params.sell_fraction, params.ltv
+    gamma = 1 - params.amm_fee
+    k = a0 * b0
+    g = gamma * s  # d b1 / d L
+    # manipulación
+    b1 = b0 + g * L
+    a1 = k / b1
+    a1_1 = -k * g / (b1 * b1)
+    a1_2 = 2 * k * g * g / (b1 * b1 * b1)
+    got = a0 - a1
+    held = params.attacker_a + got
+    held_1, held_2 = -a1_1, -a1_2
+    p1 = b1 * b1 / k
+    p1_1 = 2 * b1 * g / k
+    p1_2 = 2 * g * g / k
+    # deposit + borrow al precio manipulado
+    borrowed = ltv * d * held * p1
+    borrowed_1 = ltv * d * (held_1 * p1 + held * p1_1)
+    borrowed_2 = ltv * d * (held_2 * p1 + 2 * held_1 * p1_1 + held * p1_2)
+    # venta de lo que no se depositó
+    c = u * (1 - d)
+    sold = c * held
+    a2 = a1 + gamma * sold
+    a2_1 = a1_1 + gamma * c * held_1
+    a2_2 = a1_2 + gamma * c * held_2
+    out = b1 - k / a2
+    out_1 = g + k * a2_1 / (a2 * a2)
+    out_2 = k * (a2_2 / (a2 * a2) - 2 * a2_1 * a2_1 / (a2 * a2 * a2))
+    repayment = L * (1 + params.flash_fee)
+    profit = L * (1 - s) + borrowed + out - repayment
+    d_profit = (1 - s) + borrowed_1 + out_1 - (1 + params.flash_fee)
+    d2_profit = borrowed_2 + out_2
+    return AttackBreakdown(got, p1, borrowed, sold, out, repayment, profit, held - d * held - sold,
+                           d_profit, d2_profit)
+
+
+def profit(params: AttackParams) -> float:
+    return breakdown(params).profit_b
+
+
+def profit_derivatives(params: AttackParams):
+    """``(profit, d profit / d L, d² profit / d L²)`` en ``params.loan_b``."""
+    b = breakdown(params)
+    return b.profit_b, b.d_profit, b.d2_profit
+
+
+def optimal_loan(params: AttackParams, max_loan: Optional[float] = None, samples: int = 16):
+    """Préstamo que maximiza el profit en ``[0, max_loan]`` (por defecto, la liquidez del pool de
+    flash loans); devuelve ``(loan_b, profit_b)``.
+
+    ``profit'`` se muestrea en ``samples`` tramos para aislar sus raíces y cada una se refina con
+    Newton acotado al tramo (bisección si Newton se sale); se comparan con los extremos.
+    """
+    max_loan = params.flash_liquidity_b if max_loan is None else float(max_loan)
+    at = lambda L: breakdown(replace(params, loan_b=L))
+    candidates = [0.0, max_loan]
+    xs = [max_loan * i / samples for i in range(samples + 1)]
+    slopes = [at(x).d_profit for x in xs]
+    for lo, hi, f_lo, f_hi in zip(xs, xs[1:], slopes, slopes[1:]):
+        if f_lo == 0:
+            candidates.append(lo)
+        elif (f_lo > 0) != (f_hi > 0):
+            candidates.append(_newton_bracketed(at, lo, hi, f_lo))
+    best = max(candidates, key=lambda L: at(L).profit_b)
+    return best, at(best).profit_b
+
+
+def _newton_bracketed(at, lo, hi, f_lo, tol=1e-10, max_iter=100):
+    # raíz de d_profit en [lo, hi] (cambia de signo); Newton con la segunda derivada cerrada
+    x = (lo + hi) / 2
+    for _ in range(max_iter):
+        b = at(x)
+        f = b.d_profit
+        if (f > 0) == (f_lo > 0):
+            lo = x
+        else:
+            hi = x
+        step = f / b.d2_profit if b.d2_profit else 0.0
+        nxt = x - step
+        if not (lo < nxt < hi) or step == 0.0:
+            nxt = (lo + hi) / 2
+        if abs(nxt - x) <= tol * max(1.0, abs(x)):
+            return nxt
+        x = nxt
+    return x
+
+
+# --- umbrales de break-even (profit = 0) ---
+def break_even_ltv(params: AttackParams) -> float:
+    """LTV por debajo del cual el ataque deja de ser rentable (el profit es lineal en el LTV)."""
+    b = breakdown(params)
+    per_ltv = b.borrowed_b / params.ltv if params.ltv else breakdown(replace(params, ltv=1.0)).borrowed_b
+    return params.ltv - b.profit_b / per_ltv
+
+
+def break_even_flash_fee(params: AttackParams) -> float:
+    """Fee del flash loan a partir de la cual el ataque deja de ser rentable (lineal en la fee)."""
+    return params.flash_fee + profit(params) / params.loan_b
+
+
+def break_even_amm_fee(params: AttackParams) -> Optional[float]:
+    """Fee del AMM en [0, 1) con profit = 0, o None si el signo del profit no cambia en ese rango."""
+    return _root(lambda f: profit(replace(params, amm_fee=f)), 0.0, 1.0 - 1e-9)
+
+
+def break_even_depth(params: AttackParams, max_scale: float = 1e6) -> Optional[float]:
+    """Factor por el que hay que multiplicar ambas reservas del AMM (mismo precio) para que el
+    ataque deje de ser rentable, o None si no hay cambio de signo en ``[1e-6, max_scale]``."""
+    at = lambda c: profit(replace(params, reserve_a=params.reserve_a * c, reserve_b=params.reserve_b * c))
+    # bisección en escala logarítmica: la profundidad recorre varios órdenes de magnitud
+    root = _root(lambda x: at(math.exp(x)), math.log(1e-6), math.log(max_scale))
+    return None if root is None else math.exp(root)
+
+
+def _root(fn, lo, hi, tol=1e-12, max_iter=200):
+    f_lo, f_hi = fn(lo), fn(hi)
+    if f_lo == 0:
+        return lo
+    if (f_lo > 0) == (f_hi > 0):
+        return None
+    for _ in range(max_iter):
+        mid = (lo + hi) / 2
+        f_mid = fn(mid)
+        if (f_mid > 0) == (f_lo > 0):
+            lo, f_lo = mid, f_mid
+        else:
+            hi = mid
+        if hi - lo <= tol * max(1.0, abs(lo)):
+            break
+    return (lo + hi) / 2
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profit y umbrales de break-even del ataque base, en forma cerrada")
+    parser.add_argument("--loan-b", type=float, default=10_000.0)
+    parser.add_argument("--swap-fraction", type=float, default=0.99)
+    parser.add_argument("--deposit-fraction", type=float, default=0.95)
+    parser.add_argument("--sell-fraction", type=float, default=0.90)
+    args = parser.parse_args(argv)
+    params = AttackParams.from_config(loan_b=args.loan_b, swap_fraction=args.swap_fraction,
+                                      deposit_fraction=args.deposit_fraction, sell_fraction=args.sell_fraction)
+    b = breakdown(params)
+    loan, best = optimal_loan(params)
+    print(f"profit: {b.profit_b:.2f} B (d/dL = {b.d_profit:.6f}, d²/dL² = {b.d2_profit:.3e})")
+    print(f"préstamo óptimo: {loan:.2f} B -> profit {best:.2f} B")
+    print(f"break-even LTV: {break_even_ltv(params):.4f}")
+    print(f"break-even fee del flash loan: {break_even_flash_fee(params):.4%}")
+    for label, value, fmt in (("fee del AMM", break_even_amm_fee(params), "{:.4%}"),
+                              ("profundidad del AMM (x reservas)", break_even_depth(params), "{:.3f}")):
+        print(f"break-even {label}: " + ("sin cambio de signo" if value is None else fmt.format(value)))
+
+
+if __name__ == "__main__":
+    main()
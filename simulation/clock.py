@@ -0,0 +1,101 @@
+"""Reloj de simulación y planificador de bloques deterministas.
+
+El tiempo solo avanza cuando la simulación lo pide (nunca se duerme): cada bloque tiene un
+timestamp fijo ``genesis + número * block_time`` y las acciones de un mismo bloque se ejecutan
+en el orden en que se planificaron, así que dos corridas iguales dan el mismo resultado.
+"""
+import heapq
+import itertools
+
+
+class SimClock:
+    def __init__(self, start: float = 0.0):
+        self.now = float(start)
+    def __call__(self) -> float:
+        return self.now
+    def advance(self, seconds: float):
+        assert seconds >= 0, "time cannot go backwards"
+        self.now += seconds
+    def set(self, timestamp: float):
+        assert timestamp >= self.now, "time cannot go backwards"
+        self.now = float(timestamp)
+
+
+class BlockScheduler:
+    """Agrupa acciones en bloques y avisa a los suscriptores al comienzo de cada bloque.
+
+    En cada bloque primero se llama a los suscriptores (``callback(block, timestamp)``, en orden
+    de suscripción: oráculos, circuit breakers, actores...) y después a las acciones planificadas
+    para ese bloque.
+    """
+    def __init__(self, clock: SimClock = None, block_time: float = 12.0, start_block: int = 0):
+        self.clock = clock if clock is not None else SimClock()
+        self.block_time = float(block_time)
+        self.block = start_block
+        self.genesis = self.clock() - start_block * self.block_time
+        self._queue = []  # (block, seq, fn, args)
+        self._seq = itertools.count()
+        self._subscribers = []
+
+    def timestamp(self, block: int) -> float:
+        return self.genesis + block * self.block_time
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def schedule(self, fn, *args, block: int = None, delay: int = 0):
+        """Planifica ``fn(*args)`` en ``block`` (o ``delay`` bloques después del actual)."""
+        target = self.block + delay if block is None else block
+        assert target >= self.block, "cannot schedule in the past"
+        heapq.heappush(self._queue, (target, next(self._seq), fn, args))
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    # la cola es un heap que se modifica in-place: el journal de Transaction guarda una copia
+    def _tx_snapshot(self):
+        return {"block": self.block, "genesis": self.genesis, "_queue": list(self._queue)}
+
+    def _tx_restore(self, state):
+        self.__dict__.update(state)
+
+    def advance(self, blocks: int = 1):
+        """Avanza ``blocks`` bloques, ejecutando ticks y acciones de cada uno."""
+        self.run_until(self.block + blocks)
+
+    def run_until(self, block: int):
+        """Ejecuta todos los bloques hasta ``block`` inclusive.
+
+        El reloj manda: si alguien lo adelantó por fuera del planificador (``clock.advance``) más
+        allá del timestamp del próximo bloque, la grilla de bloques se corre para que ese bloque
+        empiece en el instante actual y los siguientes sigan cada ``block_time``.
+        """
+        while self.block < block:
+            self.block += 1
+            late = self.clock.now - self.timestamp(self.block)
+            if late > 0:
+                self.genesis += late
+            self.clock.set(self.timestamp(self.block))
+            for callback in self._subscribers:
+                callback(self.block, self.clock.now)
+            self._run_due()
+
+    def run_pending(self):
+        """Ejecuta lo planificado para el bloque actual sin avanzar."""
+        self._run_due()
+
+    def run(self):
+        """Avanza hasta vaciar la cola de acciones."""
+        while self._queue:
+            self.run_until(max(self._queue[0][0], self.block))
+            self._run_due()
+
+    def _run_due(self):
+        queue = self._queue
+        while queue and queue[0][0] <= self.block:
+            _, _, fn, args = heapq.heappop(queue)
+            fn(*args)
@@ -0,0 +1,114 @@
+"""Defensas enchufables para el motor de escenarios (``simulation.engine``).
+
+Una defensa puede reemplazar el oráculo o el protocolo de lending del mundo, suscribirlos a los
+ticks de bloque (``attach``) y/o vetar acciones antes de ejecutarlas: ``check`` se usa como pre-check de la transacción de cada paso y debe
+lanzar ``TransactionError`` con el motivo del rechazo. ``make_protocol`` recibe el backend
+numérico del mundo (``num``, ver ``defi.fixedpoint``) con el LTV ya en sus unidades.
+"""
+from defi.fixedpoint import FLOAT
+from defi.lending import LendingProtocol, LendingProtocolWithCircuit, LendingProtocolWithVolatilityCircuit
+from defi.oracle import ExternalFeed, MedianOracle, Oracle, TWAPOracle
+from simulation.transaction import TransactionError
+
+
+class Defense:
+    """Sin defensa: oráculo spot ingenuo y protocolo vulnerable (escenario de control)."""
+    def make_oracle(self, amm, clock):
+        return Oracle(amm)
+    def make_protocol(self, oracle, ltv, num=FLOAT):
+        return LendingProtocol(oracle, ltv, num)
+    def check(self, action, world):
+        return True
+    def attach(self, world):
+        # componentes con on_block(block, timestamp) reciben el tick de cada bloque
+        for component in (world.oracle, world.protocol):
+            if hasattr(component, "on_block"):
+                world.scheduler.subscribe(component.on_block)
+
+
+NoDefense = Defense
+
+
+class CircuitBreakerDefense(Defense):
+    """Lending que pausa borrow si el precio se movió más de ``threshold`` desde la referencia."""
+    def __init__(self, threshold: float = 0.2):
+        self.threshold = threshold
+    def make_protocol(self, oracle, ltv, num=FLOAT):
+        return LendingProtocolWithCircuit(oracle, ltv=ltv, circuit_threshold=self.threshold, num=num)
+
+
+class VolatilityCircuitDefense(Defense):
+    """Lending que pausa borrow si el precio se aleja ``max_sigma`` desvíos de sus medias móviles."""
+    def __init__(self, max_sigma: float = 4.0, windows=(300.0,), min_rel_std: float = 0.005):
+        self.max_sigma = max_sigma
+        self.windows = windows
+        self.min_rel_std = min_rel_std
+    def make_protocol(self, oracle, ltv, num=FLOAT):
+        return LendingProtocolWithVolatilityCircuit(
+            oracle, ltv=ltv, windows=self.windows, max_sigma=self.max_sigma, min_rel_std=self.min_rel_std,
+            num=num)
+    def attach(self, world):
+        # las ventanas se miden en el reloj de la simulación
+        world.protocol.clock = world.clock
+        world.protocol.last_time = world.clock()
+        super().attach(world)
+
+
+class SlippageDefense(Defense):
+    """Rechaza swaps cuyo price impact cotizado supera ``max_slippage``."""
+    def __init__(self, max_slippage: float = 0.10):
+        self.max_slippage = max_slippage
+    def check(self, action, world):
+        impact = action.price_impact(world)
+        if impact is not None and impact > self.max_slippage:
+            raise TransactionError(f"Slippage {impact:.2%} supera MAX_SLIPPAGE ({self.max_slippage:.2%})")
+        return True
+
+
+class PerTxCapDefense(Defense):
+    """Limita cuánto B puede usarse en una única transacción."""
+    def __init__(self, cap_b: float = 5000.0):
+        self.cap_b = cap_b
+    def check(self, action, world):
+        used_b = action.b_in(world)
+        if used_b is not None and world.num.to_float(used_b) > self.cap_b:
+            raise TransactionError(f"Superó el límite PER_TX_CAP_B ({self.cap_b}), transacción cancelada")
+        return True
+
+
+class OracleDefense(Defense):
+    """Reemplaza el oráculo spot por ``oracle_cls(amm, **kwargs)``."""
+    def __init__(self, oracle_cls, **kwargs):
+        self.oracle_cls = oracle_cls
+        self.kwargs = kwargs
+    def make_oracle(self, amm, clock):
+        return self.oracle_cls(amm, **self.kwargs)
+
+
+class TWAPDefense(Defense):
+    """Valúa el colateral con un TWAP de ``window_seconds`` sobre el reloj de la simulación.
+
+    ``history_seconds`` precarga el acumulador como si el precio inicial se hubiera mantenido
+    ese tiempo (por defecto, una ventana completa).
+    """
+    def __init__(self, window_seconds: float = 300.0, history_seconds: float = None):
+        self.window_seconds = window_seconds
+        self.history_seconds = window_seconds if history_seconds is None else history_seconds
+    def make_oracle(self, amm, clock):
+        return TWAPOracle(amm, clock, window_seconds=self.window_seconds, history_seconds=self.history_seconds)
+
+
+class MedianOracleDefense(Defense):
+    """Valúa el colateral con la mediana (o media recortada) de varias fuentes: el spot del AMM,
+    un TWAP por cada ventana de ``twap_windows`` y, con ``external=True``, un feed externo fijo
+    en el precio inicial."""
+    def __init__(self, twap_windows=(300.0, 1800.0), external: bool = True, trim: float = 0.0):
+        self.twap_windows = tuple(twap_windows)
+        self.external = external
+        self.trim = trim
+    def make_oracle(self, amm, clock):
+        feeds = [Oracle(amm)]
+        feeds += [TWAPOracle(amm, clock, window_seconds=w, history_seconds=w) for w in self.twap_windows]
+        if self.external:
+            feeds.append(ExternalFeed(amm.price_a_in_b()))
+        return MedianOracle(feeds, trim=self.trim)
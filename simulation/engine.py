@@ -0,0 +1,356 @@
+"""Motor declarativo de escenarios: mundo (parámetros de ``utils.config``) + lista ordenada de
+acciones + defensa enchufable.
+
+``run_scenario`` ejecuta el ataque completo como una transacción atómica; cada acción es una
+transacción anidada, así que un rechazo en cualquier paso revierte también los anteriores
+(incluido el flash loan). En modo headless (por defecto) no imprime ni formatea nada y devuelve
+un ``ScenarioResult``; con ``verbose=True`` muestra el estado y el resumen de cada paso.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import utils.config as config
+from defi.amm import AMM
+from defi.fixedpoint import BACKENDS, FLOAT
+from defi.flashloan import FlashLoanPool
+from defi.lending import CircuitBreakerError
+from defi.models import Actor
+from simulation.clock import BlockScheduler, SimClock
+from simulation.defenses import Defense
+from simulation.fork import fork
+from simulation.transaction import Transaction, TransactionError
+from utils.printer import pretty
+
+CONFIG_NAMES = (
+    "AMM_RESERVE_A",
+    "AMM_RESERVE_B",
+    "AMM_FEE",
+    "FLASH_POOL_LIQUIDITY_B",
+    "FLASH_POOL_FEE",
+    "LENDING_LTV",
+    "ATTACKER_INITIAL_A",
+)
+
+# errores que revierten la transacción de un paso (y con ella todo el ataque)
+REVERT_ERRORS = (TransactionError, CircuitBreakerError, AssertionError)
+
+
+@dataclass
+class World:
+    amm: object
+    oracle: object
+    pool: FlashLoanPool
+    protocol: object
+    attacker: Actor
+    loan_b: float = 0.0
+    clock: SimClock = field(default_factory=SimClock)
+    scheduler: Optional[BlockScheduler] = None
+    liquidations: list = field(default_factory=list)
+    # backend de montos: defi.fixedpoint.FLOAT (floats) o WAD_MATH (enteros de 18 decimales)
+    num: object = FLOAT
+
+    def __post_init__(self):
+        if self.scheduler is None:
+            self.scheduler = BlockScheduler(self.clock)
+
+    def objects(self):
+        return [self.attacker, self.amm, self.pool, self.protocol]
+
+    def components(self):
+        """Todo lo que un ataque puede modificar: ``objects()`` más el oráculo (y sus feeds), el
+        reloj y el planificador, que avanzan con ``AdvanceBlocks``."""
+        oracles = [self.oracle] + list(getattr(self.oracle, "feeds", ()))
+        return [self] + self.objects() + oracles + [self.clock, self.scheduler]
+
+    def fork(self) -> "World":
+        """Mundo independiente con el estado actual (``simulation.fork``): AMM, oráculos, pools,
+        lending, actores, reloj y planificador propios, compartiendo lo inmutable."""
+        return fork(self)
+
+
+def config_params(overrides: Optional[dict] = None) -> dict:
+    """Parámetros del mundo: valores de ``utils.config`` pisados por ``overrides``."""
+    params = {name: getattr(config, name) for name in CONFIG_NAMES}
+    if overrides:
+        unknown = set(overrides) - set(params)
+        if unknown:
+            raise ValueError(f"Unknown config parameters: {sorted(unknown)}")
+        params.update(overrides)
+    return params
+
+
+def build_world(defense: Optional[Defense] = None, overrides: Optional[dict] = None,
+                amm_factory: Callable = AMM, backend: str = "float") -> World:
+    """``amm_factory(reserve_a, reserve_b, fee)`` crea el pool (``AMM`` o uno con su misma interfaz,
+    p. ej. ``ConcentratedAMM.from_reserves``). ``backend="fixed"`` arma el AMM, el pool de flash
+    loans y el lending en enteros WAD (``defi.fixedpoint``) con redondeo on-chain; solo el ``AMM``
+    x*y=k tiene ese backend."""
+    num = BACKENDS.get(backend)
+    if num is None:
+        raise ValueError(f"Unknown backend: {backend!r}")
+    if num is not FLOAT and amm_factory is not AMM:
+        raise ValueError(f"El backend {backend!r} solo admite el AMM x*y=k")
+    p = config_params(overrides)
+    defense = defense or Defense()
+    clock = SimClock()
+    amount = num.amount
+    if num is FLOAT:
+        amm = amm_factory(p["AMM_RESERVE_A"], p["AMM_RESERVE_B"], p["AMM_FEE"])
+    else:
+        amm = AMM(amount(p["AMM_RESERVE_A"]), amount(p["AMM_RESERVE_B"]), amount(p["AMM_FEE"]), num)
+    oracle = defense.make_oracle(amm, clock)
+    pool = FlashLoanPool(amount(p["FLASH_POOL_LIQUIDITY_B"]), amount(p["FLASH_POOL_FEE"]), num)
+    protocol = defense.make_protocol(oracle, amount(p["LENDING_LTV"]), num)
+    attacker = Actor(a=amount(p["ATTACKER_INITIAL_A"]), b=num.zero)
+    world = World(amm, oracle, pool, protocol, attacker, loan_b=num.zero, clock=clock, num=num)
+    defense.attach(world)
+    return world
+
+
+# --- Acciones ---
+class Action:
+    """Un paso del escenario; se ejecuta dentro de su propia transacción anidada."""
+    name = "tx"
+    title = ""
+
+    def apply(self, world: World):
+        raise NotImplementedError
+    def post_check(self, world: World) -> bool:
+        return True
+    def b_in(self, world: World) -> Optional[float]:
+        """B que el paso mete en el mercado (para límites por transacción)."""
+        return None
+    def price_impact(self, world: World) -> Optional[float]:
+        """Price impact cotizado del paso, si mueve el precio del AMM."""
+        return None
+    def summary(self, before: dict, after: dict, world: World) -> Optional[str]:
+        return None
+
+
+@dataclass
+class FlashLoan(Action):
+    amount_b: float = 10_000.0
+    name: str = "TX-Step1"
+    title: str = "1) Toma flash loan en B"
+
+    def apply(self, world):
+        amount_b = world.num.amount(self.amount_b)
+        world.attacker.b += world.pool.borrow(amount_b)
+        world.loan_b += amount_b
+
+
+@dataclass
+class SwapBForA(Action):
+    fraction: float = 0.99
+    name: str = "TX-Step2"
+    title: str = "2) Manipula precio en AMM (B -> A)"
+
+    def b_in(self, world):
+        return world.num.scale(world.attacker.b, self.fraction)
+    def price_impact(self, world):
+        return world.amm.price_impact_b_for_a(self.b_in(world))
+    def apply(self, world):
+        used_b = self.b_in(world)
+        got_a = world.amm.swap_b_for_a(used_b)
+        world.attacker.b -= used_b
+        world.attacker.a += got_a
+    def post_check(self, world):
+        return world.attacker.b >= 0 and world.amm.a > 0 and world.amm.b > 0
+    def summary(self, before, after, world):
+        amm, attacker, amm2, attacker2 = _summary_fields(before, after, world, world.amm, world.attacker)
+        return (f"[SUMMARY {self.name}] B gastado={attacker['b'] - attacker2['b']:.2f}, "
+                f"A recibida={attacker2['a'] - attacker['a']:.2f}, "
+                f"AMM A: {amm['a']:.2f} -> {amm2['a']:.2f}, AMM B: {amm['b']:.2f} -> {amm2['b']:.2f}")
+
+
+@dataclass
+class DepositAndBorrow(Action):
+    fraction: float = 0.95
+    name: str = "TX-Step3"
+    title: str = "3) Deposita A inflado como colateral y pide B"
+
+    def apply(self, world):
+        deposit_a = world.num.scale(world.attacker.a, self.fraction)
+        world.attacker.a -= deposit_a
+        world.protocol.deposit_collateral_a(deposit_a)
+        amount_borrow = world.protocol.max_borrowable_b()
+        world.protocol.borrow_b(amount_borrow)
+        world.attacker.b += amount_borrow
+    def post_check(self, world):
+        return world.attacker.a >= 0 and world.protocol.debt_b >= 0
+    def summary(self, before, after, world):
+        attacker, protocol, attacker2, protocol2 = _summary_fields(
+            before, after, world, world.attacker, world.protocol)
+        return (f"[SUMMARY {self.name}] A depositada={attacker['a'] - attacker2['a']:.2f}, "
+                f"B recibido={attacker2['b'] - attacker['b']:.2f}, "
+                f"collateral: {protocol['collateral_a']} -> {protocol2['collateral_a']}, "
+                f"debt: {protocol['debt_b']} -> {protocol2['debt_b']}")
+
+
+@dataclass
+class SwapAForB(Action):
+    fraction: float = 0.90
+    name: str = "TX-Step4"
+    title: str = "4) Revierte el precio en AMM (A -> B)"
+
+    def a_in(self, world):
+        return world.num.scale(world.attacker.a, self.fraction)
+    def price_impact(self, world):
+        return world.amm.price_impact_a_for_b(self.a_in(world))
+    def apply(self, world):
+        sold_a = self.a_in(world)
+        out_b = world.amm.swap_a_for_b(sold_a)
+        world.attacker.a -= sold_a
+        world.attacker.b += out_b
+    def post_check(self, world):
+        a = world.attacker
+        return a.a >= 0 and a.b >= 0 and world.amm.a > 0 and world.amm.b > 0
+    def summary(self, before, after, world):
+        amm, attacker, amm2, attacker2 = _summary_fields(before, after, world, world.amm, world.attacker)
+        return (f"[SUMMARY {self.name}] A vendida={attacker['a'] - attacker2['a']:.2f}, "
+                f"B recibida={attacker2['b'] - attacker['b']:.2f}, "
+                f"AMM A: {amm['a']:.2f} -> {amm2['a']:.2f}, AMM B: {amm['b']:.2f} -> {amm2['b']:.2f}")
+
+
+@dataclass
+class RepayFlashLoan(Action):
+    name: str = "TX-Step5"
+    title: str = "5) Paga el flash loan + comisión"
+
+    def apply(self, world):
+        fee = world.num.fee(world.loan_b, world.pool.fee)
+        repayment = world.loan_b + fee
+        if world.attacker.b < repayment:
+            raise TransactionError("El atacante no puede repagar el flash loan")
+        world.attacker.b -= repayment
+        world.pool.repay(repayment)
+        world.loan_b = world.num.zero
+
+
+@dataclass
+class AdvanceBlocks(Action):
+    """Deja pasar bloques (p. ej. para sostener el precio manipulado frente a un TWAP)."""
+    blocks: int = 1
+    name: str = "TX-Wait"
+    title: str = "Avanzan los bloques"
+
+    def apply(self, world):
+        world.scheduler.advance(self.blocks)
+
+
+@dataclass
+class LiquidationCascade(Action):
+    """Liquidadores barren las cuentas del book que quedaron bajo su precio de liquidación y
+    venden el colateral en el AMM. Requiere que ``world.protocol`` sea una cuenta de un
+    ``MultiAccountLendingProtocol``; el book entero se enlista en la transacción del paso."""
+    close_factor: float = 0.5
+    bonus: float = 0.05
+    name: str = "TX-Liquidations"
+    title: str = "Cascada de liquidaciones"
+
+    def apply(self, world):
+        from defi.liquidation import cascade, index_for
+        book = world.protocol.book
+        with Transaction([book], name=self.name):
+            report = cascade(index_for(book), world.amm, self.close_factor, self.bonus)
+        world.liquidations = world.liquidations + report.liquidations
+    def summary(self, before, after, world):
+        return f"[SUMMARY {self.name}] cuentas liquidadas={len({l.account for l in world.liquidations})}"
+
+
+def base_attack(loan_b: float = 10_000.0, swap_fraction: float = 0.99,
+                deposit_fraction: float = 0.95, sell_fraction: float = 0.90) -> List[Action]:
+    """Secuencia clásica: flash loan, manipulación, deposit + borrow, venta y repago."""
+    return [
+        FlashLoan(loan_b),
+        SwapBForA(swap_fraction),
+        DepositAndBorrow(deposit_fraction),
+        SwapAForB(sell_fraction),
+        RepayFlashLoan(),
+    ]
+
+
+# --- Especificación y resultado ---
+@dataclass
+class ScenarioSpec:
+    name: str = "scenario"
+    actions: List[Action] = field(default_factory=base_attack)
+    defense: Defense = field(default_factory=Defense)
+    config: dict = field(default_factory=dict)
+    amm_factory: Callable = AMM
+    backend: str = "float"
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    completed: bool
+    profit_b: float
+    steps: int
+    reverted_at: Optional[str] = None
+    reason: Optional[str] = None
+
+    @property
+    def blocked(self) -> bool:
+        """True si la defensa (o el propio mercado) dejó el ataque sin ganancia."""
+        return not self.completed or self.profit_b <= 0
+
+
+def run_scenario(spec: ScenarioSpec, verbose: bool = False, profiler=None,
+                 world: Optional[World] = None) -> ScenarioResult:
+    """Ejecuta ``spec``; ``profiler`` (``utils.profiling.Profiler``) recoge stats de cada transacción.
+
+    ``world`` reemplaza al mundo que se armaría desde ``spec`` (p. ej. un ``World.fork()`` de uno
+    ya armado con la misma defensa); el escenario lo modifica.
+    """
+    if world is None:
+        world = build_world(spec.defense, spec.config, spec.amm_factory, spec.backend)
+    defense = spec.defense
+    initial_b = world.attacker.b
+    if verbose:
+        pretty("Estado inicial", world.amm, world.pool, world.protocol, world.attacker, world.num)
+    steps = 0
+    action = None
+    try:
+        # el ataque entero es atómico: cualquier paso revertido deshace también los anteriores,
+        # incluidos los bloques que pasaron (historia de los oráculos, reloj y planificador)
+        with Transaction(world.components(), name=spec.name, logger=profiler):
+            for action in spec.actions:
+                on_commit = None
+                if verbose:
+                    on_commit = lambda before, after: _print_summary(action, before, after, world)
+                with Transaction(
+                    world.objects(),
+                    name=action.name,
+                    pre_check=lambda: defense.check(action, world),
+                    post_check=lambda: action.post_check(world),
+                    on_commit=on_commit,
+                    logger=profiler,
+                ):
+                    action.apply(world)
+                steps += 1
+                if verbose:
+                    pretty(action.title, world.amm, world.pool, world.protocol, world.attacker, world.num)
+    except REVERT_ERRORS as e:
+        if verbose:
+            print(f"[{action.name}] Transacción revertida: {e}")
+            print(f"[ESCENARIO] El ataque se revirtió en {action.name}; finalizando la simulación.")
+        profit_b = world.num.to_float(world.attacker.b - initial_b)
+        return ScenarioResult(spec.name, False, profit_b, steps, action.name, str(e))
+    profit_b = world.num.to_float(world.attacker.b - initial_b)
+    if verbose:
+        print(f"\n>>> Ganancia neta del atacante (en B) después de repagar el flash loan: {profit_b:.2f} B\n")
+    return ScenarioResult(spec.name, True, profit_b, steps)
+
+
+def _summary_fields(before, after, world, *objects):
+    # campos de cada objeto antes y después, con los montos del backend llevados a float
+    f = world.num.to_float
+    fields = lambda state: {k: f(v) for k, v in state.items() if k in ("a", "b", "collateral_a", "debt_b")}
+    return [fields(before[id(obj)]) for obj in objects] + [fields(after[id(obj)]) for obj in objects]
+
+
+def _print_summary(action, before, after, world):
+    line = action.summary(before, after, world)
+    if line:
+        print(line)
@@ -0,0 +1,158 @@
+"""Forks baratos del mundo de simulación para búsquedas en árbol sobre secuencias de ataque.
+
+``fork(obj)`` copia el grafo de componentes alcanzable desde ``obj`` (AMM, oráculos, pool de
+flash loans, lending, actores, reloj, planificador...) sin pasar por ``deepcopy``:
+
+- los valores inmutables (números, strings, tuplas de ellos) se comparten;
+- los contenedores (listas, dicts, heaps, arrays de NumPy) se copian una vez, sin recorrer sus
+  elementos inmutables;
+- las referencias entre componentes se recablean al componente copiado, incluidos los
+  suscriptores de ``Listeners`` y del planificador (métodos ligados y ``partial``), así que el
+  fork publica sus cambios a sus propios oráculos y breakers y nunca a los del original;
+- los atributos que una clase nombra en ``_fork_shared`` se comparten tal cual: estructuras
+  que el componente nunca modifica in-place (las reemplaza al cambiarlas) o que ya son
+  copy-on-write, como la historia del TWAP.
+
+Un fork no ve las transacciones abiertas del original: copia su estado actual y queda sin
+enlistar.
+"""
+import array
+import copy
+from collections import deque
+from decimal import Decimal
+from functools import partial
+from types import BuiltinFunctionType, FunctionType, MethodType
+
+import numpy as np
+
+from defi.events import Listeners
+from defi.fixedpoint import FloatMath, WadMath
+
+_ATOMIC = {
+    type(None), bool, int, float, complex, str, bytes, Decimal, range, type,
+    FunctionType, BuiltinFunctionType,
+    # backends numéricos de los componentes: no tienen estado
+    FloatMath, WadMath,
+}
+
+# clase -> atributos compartidos
+_CLASSES = {}
+
+
+def fork(obj):
+    """Copia independiente de ``obj`` y de todo lo que alcanza, compartiendo lo inmutable."""
+    return _fork(obj, {})
+
+
+def _fork(obj, memo):
+    cls = type(obj)
+    if cls in _ATOMIC:
+        return obj
+    key = id(obj)
+    if key in memo:
+        return memo[key]
+    copier = _COPIERS.get(cls)
+    if copier is None:
+        if isinstance(obj, np.generic):
+            return obj
+        copier = _fork_object if hasattr(obj, "__dict__") else _fork_fallback
+    return copier(obj, memo)
+
+
+def _fork_object(obj, memo):
+    cls = type(obj)
+    shared = _CLASSES.get(cls)
+    if shared is None:
+        shared = _CLASSES[cls] = frozenset(getattr(cls, "_fork_shared", ()))
+    new = object.__new__(cls)
+    memo[id(obj)] = new
+    atomic = _ATOMIC
+    state = new.__dict__
+    for name, value in obj.__dict__.items():
+        state[name] = value if type(value) in atomic or name in shared else _fork(value, memo)
+    return new
+
+
+def _fork_items(items, memo):
+    return [x if type(x) in _ATOMIC else _fork(x, memo) for x in items]
+
+
+def _fork_list(obj, memo):
+    new = type(obj)()
+    memo[id(obj)] = new
+    new.extend(_fork_items(obj, memo))
+    return new
+
+
+def _fork_tuple(obj, memo):
+    items = _fork_items(obj, memo)
+    # una tupla cuyos elementos no cambiaron se comparte
+    if all(a is b for a, b in zip(items, obj)):
+        return obj
+    return tuple(items)
+
+
+def _fork_dict(obj, memo):
+    new = {}
+    memo[id(obj)] = new
+    for k, v in obj.items():
+        new[k] = v if type(v) in _ATOMIC else _fork(v, memo)
+    return new
+
+
+def _fork_set(obj, memo):
+    new = type(obj)(_fork_items(obj, memo))
+    memo[id(obj)] = new
+    return new
+
+
+def _fork_deque(obj, memo):
+    new = deque(maxlen=obj.maxlen)
+    memo[id(obj)] = new
+    new.extend(_fork_items(obj, memo))
+    return new
+
+
+def _fork_method(obj, memo):
+    return MethodType(obj.__func__, _fork(obj.__self__, memo))
+
+
+def _fork_partial(obj, memo):
+    keywords = {k: _fork(v, memo) for k, v in obj.keywords.items()}
+    return partial(_fork(obj.func, memo), *_fork_items(obj.args, memo), **keywords)
+
+
+def _fork_copy(obj, memo):
+    new = obj.copy()
+    memo[id(obj)] = new
+    return new
+
+
+def _fork_array(obj, memo):
+    new = array.array(obj.typecode, obj)
+    memo[id(obj)] = new
+    return new
+
+
+def _fork_fallback(obj, memo):
+    # objetos sin __dict__ (iteradores de itertools, ...): su propia copia superficial
+    new = copy.copy(obj)
+    memo[id(obj)] = new
+    return new
+
+
+_COPIERS = {
+    list: _fork_list,
+    Listeners: _fork_list,
+    tuple: _fork_tuple,
+    dict: _fork_dict,
+    set: _fork_set,
+    frozenset: _fork_set,
+    deque: _fork_deque,
+    bytearray: _fork_copy,
+    array.array: _fork_array,
+    np.ndarray: _fork_copy,
+    MethodType: _fork_method,
+    partial: _fork_partial,
+}
+
@@ -0,0 +1,402 @@
+"""Fuzzer de invariantes para el AMM, el pool de flash loans y el lending.
+
+Cada secuencia arranca de un estado al azar (reservas, liquidez y fees en escala logarítmica,
+con razones de reservas extremas) y aplica ``steps`` operaciones al azar: swaps en los dos
+sentidos, flash loans (borrow + repago con fee), depósitos de colateral y borrows cerca del
+límite del LTV. Después de cada operación aceptada se chequean los invariantes:
+
+- ``reserves_positive``: las reservas del AMM siguen siendo positivas y finitas;
+- ``k_non_decreasing``: ``a * b`` no baja tras un swap (con tolerancia relativa ``k_rtol``);
+- ``swap_output_non_negative``: un swap nunca le cobra al trader del lado de salida;
+- ``flash_liquidity_restored``: tras borrow + repago, el pool tiene al menos la liquidez previa;
+- ``ltv_respected``: un borrow aceptado no deja la deuda por encima de ``colateral * precio * ltv``
+  (con tolerancia relativa ``LTV_RTOL``) si antes no lo estaba; si el precio ya la dejó bajo el
+  agua, es trabajo de la liquidación. El chequeo no usa la tolerancia absoluta del componente, que
+  a escala chica deja pedir más que el LTV.
+
+Las secuencias corren de a ``lanes`` a la vez sobre arrays (``BatchAMM`` y arrays para el pool y
+el lending, con las mismas fórmulas que los componentes escalares) y los lotes se reparten en un
+pool de procesos. Cada falla se confirma con los componentes reales (``AMM``, ``Oracle``,
+``FlashLoanPool``, ``LendingProtocol``) y se achica a una secuencia mínima: se quitan operaciones
+mientras la falla persista y después se simplifican los montos y el estado inicial.
+
+    python -m simulation.fuzz --sequences 1000000 --workers 8
+"""
+import argparse
+import json
+import math
+import os
+import time
+from dataclasses import asdict, dataclass, field, replace
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from defi.amm import AMM
+from defi.amm_batch import BatchAMM
+from defi.flashloan import FlashLoanPool
+from defi.lending import LendingProtocol
+from defi.oracle import Oracle
+
+OPS = ("swap_a_for_b", "swap_b_for_a", "flash_loan", "deposit", "borrow")
+SWAP_A_FOR_B, SWAP_B_FOR_A, FLASH_LOAN, DEPOSIT, BORROW = range(len(OPS))
+
+INVARIANTS = (
+    "reserves_positive", "k_non_decreasing", "swap_output_non_negative",
+    "flash_liquidity_restored", "ltv_respected",
+)
+
+# tolerancias de los asserts de los componentes (FlashLoanPool.borrow, LendingProtocol.borrow_b):
+# el lote las usa para decidir qué operaciones aceptaría el componente
+FLASH_EPS = 1e-12
+LTV_EPS = 1e-9
+# tolerancia del invariante ``ltv_respected``: relativa e independiente de la del componente
+LTV_RTOL = 1e-12
+
+
+@dataclass(frozen=True)
+class FuzzConfig:
+    steps: int = 32
+    reserve_exp: Tuple[float, float] = (-30.0, 30.0)   # reservas y liquidez: 10**U(lo, hi)
+    amount_exp: Tuple[float, float] = (-20.0, 8.0)     # swaps y depósitos: reserva * 10**U(lo, hi)
+    max_amm_fee: float = 0.05
+    max_flash_fee: float = 0.01
+    over_limit: float = 1.2    # flash loans y borrows piden hasta este múltiplo de lo disponible
+    zero_fee: float = 0.25     # probabilidad de fee exactamente 0
+    k_rtol: float = 1e-12
+
+
+@dataclass(frozen=True)
+class Case:
+    """Una secuencia reproducible: estado inicial y operaciones ``(nombre, monto absoluto)``."""
+    reserve_a: float
+    reserve_b: float
+    amm_fee: float
+    flash_liquidity_b: float
+    flash_fee: float
+    ltv: float
+    ops: Tuple[Tuple[str, float], ...] = ()
+
+
+@dataclass
+class Failure:
+    invariant: str
+    step: int                # operación (en ``case.ops``) que rompe el invariante
+    case: Case               # secuencia mínima
+    original_steps: int      # operaciones hasta la falla antes de achicar
+    seed: int
+    batch: int
+    lane: int
+
+
+@dataclass
+class FuzzReport:
+    sequences: int = 0
+    operations: int = 0
+    failing: Dict[str, int] = field(default_factory=dict)   # secuencias que rompen cada invariante
+    failures: List[Failure] = field(default_factory=list)   # una falla mínima por invariante
+    unconfirmed: int = 0     # fallas del lote que los componentes escalares no reproducen
+    seconds: float = 0.0
+
+
+# --- versión escalar: componentes reales ---
+def check(case: Case, k_rtol: float = FuzzConfig.k_rtol):
+    """Corre ``case`` sobre los componentes reales; ``(step, invariante)`` de la primera falla o None.
+
+    Las operaciones que un componente rechaza (``assert``) no cambian nada y se saltean.
+    """
+    amm = AMM(case.reserve_a, case.reserve_b, case.amm_fee)
+    pool = FlashLoanPool(case.flash_liquidity_b, case.flash_fee)
+    lending = LendingProtocol(Oracle(amm), case.ltv)
+    for step, (op, amount) in enumerate(case.ops):
+        try:
+            broken = _apply(op, amount, amm, pool, lending, k_rtol)
+        except AssertionError:
+            continue
+        if broken is not None:
+            return step, broken
+    return None
+
+
+def _apply(op, amount, amm, pool, lending, k_rtol):
+    if op == "swap_a_for_b" or op == "swap_b_for_a":
+        k = amm.a * amm.b
+        out = amm.swap_a_for_b(amount) if op == "swap_a_for_b" else amm.swap_b_for_a(amount)
+        if not (0 < amm.a < math.inf and 0 < amm.b < math.inf):
+            return "reserves_positive"
+        if amm.a * amm.b < k * (1 - k_rtol):
+            return "k_non_decreasing"
+        if out < 0:
+            return "swap_output_non_negative"
+    elif op == "flash_loan":
+        before = pool.b
+        pool.borrow(amount)
+        pool.repay(amount + amount * pool.fee)
+        if pool.b < before:
+            return "flash_liquidity_restored"
+    elif op == "deposit":
+        lending.deposit_collateral_a(amount)
+    elif op == "borrow":
+        underwater = _over_ltv(lending)
+        lending.borrow_b(amount)
+        if not underwater and _over_ltv(lending):
+            return "ltv_respected"
+    else:
+        raise ValueError(f"operación desconocida: {op}")
+    return None
+
+
+def _over_ltv(lending) -> bool:
+    limit = lending.collateral_a * lending.oracle.price_a_in_b() * lending.ltv
+    return lending.debt_b > limit * (1 + LTV_RTOL)
+
+
+# --- versión vectorizada: un lote de secuencias a la vez ---
+def run_lanes(seed: int, batch: int, lanes: int, config: FuzzConfig = FuzzConfig()):
+    """Genera y corre ``lanes`` secuencias de ``config.steps`` operaciones.
+
+    Devuelve ``(initial, kinds, amounts, first_step, first_invariant)``: el estado inicial por
+    lane (dict de arrays), las operaciones (``steps x lanes``), sus montos absolutos y, por lane,
+    el paso y el índice en ``INVARIANTS`` de la primera falla (-1 si no falla).
+    """
+    rng = np.random.default_rng((seed, batch))
+    steps = config.steps
+    lo, hi = config.reserve_exp
+    log_uniform = lambda size: 10.0 ** rng.uniform(lo, hi, size)
+    fee = lambda top: np.where(rng.random(lanes) < config.zero_fee, 0.0, rng.uniform(0.0, top, lanes))
+    initial = dict(
+        reserve_a=log_uniform(lanes), reserve_b=log_uniform(lanes), amm_fee=fee(config.max_amm_fee),
+        flash_liquidity_b=log_uniform(lanes), flash_fee=fee(config.max_flash_fee), ltv=rng.random(lanes),
+    )
+    kinds = rng.integers(0, len(OPS), (steps, lanes), dtype=np.int8)
+    relative = 10.0 ** rng.uniform(*config.amount_exp, (steps, lanes))
+    fractions = rng.uniform(0.0, config.over_limit, (steps, lanes))
+
+    amm = BatchAMM(initial["reserve_a"], initial["reserve_b"], initial["amm_fee"])
+    pool_b = initial["flash_liquidity_b"].copy()
+    flash_fee = initial["flash_fee"]
+    ltv = initial["ltv"]
+    collateral = np.zeros(lanes)
+    debt = np.zeros(lanes)
+    amounts = np.zeros((steps, lanes))
+    first_step = np.full(lanes, -1)
+    first_invariant = np.full(lanes, -1, dtype=np.int8)
+    one = np.ones(lanes)
+
+    with np.errstate(all="ignore"):
+        for t in range(steps):
+            kind = kinds[t]
+            price = amm.b / amm.a
+            max_borrowable = np.maximum(0.0, collateral * price * ltv - debt)
+            amount = np.select(
+                [kind == SWAP_A_FOR_B, kind == SWAP_B_FOR_A, kind == FLASH_LOAN, kind == DEPOSIT],
+                [amm.a * relative[t], amm.b * relative[t], pool_b * fractions[t], amm.a * relative[t]],
+                max_borrowable * fractions[t],
+            )
+            # un monto no finito no es una operación reproducible: queda en 0
+            amount[~np.isfinite(amount)] = 0.0
+            amounts[t] = amount
+            broken = np.full(lanes, -1, dtype=np.int8)
+
+            # swaps (el AMM rechaza montos <= 0)
+            for op, swap in ((SWAP_A_FOR_B, amm.swap_a_for_b), (SWAP_B_FOR_A, amm.swap_b_for_a)):
+                m = (kind == op) & (amount > 0)
+                if not m.any():
+                    continue
+                k = amm.a * amm.b
+                out = swap(np.where(m, amount, one), where=m)
+                a, b = amm.a, amm.b
+                _mark(broken, m & ~((a > 0) & (a < np.inf) & (b > 0) & (b < np.inf)), "reserves_positive")
+                _mark(broken, m & (a * b < k * (1 - config.k_rtol)), "k_non_decreasing")
+                _mark(broken, m & (out < 0), "swap_output_non_negative")
+
+            # flash loan: borrow + repago en el mismo paso
+            m = (kind == FLASH_LOAN) & (amount <= pool_b + FLASH_EPS)
+            before = pool_b
+            pool_b = np.where(m, (pool_b - amount) + (amount + amount * flash_fee), pool_b)
+            _mark(broken, m & (pool_b < before), "flash_liquidity_restored")
+
+            m = kind == DEPOSIT
+            collateral = np.where(m, collateral + amount, collateral)
+
+            m = (kind == BORROW) & (amount <= max_borrowable + LTV_EPS)
+            limit = collateral * price * ltv * (1 + LTV_RTOL)
+            underwater = debt > limit
+            debt = np.where(m, debt + amount, debt)
+            _mark(broken, m & ~underwater & (debt > limit), "ltv_respected")
+
+            new = (first_step < 0) & (broken >= 0)
+            first_step[new] = t
+            first_invariant[new] = broken[new]
+    return initial, kinds, amounts, first_step, first_invariant
+
+
+def _mark(broken, mask, invariant):
+    # se queda con el primer invariante roto del paso (mismo orden que _apply)
+    np.copyto(broken, INVARIANTS.index(invariant), where=mask & (broken < 0))
+
+
+def lane_case(initial, kinds, amounts, lane: int, steps: Optional[int] = None) -> Case:
+    """La secuencia ``lane`` de un lote como ``Case`` (hasta ``steps`` operaciones)."""
+    steps = kinds.shape[0] if steps is None else steps
+    ops = tuple((OPS[k], a) for k, a in zip(kinds[:steps, lane].tolist(), amounts[:steps, lane].tolist()))
+    return Case(**{name: float(values[lane]) for name, values in initial.items()}, ops=ops)
+
+
+# --- achicado ---
+def shrink(case: Case, invariant: str, k_rtol: float = FuzzConfig.k_rtol) -> Case:
+    """Secuencia mínima que sigue rompiendo ``invariant``: quita operaciones por bloques cada vez
+    más chicos (delta debugging) y después prueba montos y estado inicial más simples."""
+    fails = lambda c: (check(c, k_rtol) or (None, None))[1] == invariant
+    assert fails(case), "the case does not break the invariant"
+    ops = list(case.ops)
+    chunk = max(len(ops) // 2, 1)
+    while chunk >= 1:
+        i = 0
+        while i < len(ops):
+            candidate = ops[:i] + ops[i + chunk:]
+            if fails(replace(case, ops=tuple(candidate))):
+                ops = candidate
+            else:
+                i += chunk
+        chunk //= 2
+    case = replace(case, ops=tuple(ops))
+    # montos más simples, operación por operación
+    for i, (op, amount) in enumerate(case.ops):
+        for simpler in _simpler(amount):
+            ops = list(case.ops)
+            ops[i] = (op, simpler)
+            candidate = replace(case, ops=tuple(ops))
+            if fails(candidate):
+                case = candidate
+                break
+    # estado inicial más simple (fees en 0, valores redondos)
+    for name in ("amm_fee", "flash_fee", "ltv", "reserve_a", "reserve_b", "flash_liquidity_b"):
+        # las reservas del AMM no pueden ser 0 (el oráculo divide por ellas)
+        for simpler in _simpler(getattr(case, name), zero=not name.startswith("reserve")):
+            candidate = replace(case, **{name: simpler})
+            if fails(candidate):
+                case = candidate
+                break
+    return case
+
+
+def _simpler(x: float, zero: bool = True):
+    # candidatos más simples que ``x``, del más simple al menos simple
+    if x == 0 or not math.isfinite(x):
+        return []
+    candidates = [0.0] if zero else []
+    candidates += [1.0, 10.0 ** round(math.log10(abs(x)))]
+    candidates += [float(f"{x:.{digits}g}") for digits in (1, 2, 3)]
+    seen = []
+    for c in candidates:
+        if c != x and c not in seen:
+            seen.append(c)
+    return seen
+
+
+# --- lotes en paralelo ---
+def fuzz_batch(task) -> FuzzReport:
+    """Corre un lote ``(seed, batch, lanes, config)``, confirma sus fallas y achica una por
+    invariante (la que rompe antes)."""
+    seed, batch, lanes, config = task
+    start = time.perf_counter()
+    initial, kinds, amounts, first_step, first_invariant = run_lanes(seed, batch, lanes, config)
+    report = FuzzReport(sequences=lanes, operations=lanes * config.steps)
+    for index, invariant in enumerate(INVARIANTS):
+        lanes_broken = np.flatnonzero(first_invariant == index)
+        if not len(lanes_broken):
+            continue
+        report.failing[invariant] = len(lanes_broken)
+        for lane in lanes_broken[np.argsort(first_step[lanes_broken], kind="stable")].tolist():
+            case = lane_case(initial, kinds, amounts, lane, first_step[lane] + 1)
+            found = check(case, config.k_rtol)
+            if found is None or found[1] != invariant:
+                report.unconfirmed += 1
+                continue
+            minimal = shrink(case, invariant, config.k_rtol)
+            step, _ = check(minimal, config.k_rtol)
+            report.failures.append(Failure(invariant, step, minimal, len(case.ops), seed, batch, lane))
+            break
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def fuzz(sequences: int = 1_000_000, lanes: int = 4096, workers: int = None, seed: int = 0,
+         config: FuzzConfig = FuzzConfig()) -> FuzzReport:
+    """Corre ``sequences`` secuencias en lotes de ``lanes`` sobre un pool de procesos.
+
+    ``workers`` por defecto es el número de cores; con ``workers=1`` corre en el proceso actual.
+    De cada invariante roto queda la falla mínima más corta entre todos los lotes.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(seed, batch, min(lanes, sequences - start), config)
+             for batch, start in enumerate(range(0, sequences, lanes))]
+    start = time.perf_counter()
+    report = FuzzReport()
+    if workers == 1:
+        _merge(report, map(fuzz_batch, tasks))
+    else:
+        with Pool(workers) as pool:
+            _merge(report, pool.imap(fuzz_batch, tasks))
+    report.failures.sort(key=lambda f: INVARIANTS.index(f.invariant))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _merge(report, batches):
+    best = {}
+    for part in batches:
+        report.sequences += part.sequences
+        report.operations += part.operations
+        report.unconfirmed += part.unconfirmed
+        for invariant, count in part.failing.items():
+            report.failing[invariant] = report.failing.get(invariant, 0) + count
+        for failure in part.failures:
+            current = best.get(failure.invariant)
+            if current is None or len(failure.case.ops) < len(current.case.ops):
+                best[failure.invariant] = failure
+    report.failures = list(best.values())
+
+
+def format_failure(failure: Failure) -> str:
+    c = failure.case
+    lines = [
+        f"{failure.invariant}: paso {failure.step} de {len(c.ops)} (antes de achicar: "
+        f"{failure.original_steps}; seed={failure.seed} batch={failure.batch} lane={failure.lane})",
+        f"  AMM a={c.reserve_a!r} b={c.reserve_b!r} fee={c.amm_fee!r}; flash b={c.flash_liquidity_b!r} "
+        f"fee={c.flash_fee!r}; ltv={c.ltv!r}",
+    ]
+    lines += [f"  {i}. {op}({amount!r})" for i, (op, amount) in enumerate(c.ops)]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzzer de invariantes del AMM, el flash loan y el lending")
+    parser.add_argument("--sequences", type=int, default=1_000_000)
+    parser.add_argument("--steps", type=int, default=FuzzConfig.steps)
+    parser.add_argument("--lanes", type=int, default=4096, help="secuencias por lote vectorizado")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k-rtol", type=float, default=FuzzConfig.k_rtol)
+    parser.add_argument("--out", default=None, help="escribe las fallas mínimas como JSON lines")
+    args = parser.parse_args(argv)
+    config = FuzzConfig(steps=args.steps, k_rtol=args.k_rtol)
+    report = fuzz(args.sequences, args.lanes, args.workers, args.seed, config)
+    print(f"{report.sequences} secuencias, {report.operations} operaciones en {report.seconds:.1f} s")
+    for invariant in INVARIANTS:
+        count = report.failing.get(invariant, 0)
+        print(f"  {invariant:<26} {'ok' if not count else f'{count} secuencias lo rompen'}")
+    if report.unconfirmed:
+        print(f"{report.unconfirmed} fallas del lote no se reproducen con los componentes escalares")
+    for failure in report.failures:
+        print(format_failure(failure))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out:
+            for failure in report.failures:
+                out.write(json.dumps(asdict(failure)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Optimizador de ataques: busca la secuencia de acciones más rentable contra una defensa.
+
+Un ataque es un ``AttackPlan``: flash loan de ``loan_b``, la manipulación (``swap_fraction`` del
+B) repartida en ``pump_parts`` swaps iguales, ``wait_blocks`` bloques de espera, deposit + borrow
+de ``deposit_fraction`` de la A, la venta de ``sell_fraction`` repartida en ``dump_parts`` swaps
+y el repago. Partir los swaps es lo que permite pasar por debajo de ``PER_TX_CAP_B`` o repartir
+la manipulación bajo ``MAX_SLIPPAGE``: cada swap es un paso con su propio pre-check.
+
+La búsqueda es un beam search sobre la estructura del plan (partes de cada swap, bloques de
+espera). Cada estructura arranca con los montos de su padre y los ajusta por ascenso
+coordenado: en cada coordenada una grilla gruesa ubica el mejor tramo y una búsqueda de sección
+áurea lo refina. Un plan revertido vale -inf, así que si la ganancia cae de golpe en el límite
+de una defensa la sección áurea converge al borde factible desde adentro. Cada evaluación corre
+el plan headless sobre un fork del mundo armado una sola vez (``World.fork``) y se cachea por
+plan; las estructuras que no mejoran a su padre no se expanden.
+
+Se maximiza la ganancia valuada: el B neto del atacante más la variación de su A al precio spot
+previo al ataque (``ScenarioResult.profit_b`` solo mira B, y vender la A propia no es ganancia).
+
+    python -m simulation.optimizer --defense per_tx_cap --value 5000
+"""
+import argparse
+import math
+import time
+from dataclasses import dataclass, fields, replace
+from typing import List, Optional
+
+from simulation.defenses import Defense
+from simulation.engine import (
+    Action, AdvanceBlocks, DepositAndBorrow, FlashLoan, RepayFlashLoan, ScenarioResult, ScenarioSpec, SwapAForB,
+    SwapBForA, build_world, run_scenario,
+)
+
+# montos continuos del plan, en el orden en que los ajusta el ascenso coordenado
+AMOUNTS = ("loan_b", "swap_fraction", "deposit_fraction", "sell_fraction")
+
+_GOLDEN = (math.sqrt(5) - 1) / 2
+_MIN_FRACTION = 0.01
+
+
+@dataclass(frozen=True)
+class AttackPlan:
+    loan_b: float = 10_000.0
+    swap_fraction: float = 0.99
+    deposit_fraction: float = 0.95
+    sell_fraction: float = 0.90
+    pump_parts: int = 1
+    dump_parts: int = 1
+    wait_blocks: int = 0
+
+    def actions(self) -> List[Action]:
+        actions = [FlashLoan(self.loan_b)]
+        actions += _split(SwapBForA, self.swap_fraction, self.pump_parts)
+        if self.wait_blocks:
+            actions.append(AdvanceBlocks(self.wait_blocks))
+        actions.append(DepositAndBorrow(self.deposit_fraction))
+        actions += _split(SwapAForB, self.sell_fraction, self.dump_parts)
+        actions.append(RepayFlashLoan())
+        return actions
+
+    def structure(self):
+        return self.pump_parts, self.dump_parts, self.wait_blocks
+
+
+def split_fractions(fraction: float, parts: int) -> List[float]:
+    """Fracciones del saldo restante que reparten ``fraction`` del saldo inicial en ``parts``
+    montos iguales."""
+    step = fraction / parts
+    return [step / (1 - i * step) for i in range(parts)]
+
+
+def _split(action_cls, fraction, parts):
+    if parts == 1:
+        return [action_cls(fraction)]
+    name = action_cls().name
+    return [action_cls(f, name=f"{name}.{i + 1}") for i, f in enumerate(split_fractions(fraction, parts))]
+
+
+@dataclass
+class OptimizationResult:
+    plan: AttackPlan
+    result: ScenarioResult
+    value_b: float    # ganancia valuada del mejor plan (0.0 si ningún plan se completa)
+    evaluations: int
+    cache_hits: int
+    structures: int
+    seconds: float
+
+
+class AttackOptimizer:
+    """``defense`` y ``config`` (overrides de ``utils.config``) definen el mundo atacado.
+
+    ``max_parts`` acota cuántos swaps puede tener cada tramo (se prueban potencias de 2);
+    ``max_wait_blocks`` > 0 permite esperar bloques entre la manipulación y el borrow (un flash
+    loan real no sobrevive al bloque: por defecto no se espera). ``grid`` es la cantidad de
+    tramos de la grilla gruesa y ``tol`` la precisión relativa de la sección áurea.
+    """
+    def __init__(self, defense: Optional[Defense] = None, config: Optional[dict] = None, max_parts: int = 16,
+                 max_wait_blocks: int = 0, beam_width: int = 3, grid: int = 8, tol: float = 1e-4,
+                 max_rounds: int = 4, max_evaluations: int = 50_000):
+        self.defense = defense or Defense()
+        self.config = dict(config or {})
+        self.world = build_world(self.defense, self.config)
+        self.max_loan = float(self.world.pool.b)
+        self.price = float(self.world.amm.price_a_in_b())
+        self.max_parts = max_parts
+        self.max_wait_blocks = max_wait_blocks
+        self.beam_width = beam_width
+        self.grid = grid
+        self.tol = tol
+        self.max_rounds = max_rounds
+        self.max_evaluations = max_evaluations
+        self.cache = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+
+    # --- evaluación ---
+    def evaluate(self, plan: AttackPlan):
+        """``(ScenarioResult, ganancia valuada)`` del plan; la ganancia es -inf si se revierte."""
+        cached = self.cache.get(plan)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.evaluations += 1
+        world = self.world.fork()
+        spec = ScenarioSpec("optimizer", plan.actions(), self.defense, self.config)
+        result = run_scenario(spec, world=world)
+        value = -math.inf
+        if result.completed:
+            value = result.profit_b + (world.attacker.a - self.world.attacker.a) * self.price
+        self.cache[plan] = result, value
+        return result, value
+
+    def score(self, plan: AttackPlan) -> float:
+        return self.evaluate(plan)[1]
+
+    # --- búsqueda ---
+    def optimize(self, start: Optional[AttackPlan] = None) -> OptimizationResult:
+        started = time.perf_counter()
+        start = start or AttackPlan()
+        seed, _ = self._seed(start, start)
+        best, best_score = self.tune(seed)
+        beam = [(best_score, best)]
+        seen = {best.structure()}
+        while beam and self.evaluations < self.max_evaluations:
+            children = []
+            for parent_score, parent in beam:
+                for child in self._neighbours(parent):
+                    if child.structure() in seen:
+                        continue
+                    seen.add(child.structure())
+                    seed, limited = self._seed(child, start)
+                    child, child_score = self.tune(seed)
+                    if child_score > best_score:
+                        best, best_score = child, child_score
+                    # poda: una estructura que no mejora a su padre solo se expande si la defensa
+                    # todavía obliga a achicar el plan de partida (partir más puede destrabarlo)
+                    if child_score > parent_score or limited:
+                        children.append((child_score, child))
+            children.sort(key=lambda c: c[0], reverse=True)
+            beam = children[:self.beam_width]
+        result, value = self.evaluate(best)
+        return OptimizationResult(best, result, max(value, 0.0), self.evaluations, self.cache_hits, len(seen),
+                                  time.perf_counter() - started)
+
+    def tune(self, plan: AttackPlan):
+        """Ascenso coordenado sobre los montos de ``plan``; devuelve ``(plan, score)``."""
+        best_score = self.score(plan)
+        for _ in range(self.max_rounds):
+            improved = False
+            for name in AMOUNTS:
+                candidate, score = self._line_search(plan, name)
+                if score > best_score:
+                    improved = improved or score > best_score + self.tol * max(1.0, abs(best_score))
+                    plan, best_score = candidate, score
+            if not improved or self.evaluations >= self.max_evaluations:
+                break
+        return plan, best_score
+
+    def _seed(self, plan, start):
+        """Punto de partida para la estructura de ``plan``: sus montos o los de ``start``, lo que
+        rinda más tras achicarlos hasta que sean factibles. Devuelve ``(plan, limited)``, con
+        ``limited`` True si los montos de ``start`` se revierten con esta estructura."""
+        base = replace(start, pump_parts=plan.pump_parts, dump_parts=plan.dump_parts, wait_blocks=plan.wait_blocks)
+        limited = self.score(base) == -math.inf
+        return max((self._feasible(p) for p in (plan, base)), key=self.score), limited
+
+    def _feasible(self, plan):
+        # bisección sobre una escala del préstamo y de la venta: el mayor plan escalado que no se revierte
+        if self.score(plan) > -math.inf:
+            return plan
+        scaled = lambda s: replace(plan, loan_b=round(plan.loan_b * s, 6), sell_fraction=round(plan.sell_fraction * s, 9))
+        lo, hi = 0.0, 1.0
+        for _ in range(20):
+            mid = (lo + hi) / 2
+            if self.score(scaled(mid)) > -math.inf:
+                lo = mid
+            else:
+                hi = mid
+        return scaled(lo) if lo > 0 else plan
+
+    def _line_search(self, plan, name):
+        lo, hi = self._bounds(name)
+        f = lambda x: self.score(self._with(plan, name, x))
+        xs = [lo + (hi - lo) * i / self.grid for i in range(self.grid + 1)]
+        scores = [f(x) for x in xs]
+        current = getattr(plan, name)
+        best_x, best = current, f(current)
+        i = max(range(len(xs)), key=scores.__getitem__)
+        if scores[i] > best:
+            best_x, best = xs[i], scores[i]
+        if best == -math.inf:
+            return self._with(plan, name, best_x), best
+        # sección áurea en el tramo de la grilla alrededor del mejor punto
+        i = min(range(len(xs)), key=lambda j: abs(xs[j] - best_x))
+        a, b = xs[max(i - 1, 0)], xs[min(i + 1, self.grid)]
+        c, d = b - _GOLDEN * (b - a), a + _GOLDEN * (b - a)
+        fc, fd = f(c), f(d)
+        while b - a > self.tol * (hi - lo):
+            if fd > fc:
+                a, c, fc = c, d, fd
+                d = a + _GOLDEN * (b - a)
+                fd = f(d)
+            else:
+                b, d, fd = d, c, fc
+                c = b - _GOLDEN * (b - a)
+                fc = f(c)
+        for x, score in ((c, fc), (d, fd)):
+            if score > best:
+                best_x, best = x, score
+        return self._with(plan, name, best_x), best
+
+    def _bounds(self, name):
+        if name == "loan_b":
+            return self.max_loan * 1e-3, self.max_loan
+        return _MIN_FRACTION, 1.0
+
+    def _with(self, plan, name, value):
+        # redondeo para que la caché reconozca los mismos puntos desde distintos caminos
+        return replace(plan, **{name: round(value, 6 if name == "loan_b" else 9)})
+
+    def _neighbours(self, plan):
+        if plan.pump_parts * 2 <= self.max_parts:
+            yield replace(plan, pump_parts=plan.pump_parts * 2)
+        if plan.dump_parts * 2 <= self.max_parts:
+            yield replace(plan, dump_parts=plan.dump_parts * 2)
+        if plan.wait_blocks < self.max_wait_blocks:
+            yield replace(plan, wait_blocks=plan.wait_blocks + 1)
+
+
+def optimize_attack(defense: Optional[Defense] = None, config: Optional[dict] = None, **kwargs) -> OptimizationResult:
+    """Plan más rentable contra ``defense`` (ver ``AttackOptimizer`` para los parámetros)."""
+    return AttackOptimizer(defense, config, **kwargs).optimize()
+
+
+def format_plan(plan: AttackPlan) -> str:
+    return ", ".join(f"{f.name}={getattr(plan, f.name):g}" for f in fields(plan))
+
+
+def main(argv=None):
+    from simulation.sweep import DEFENSES, make_defense
+
+    parser = argparse.ArgumentParser(description="Busca el ataque más rentable contra una defensa")
+    parser.add_argument("--defense", default="none", choices=["none"] + sorted(DEFENSES))
+    parser.add_argument("--value", type=float, default=None, help="umbral de la defensa")
+    parser.add_argument("--max-parts", type=int, default=16)
+    parser.add_argument("--max-wait-blocks", type=int, default=0)
+    parser.add_argument("--beam-width", type=int, default=3)
+    args = parser.parse_args(argv)
+    point = {"defense": args.defense}
+    if args.value is not None and args.defense != "none":
+        point[DEFENSES[args.defense][0]] = args.value
+    out = optimize_attack(make_defense(point), max_parts=args.max_parts, max_wait_blocks=args.max_wait_blocks,
+                          beam_width=args.beam_width)
+    if out.value_b <= 0:
+        print("ningún plan rentable: la defensa resiste")
+    print(f"plan: {format_plan(out.plan)}")
+    status = "completo" if out.result.completed else f"revertido en {out.result.reverted_at}: {out.result.reason}"
+    print(f"ganancia valuada: {out.value_b:.2f} B, B neto: {out.result.profit_b:.2f} ({status})")
+    print(f"{out.evaluations} evaluaciones, {out.cache_hits} aciertos de caché, "
+          f"{out.structures} estructuras, {out.seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""Replay de logs históricos de swaps, liquidez y borrows a través del AMM, los oráculos y el lending.
+
+Los eventos se leen en bloques de ``chunk_rows`` filas: de un CSV con columnas ``timestamp``,
+``kind``, ``amount_a`` y ``amount_b`` (con el lector de ``csv``, fila a fila), o de un binario de
+registros ``EVENT_DTYPE`` mapeado con ``np.memmap`` (solo se leen las páginas del bloque en
+curso). La memoria queda acotada por el tamaño del bloque, no por el del log; ``write_binary``
+convierte un CSV una sola vez para los replays siguientes.
+
+Todas las defensas miran el mismo mercado: hay un único ``AMM`` y cada defensa arma su oráculo y
+su protocolo sobre él (como en ``build_world``), con el mismo reloj y los mismos bloques. Antes
+de cada swap se pregunta a ``check`` si lo habría rechazado (el swap se aplica igual: ya
+ocurrió); después de cada evento se mide si el borrow quedaría pausado y cuánto se aleja el
+precio del oráculo del spot. Los eventos ``borrow`` (colateral ``amount_a``, préstamo
+``amount_b``) sí pasan por ``deposit_collateral_a`` y ``borrow_b`` del protocolo de cada defensa,
+dentro de una ``Transaction``: se cuentan los que esa defensa rechaza (pausa o LTV contra su
+oráculo) y los aceptados quedan como deuda. Las posiciones se acumulan en la única cuenta del
+protocolo, así que el margen que deja un borrow lo puede usar el siguiente.
+
+    python -m simulation.replay swaps.csv --reserves 5000000 10000000
+    python -m simulation.replay swaps.csv --to-binary swaps.bin
+    python -m simulation.replay swaps.bin --block-time 12
+"""
+import argparse
+import csv
+import itertools
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+
+from defi.amm import AMM
+from simulation.clock import BlockScheduler, SimClock
+from simulation.defenses import Defense
+from simulation.engine import REVERT_ERRORS, Action, World, config_params
+from simulation.sweep import DEFENSES
+from simulation.transaction import Transaction, TransactionError
+
+SWAP_A_FOR_B, SWAP_B_FOR_A, ADD_LIQUIDITY, REMOVE_LIQUIDITY, BORROW = range(5)
+KINDS = {
+    "swap_a_for_b": SWAP_A_FOR_B,
+    "swap_b_for_a": SWAP_B_FOR_A,
+    "add_liquidity": ADD_LIQUIDITY,
+    "remove_liquidity": REMOVE_LIQUIDITY,
+    "borrow": BORROW,
+}
+
+# registro binario (25 bytes, sin padding): la entrada del swap va en el monto de su token
+EVENT_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("kind", "u1"),
+    ("amount_a", "<f8"),
+    ("amount_b", "<f8"),
+])
+
+
+# --- Lectura de eventos ---
+def read_csv(path: str, chunk_rows: int = 65_536):
+    """Bloques de eventos (arrays ``EVENT_DTYPE``) de un CSV con encabezado.
+
+    ``kind`` puede ser el nombre (``swap_a_for_b``, ...) o su número.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        missing = [name for name in EVENT_DTYPE.names if name not in header]
+        if missing:
+            raise ValueError(f"{path}: faltan las columnas {missing}")
+        it, ik, ia, ib = (header.index(name) for name in EVENT_DTYPE.names)
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                return
+            chunk = np.empty(len(rows), dtype=EVENT_DTYPE)
+            chunk["timestamp"] = [float(row[it]) for row in rows]
+            chunk["kind"] = [_kind(row[ik]) for row in rows]
+            chunk["amount_a"] = [float(row[ia] or 0.0) for row in rows]
+            chunk["amount_b"] = [float(row[ib] or 0.0) for row in rows]
+            yield chunk
+
+
+def read_binary(path: str, chunk_rows: int = 1 << 20):
+    """Bloques de eventos de un archivo de registros ``EVENT_DTYPE`` (vistas sobre un memmap)."""
+    if os.path.getsize(path) == 0:
+        return
+    events = np.memmap(path, dtype=EVENT_DTYPE, mode="r")
+    for start in range(0, len(events), chunk_rows):
+        yield events[start:start + chunk_rows]
+
+
+def read_events(path: str, chunk_rows: int = None):
+    """``read_csv`` para ``*.csv``, ``read_binary`` para cualquier otra extensión."""
+    if path.lower().endswith(".csv"):
+        return read_csv(path, chunk_rows or 65_536)
+    return read_binary(path, chunk_rows or 1 << 20)
+
+
+def write_binary(chunks, path: str) -> int:
+    """Escribe los bloques de eventos como registros ``EVENT_DTYPE``; devuelve la cantidad."""
+    count = 0
+    with open(path, "wb") as out:
+        for chunk in chunks:
+            np.asarray(chunk, dtype=EVENT_DTYPE).tofile(out)
+            count += len(chunk)
+    return count
+
+
+def _kind(value: str) -> int:
+    value = value.strip()
+    kind = KINDS.get(value.lower())
+    if kind is None:
+        kind = int(value)
+        if kind not in KINDS.values():
+            raise ValueError(f"Unknown event kind: {value!r}")
+    return kind
+
+
+# --- Replay ---
+@dataclass
+class DefenseReplay:
+    name: str
+    rejected_swaps: int = 0        # swaps que check() habría rechazado
+    rejected_borrows: int = 0      # borrows del log que borrow_b rechazó
+    borrowed_b: float = 0.0        # B prestado por los borrows aceptados
+    paused_events: int = 0         # eventos tras los cuales un borrow habría sido rechazado
+    paused_seconds: float = 0.0    # tiempo con el borrow pausado (medido evento a evento)
+    first_paused_at: Optional[float] = None
+    max_oracle_gap: float = 0.0    # mayor |oráculo - spot| / spot tras un evento
+    gap_sum: float = 0.0
+
+    def mean_oracle_gap(self, events: int) -> float:
+        return self.gap_sum / events if events else 0.0
+
+
+@dataclass
+class ReplayReport:
+    events: int = 0
+    swaps: int = 0
+    liquidity_events: int = 0
+    borrows: int = 0
+    failed: int = 0   # eventos que el pool simulado no pudo aplicar (montos inválidos, sin liquidez)
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    start_price: Optional[float] = None
+    end_price: Optional[float] = None
+    defenses: Dict[str, DefenseReplay] = field(default_factory=dict)
+
+
+@dataclass
+class ReplayedSwap(Action):
+    """Un swap del log visto como acción, para preguntarle a ``Defense.check`` por él."""
+    b_amount: Optional[float] = None
+    impact: Optional[float] = None
+    name: str = "replay"
+
+    def b_in(self, world):
+        return self.b_amount
+    def price_impact(self, world):
+        return self.impact
+
+
+def default_defenses() -> Dict[str, Defense]:
+    """Sin defensa más cada defensa del barrido con sus parámetros por defecto."""
+    defenses = {"none": Defense()}
+    defenses.update((name, cls()) for name, (_, cls, _) in DEFENSES.items())
+    return defenses
+
+
+class Replay:
+    """Aplica eventos en orden al mundo compartido; ``feed`` se puede llamar bloque a bloque.
+
+    El reloj arranca en el timestamp del primer evento y los bloques se cuentan desde ahí cada
+    ``block_time`` segundos: los oráculos y breakers reciben sus ticks de bloque antes del primer
+    evento de cada bloque. Las reservas iniciales y el LTV salen de ``utils.config`` pisados por
+    ``overrides``.
+    """
+    def __init__(self, defenses: Dict[str, Defense] = None, overrides: dict = None, block_time: float = 12.0):
+        self.defenses = default_defenses() if defenses is None else dict(defenses)
+        self.params = config_params(overrides)
+        self.block_time = float(block_time)
+        self.report = ReplayReport(defenses={name: DefenseReplay(name) for name in self.defenses})
+        self.amm = None
+        self.clock = None
+        self.scheduler = None
+        self.worlds = {}
+
+    def feed(self, chunk):
+        times = chunk["timestamp"].tolist()
+        kinds = chunk["kind"].tolist()
+        amounts_a = chunk["amount_a"].tolist()
+        amounts_b = chunk["amount_b"].tolist()
+        for event in zip(times, kinds, amounts_a, amounts_b):
+            self.apply(*event)
+
+    def apply(self, timestamp: float, kind: int, amount_a: float, amount_b: float):
+        if self.amm is None:
+            self._start(timestamp)
+        report, amm, clock = self.report, self.amm, self.clock
+        # los eventos fuera de orden se aplican al instante actual (el tiempo no retrocede)
+        elapsed = max(timestamp - clock.now, 0.0)
+        if elapsed:
+            block = int((timestamp - self.scheduler.genesis) // self.block_time)
+            if block > self.scheduler.block:
+                self.scheduler.run_until(block)
+            clock.set(timestamp)
+        # el estado medido tras el evento anterior rigió hasta ahora
+        for stats in self._paused:
+            stats.paused_seconds += elapsed
+        report.events += 1
+        report.end_time = clock.now
+        try:
+            if kind == SWAP_A_FOR_B or kind == SWAP_B_FOR_A:
+                self._check(kind, amount_a, amount_b)
+                if kind == SWAP_A_FOR_B:
+                    amm.swap_a_for_b(amount_a)
+                else:
+                    amm.swap_b_for_a(amount_b)
+                report.swaps += 1
+            elif kind == ADD_LIQUIDITY:
+                amm.add_liquidity(amount_a, amount_b)
+                report.liquidity_events += 1
+            elif kind == REMOVE_LIQUIDITY:
+                amm.remove_liquidity(amount_a, amount_b)
+                report.liquidity_events += 1
+            elif kind == BORROW:
+                assert amount_a >= 0 and amount_b > 0, "Invalid borrow"
+                self._borrow(amount_a, amount_b)
+                report.borrows += 1
+            else:
+                report.failed += 1
+                return
+        except AssertionError:
+            report.failed += 1
+            return
+        self._measure()
+
+    def run(self, chunks) -> ReplayReport:
+        for chunk in chunks:
+            self.feed(chunk)
+        if self.amm is not None:
+            self.report.end_price = self.amm.price_a_in_b()
+        return self.report
+
+    def _start(self, timestamp):
+        p = self.params
+        self.clock = SimClock(timestamp)
+        self.scheduler = BlockScheduler(self.clock, self.block_time)
+        self.amm = AMM(p["AMM_RESERVE_A"], p["AMM_RESERVE_B"], p["AMM_FEE"])
+        for name, defense in self.defenses.items():
+            oracle = defense.make_oracle(self.amm, self.clock)
+            protocol = defense.make_protocol(oracle, p["LENDING_LTV"])
+            world = World(self.amm, oracle, None, protocol, None, clock=self.clock, scheduler=self.scheduler)
+            defense.attach(world)
+            self.worlds[name] = world
+        # solo las defensas que redefinen check pueden vetar swaps
+        self._checkers = [
+            (defense, self.worlds[name], self.report.defenses[name])
+            for name, defense in self.defenses.items()
+            if type(defense).check is not Defense.check
+        ]
+        self._paused = []
+        self.report.start_time = timestamp
+        self.report.start_price = self.amm.price_a_in_b()
+
+    def _check(self, kind, amount_a, amount_b):
+        if not self._checkers:
+            return
+        if kind == SWAP_A_FOR_B:
+            swap = ReplayedSwap(None, self.amm.price_impact_a_for_b(amount_a))
+        else:
+            swap = ReplayedSwap(amount_b, self.amm.price_impact_b_for_a(amount_b))
+        for defense, world, stats in self._checkers:
+            try:
+                defense.check(swap, world)
+            except TransactionError:
+                stats.rejected_swaps += 1
+
+    def _borrow(self, amount_a, amount_b):
+        for name, world in self.worlds.items():
+            stats = self.report.defenses[name]
+            try:
+                with Transaction([world.protocol], name="replay-borrow"):
+                    world.protocol.deposit_collateral_a(amount_a)
+                    world.protocol.borrow_b(amount_b)
+            except REVERT_ERRORS:
+                stats.rejected_borrows += 1
+            else:
+                stats.borrowed_b += amount_b
+
+    def _measure(self):
+        spot = self.amm.price_a_in_b()
+        now = self.clock.now
+        paused = []
+        for name, world in self.worlds.items():
+            stats = self.report.defenses[name]
+            gap = abs(world.oracle.price_a_in_b() - spot) / spot
+            stats.gap_sum += gap
+            if gap > stats.max_oracle_gap:
+                stats.max_oracle_gap = gap
+            if world.protocol.paused():
+                stats.paused_events += 1
+                if stats.first_paused_at is None:
+                    stats.first_paused_at = now
+                paused.append(stats)
+        self._paused = paused
+
+
+def replay(path: str, defenses: Dict[str, Defense] = None, overrides: dict = None,
+           block_time: float = 12.0, chunk_rows: int = None) -> ReplayReport:
+    """Replay completo del log de ``path`` (CSV o binario)."""
+    return Replay(defenses, overrides, block_time).run(read_events(path, chunk_rows))
+
+
+def format_report(report: ReplayReport) -> str:
+    lines = [
+        f"{report.events} eventos ({report.swaps} swaps, {report.liquidity_events} de liquidez, "
+        f"{report.borrows} borrows, {report.failed} fallidos)",
+    ]
+    if report.start_time is not None:
+        lines.append(f"tiempo {report.start_time:.0f} -> {report.end_time:.0f}, "
+                     f"precio {report.start_price:.6g} -> {report.end_price:.6g}")
+    lines.append(f"{'defensa':<12}{'swaps vetados':>15}{'borrows vetados':>17}{'eventos pausado':>17}"
+                 f"{'seg. pausado':>15}{'gap medio':>12}{'gap máx':>12}")
+    for stats in report.defenses.values():
+        lines.append(f"{stats.name:<12}{stats.rejected_swaps:>15}{stats.rejected_borrows:>17}{stats.paused_events:>17}"
+                     f"{stats.paused_seconds:>15.0f}{stats.mean_oracle_gap(report.events - report.failed):>12.4%}"
+                     f"{stats.max_oracle_gap:>12.4%}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay de un log histórico de swaps y borrows sobre cada defensa")
+    parser.add_argument("events", help="log de eventos (.csv o binario EVENT_DTYPE)")
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    parser.add_argument("--block-time", type=float, default=12.0)
+    parser.add_argument("--reserves", type=float, nargs=2, metavar=("A", "B"), default=None,
+                        help="reservas iniciales del AMM (por defecto, las de utils.config)")
+    parser.add_argument("--to-binary", metavar="OUT", default=None,
+                        help="solo convierte el log a binario EVENT_DTYPE en OUT")
+    args = parser.parse_args(argv)
+    if args.to_binary:
+        count = write_binary(read_events(args.events, args.chunk_rows), args.to_binary)
+        print(f"{count} eventos escritos en {args.to_binary}")
+        return
+    overrides = None
+    if args.reserves:
+        overrides = {"AMM_RESERVE_A": args.reserves[0], "AMM_RESERVE_B": args.reserves[1]}
+    report = replay(args.events, overrides=overrides, block_time=args.block_time, chunk_rows=args.chunk_rows)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
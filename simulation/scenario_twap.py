@@ -1,151 +1,21 @@
 """Escenario: TWAP Oracle
-Este escenario está configurado para demostrar: Defensa: TWAP Oracle (ventana 30s)
+Este escenario está configurado para demostrar: Defensa: TWAP Oracle (ventana 300s)
 
 Explicación breve: en la sección marcada "APLICAR DEFENSA" se muestra el código que implementa
 la defensa correspondiente y un comentario técnico de por qué se aplica ahí.
 """
-from defi.amm import AMM
-from defi.oracle import Oracle
-from defi.flashloan import FlashLoanPool
-from defi.lending import LendingProtocol
-from defi.models import Actor
-from utils.printer import pretty
-from utils.config import *
-from simulation.transaction import Transaction, TransactionError
-
-def run_flashloan_attack():
-    # Inicialización del entorno de simulación
-    amm = AMM(AMM_RESERVE_A, AMM_RESERVE_B, AMM_FEE)
-    pool = FlashLoanPool(FLASH_POOL_LIQUIDITY_B, FLASH_POOL_FEE)
-
-    # --- APLICAR DEFENSA: TWAP Oracle ---
-    # Implementamos un oráculo TWAP local precalentado con muestras históricas para simular
-    # un oráculo que no cambia instantáneamente con un solo swap.
-    import collections, time
-    class LocalTWAP:
-        def __init__(self, amm, window_seconds=30, initial_price=None, samples_count=60):
-            self.amm = amm
-            self.window = window_seconds
-            self.samples = collections.deque()
-            base = initial_price if initial_price is not None else self.amm.price_a_in_b()
-            ts_start = time.time() - self.window
-            for i in range(samples_count):
-                self.samples.append((ts_start + i * (self.window / max(1, samples_count)), base))
-        def sample(self):
-            self.samples.append((time.time(), self.amm.price_a_in_b()))
-            cutoff = time.time() - self.window
-            while self.samples and self.samples[0][0] < cutoff:
-                self.samples.popleft()
-        def price_a_in_b(self):
-            if not self.samples:
-                return self.amm.price_a_in_b()
-            return sum(p for (_, p) in self.samples) / len(self.samples)
-
-    # Usamos el TWAP como oráculo para valuar colateral
-    oracle = LocalTWAP(amm, window_seconds=300, initial_price=amm.price_a_in_b(), samples_count=300)
-    protocol = LendingProtocol(oracle, LENDING_LTV)
-
-    # Actor atacante
-    attacker = Actor(a=ATTACKER_INITIAL_A, b=0.0)
-
-    pretty("Estado inicial", amm, pool, protocol, attacker)
-
-    # 1) Flash loan
-    loan_b = 10_000.0
-    received_b = pool.borrow(loan_b)
-    attacker.b += received_b
-    pretty("1) Toma flash loan en B", amm, pool, protocol, attacker)
-
-    # 2) Manipula precio B -> A (transaccional)
-    used_b = attacker.b * 0.99
-    def post_check_step2():
-        if not (attacker.b >= 0 and amm.a > 0 and amm.b > 0):
-            raise TransactionError('Saldos invalidos detectados, transacción revertida')
-        return True
-    def summary_step2(before, after):
-        try:
-            a_before = before[id(amm)]['a']; b_before = before[id(amm)]['b']
-            a_after = after[id(amm)]['a']; b_after = after[id(amm)]['b']
-            attacker_a_before = before[id(attacker)]['a']; attacker_a_after = after[id(attacker)]['a']
-            attacker_b_before = before[id(attacker)]['b']; attacker_b_after = after[id(attacker)]['b']
-            spent_b = (attacker_b_before or 0) - (attacker_b_after or 0)
-            received_a = (attacker_a_after or 0) - (attacker_a_before or 0)
-            print(f"[SUMMARY TX-Step2] B gastado={spent_b:.2f}, A recibida={received_a:.2f}, AMM A: {a_before:.2f} -> {a_after:.2f}, AMM B: {b_before:.2f} -> {b_after:.2f}")
-        except Exception:
-            pass
-    try:
-        with Transaction(objects=[attacker, amm, pool, protocol], name='TX-Step2', post_check=post_check_step2, on_commit=summary_step2):
-            got_a = amm.swap_b_for_a(used_b)
-            attacker.b -= used_b
-            attacker.a += got_a
-    except TransactionError as e:
-        print(f"[TX-Step2] Transacción revertida: {e}")
-        print('[ESCENARIO] La manipulación fue revertida en TX-Step2; finalizando la simulación.')
-        return
-    pretty("2) Manipula precio en AMM (B -> A)", amm, pool, protocol, attacker)
-
-    # 3) Deposita A inflado y pide B (transaccional)
-    def post_check_step3():
-        if not (attacker.a >= 0 and protocol.debt_b >= 0):
-            raise TransactionError('Invalid balances or debt negative after borrow, reverting')
-        return True
-    def summary_step3(before, after):
-        try:
-            attacker_a_before = before[id(attacker)]['a']; attacker_a_after = after[id(attacker)]['a']
-            attacker_b_before = before[id(attacker)]['b']; attacker_b_after = after[id(attacker)]['b']
-            protocol_coll_before = before[id(protocol)]['collateral_a']; protocol_coll_after = after[id(protocol)]['collateral_a']
-            protocol_debt_before = before[id(protocol)]['debt_b']; protocol_debt_after = after[id(protocol)]['debt_b']
-            spent_a = (attacker_a_before or 0) - (attacker_a_after or 0)
-            received_b = (attacker_b_after or 0) - (attacker_b_before or 0)
-            print(f"[SUMMARY TX-Step3] A depositada={spent_a:.2f}, B recibido={received_b:.2f}, collateral: {protocol_coll_before} -> {protocol_coll_after}, debt: {protocol_debt_before} -> {protocol_debt_after}")
-        except Exception:
-            pass
-    try:
-        with Transaction(objects=[attacker, amm, pool, protocol], name='TX-Step3', post_check=post_check_step3, on_commit=summary_step3):
-            deposit_a = attacker.a * 0.95
-            attacker.a -= deposit_a
-            protocol.deposit_collateral_a(deposit_a)
-            amount_borrow = protocol.max_borrowable_b()
-            protocol.borrow_b(amount_borrow)
-            attacker.b += amount_borrow
-    except TransactionError as e:
-        print(f"[TX-Step3] Transacción revertida: {e}")
-    pretty("3) Deposita A inflado como colateral y pide B", amm, pool, protocol, attacker)
-
-    # 4) Revierte precio A -> B (transaccional)
-    sold_a = attacker.a * 0.90
-    def post_check_step4():
-        if not (attacker.a >= 0 and attacker.b >= 0 and amm.a > 0 and amm.b > 0):
-            raise TransactionError('Saldos negativos o AMM invalidos detectados, revirtiendo')
-        return True
-    def summary_step4(before, after):
-        try:
-            a_before = before[id(amm)]['a']; b_before = before[id(amm)]['b']
-            a_after = after[id(amm)]['a']; b_after = after[id(amm)]['b']
-            attacker_a_before = before[id(attacker)]['a']; attacker_a_after = after[id(attacker)]['a']
-            attacker_b_before = before[id(attacker)]['b']; attacker_b_after = after[id(attacker)]['b']
-            sold = (attacker_a_before or 0) - (attacker_a_after or 0)
-            rec_b = (attacker_b_after or 0) - (attacker_b_before or 0)
-            print(f"[SUMMARY TX-Step4] A vendida={sold:.2f}, B recibida={rec_b:.2f}, AMM A: {a_before:.2f} -> {a_after:.2f}, AMM B: {b_before:.2f} -> {b_after:.2f}")
-        except Exception:
-            pass
-    try:
-        with Transaction(objects=[attacker, amm, pool, protocol], name='TX-Step4', post_check=post_check_step4, on_commit=summary_step4):
-            out_b = amm.swap_a_for_b(sold_a)
-            attacker.a -= sold_a
-            attacker.b += out_b
-    except TransactionError as e:
-        print(f"[TX-Step4] Transacción revertida: {e}")
-    pretty("4) Revierte el precio en AMM (A -> B)", amm, pool, protocol, attacker)
-
-    # 5) Repago flash loan + fee
-    fee = loan_b * pool.fee
-    repayment = loan_b + fee
-    assert attacker.b >= repayment, "Attacker can't repay flash loan in this toy setup"
-    attacker.b -= repayment
-    pool.repay(repayment)
-    pretty("5) Paga el flash loan + comisión", amm, pool, protocol, attacker)
-
-    # Resultado
-    profit_b = attacker.b
-    print(f"\\n>>> Ganancia neta del atacante (en B) después de repagar el flash loan: {profit_b:.2f} B\\n")
+from simulation.defenses import TWAPDefense
+from simulation.engine import ScenarioSpec, base_attack, run_scenario
+
+# --- APLICAR DEFENSA: TWAP Oracle ---
+# Valuamos el colateral con defi.oracle.TWAPOracle, precalentado con una ventana completa de
+# historia al precio inicial: un swap dentro del mismo bloque no mueve el promedio, así que el
+# precio manipulado no infla el colateral.
+SPEC = ScenarioSpec(
+    name="twap",
+    actions=base_attack(loan_b=10_000.0),
+    defense=TWAPDefense(window_seconds=300),
+)
+
+def run_flashloan_attack(verbose: bool = True):
+    return run_scenario(SPEC, verbose=verbose)
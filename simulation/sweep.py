@@ -0,0 +1,146 @@
+"""Barridos de parámetros en paralelo sobre el motor de escenarios (modo headless).
+
+Cada punto del barrido es un dict plano con cualquier combinación de:
+
+- parámetros del ataque: ``loan_b``, ``swap_fraction``, ``deposit_fraction``, ``sell_fraction``
+- defensa: ``defense`` ("none", "circuit", "slippage", "per_tx_cap", "twap", "volatility",
+  "median") y su umbral (``circuit_threshold``, ``max_slippage``, ``per_tx_cap_b``, ``twap_window``,
+  ``max_sigma``, ``median_trim``)
+- constantes de ``utils.config`` (``AMM_RESERVE_A``, ``LENDING_LTV``, ...)
+
+Los resultados se escriben como JSON lines, en el mismo orden que los puntos, a medida que
+los workers los terminan.
+
+    python -m simulation.sweep grid.json results.jsonl --workers 8
+"""
+import argparse
+import itertools
+import json
+import os
+from multiprocessing import Pool
+
+from simulation.defenses import (
+    CircuitBreakerDefense, Defense, MedianOracleDefense, PerTxCapDefense, SlippageDefense, TWAPDefense,
+    VolatilityCircuitDefense,
+)
+from simulation.engine import CONFIG_NAMES, ScenarioSpec, base_attack, run_scenario
+
+ATTACK_PARAMS = ("loan_b", "swap_fraction", "deposit_fraction", "sell_fraction")
+
+# nombre de la defensa -> (parámetro del punto, clase, argumento del constructor)
+DEFENSES = {
+    "circuit": ("circuit_threshold", CircuitBreakerDefense, "threshold"),
+    "slippage": ("max_slippage", SlippageDefense, "max_slippage"),
+    "per_tx_cap": ("per_tx_cap_b", PerTxCapDefense, "cap_b"),
+    "twap": ("twap_window", TWAPDefense, "window_seconds"),
+    "volatility": ("max_sigma", VolatilityCircuitDefense, "max_sigma"),
+    "median": ("median_trim", MedianOracleDefense, "trim"),
+}
+
+
+def grid(**axes):
+    """Producto cartesiano de los ejes, en orden determinista (el último eje varía más rápido)."""
+    names = list(axes)
+    for values in itertools.product(*(list(axes[n]) for n in names)):
+        yield dict(zip(names, values))
+
+
+def linspace(start: float, stop: float, num: int):
+    """``num`` valores equiespaciados entre ``start`` y ``stop`` (ambos incluidos)."""
+    if num == 1:
+        return [float(start)]
+    step = (stop - start) / (num - 1)
+    return [start + i * step for i in range(num)]
+
+
+def make_defense(point: dict) -> Defense:
+    name = point.get("defense", "none")
+    if name == "none":
+        return Defense()
+    if name not in DEFENSES:
+        raise ValueError(f"Unknown defense: {name!r}")
+    param, cls, arg = DEFENSES[name]
+    return cls(**{arg: point[param]}) if param in point else cls()
+
+
+def spec_from_point(point: dict) -> ScenarioSpec:
+    known = set(ATTACK_PARAMS) | set(CONFIG_NAMES) | {"defense"} | {p for p, _, _ in DEFENSES.values()}
+    unknown = set(point) - known
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    attack = {k: point[k] for k in ATTACK_PARAMS if k in point}
+    config = {k: point[k] for k in CONFIG_NAMES if k in point}
+    return ScenarioSpec(
+        name=point.get("defense", "none"),
+        actions=base_attack(**attack),
+        defense=make_defense(point),
+        config=config,
+    )
+
+
+def evaluate(point: dict) -> dict:
+    """Corre un punto en modo headless y devuelve la fila de resultados."""
+    result = run_scenario(spec_from_point(point))
+    row = dict(point)
+    row.update(
+        completed=result.completed,
+        profit_b=result.profit_b,
+        steps=result.steps,
+        reverted_at=result.reverted_at,
+        reason=result.reason,
+    )
+    return row
+
+
+def run_sweep(points, out_path: str, workers: int = None, chunksize: int = 256) -> int:
+    """Evalúa ``points`` en un pool de procesos y escribe cada fila en ``out_path`` (JSON lines).
+
+    ``workers`` por defecto es el número de cores; con ``workers=1`` corre en el proceso actual.
+    Devuelve la cantidad de filas escritas.
+    """
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        if workers == 1:
+            rows = map(evaluate, points)
+            count = _write_rows(rows, out, chunksize)
+        else:
+            with Pool(workers) as pool:
+                # imap mantiene el orden de los puntos y reparte el trabajo en chunks
+                rows = pool.imap(evaluate, points, chunksize=chunksize)
+                count = _write_rows(rows, out, chunksize)
+    return count
+
+
+def _write_rows(rows, out, flush_every):
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row))
+        out.write("\n")
+        count += 1
+        if count % flush_every == 0:
+            out.flush()
+    return count
+
+
+def _load_points(path):
+    # el archivo de entrada es un dict de ejes o una lista de dicts de ejes (se concatenan)
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    grids = spec if isinstance(spec, list) else [spec]
+    return itertools.chain.from_iterable(grid(**axes) for axes in grids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de parámetros del ataque con flash loan")
+    parser.add_argument("grid", help="JSON con los ejes del barrido (o una lista de ellos)")
+    parser.add_argument("out", help="archivo de salida (JSON lines)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=256)
+    args = parser.parse_args(argv)
+    count = run_sweep(_load_points(args.grid), args.out, args.workers, args.chunksize)
+    print(f"{count} configuraciones escritas en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Umbrales de las defensas: el valor más laxo de cada parámetro que todavía bloquea el ataque.
+
+Para cada defensa se busca la frontera entre "bloquea" y "no bloquea" sobre corridas headless:
+primero se acota un intervalo que la contiene (alejándose del punto de partida por factores de
+2 hasta que cambia el resultado) y después se bisecta en escala logarítmica hasta una precisión
+relativa ``rtol``. Todas las corridas quedan memoizadas por punto, así que las fronteras de una
+tabla (``boundary_table``, por profundidad del pool y LTV) arrancan desde la frontera vecina y
+casi todas las evaluaciones caen cerca de ella.
+
+El ataque es un ``AttackPlan`` del optimizador (por defecto, el ataque base). Con el ataque
+base el TWAP bloquea con cualquier ventana, porque el tiempo no avanza; su frontera tiene
+sentido con un plan que espera bloques (``AttackPlan(wait_blocks=...)``).
+
+    python -m simulation.thresholds --depths 0.5 1 2 4 --ltvs 0.5 0.7 0.9
+"""
+import argparse
+import json
+import math
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from simulation.engine import ScenarioSpec, config_params, run_scenario
+from simulation.optimizer import AttackPlan
+from simulation.sweep import DEFENSES, make_defense
+
+# defensa -> (rango de búsqueda del parámetro, True si un valor más alto es más estricto)
+SEARCH = {
+    "circuit": (1e-4, 10.0, False),
+    "slippage": (1e-4, 100.0, False),
+    "per_tx_cap": (1.0, 1e9, False),
+    "twap": (1.0, 1e6, True),
+    "volatility": (1e-2, 1e3, False),
+}
+
+
+@dataclass
+class Boundary:
+    defense: str
+    param: str
+    value: Optional[float]   # valor más laxo que bloquea (None si no bloquea en todo el rango)
+    depth: float             # factor sobre las reservas de utils.config
+    ltv: float
+    always: bool = False     # bloquea en todo el rango: ``value`` es el extremo más laxo
+    evaluations: int = 0     # corridas nuevas (no memoizadas) que hizo esta búsqueda
+    profitable: bool = True  # el ataque deja ganancia sin defensas (si no, no hay umbral: value=None)
+
+
+class ThresholdFinder:
+    def __init__(self, attack: Optional[AttackPlan] = None, config: Optional[dict] = None, rtol: float = 1e-3):
+        self.attack = attack or AttackPlan()
+        self.config = config_params(config)
+        self.rtol = rtol
+        self.cache = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+
+    def blocked(self, defense: str, value: float, depth: float = 1.0, ltv: Optional[float] = None) -> bool:
+        """True si la defensa con ``value`` deja el ataque sin ganancia (memoizado)."""
+        return self._blocked(defense, {"defense": defense, DEFENSES[defense][0]: value}, depth, ltv)
+
+    def profitable(self, depth: float = 1.0, ltv: Optional[float] = None) -> bool:
+        """True si el ataque deja ganancia sin ninguna defensa (memoizado)."""
+        return not self._blocked("none", {"defense": "none"}, depth, ltv)
+
+    def _blocked(self, name, point, depth, ltv):
+        ltv = self.config["LENDING_LTV"] if ltv is None else ltv
+        key = (tuple(point.items()), depth, ltv)
+        hit = self.cache.get(key)
+        if hit is not None:
+            self.cache_hits += 1
+            return hit
+        self.evaluations += 1
+        config = dict(self.config)
+        config.update(
+            AMM_RESERVE_A=self.config["AMM_RESERVE_A"] * depth,
+            AMM_RESERVE_B=self.config["AMM_RESERVE_B"] * depth,
+            LENDING_LTV=ltv,
+        )
+        spec = ScenarioSpec(name, self.attack.actions(), make_defense(point), config)
+        self.cache[key] = blocked = run_scenario(spec).blocked
+        return blocked
+
+    def boundary(self, defense: str, depth: float = 1.0, ltv: Optional[float] = None,
+                 guess: Optional[float] = None) -> Boundary:
+        """Frontera de ``defense`` para una profundidad y un LTV, partiendo de ``guess``.
+
+        Si el ataque ya no deja ganancia sin defensas, no hay nada que la defensa bloquee: se
+        devuelve ``profitable=False`` sin buscar.
+        """
+        ltv = self.config["LENDING_LTV"] if ltv is None else ltv
+        lo, hi, higher_is_stricter = SEARCH[defense]
+        param = DEFENSES[defense][0]
+        start = self.evaluations
+        if not self.profitable(depth, ltv):
+            return Boundary(defense, param, None, depth, ltv, evaluations=self.evaluations - start,
+                            profitable=False)
+        blocked = lambda x: self.blocked(defense, x, depth, ltv)
+        x = math.sqrt(lo * hi) if guess is None else min(max(guess, lo), hi)
+        state = blocked(x)
+        # para acotar: si bloquea se va hacia lo laxo, si no hacia lo estricto
+        up = state != higher_is_stricter
+        y = x
+        while True:
+            y = min(y * 2, hi) if up else max(y / 2, lo)
+            if blocked(y) != state:
+                break
+            if y in (lo, hi):
+                loosest = hi if not higher_is_stricter else lo
+                value = loosest if state else None
+                return Boundary(defense, param, value, depth, ltv, always=state, evaluations=self.evaluations - start)
+            x = y
+        a, b = sorted((x, y))
+        while b / a - 1 > self.rtol:
+            mid = math.sqrt(a * b)
+            if blocked(mid) == blocked(a):
+                a = mid
+            else:
+                b = mid
+        # el extremo del intervalo final que bloquea
+        value = a if blocked(a) else b
+        return Boundary(defense, param, value, depth, ltv, evaluations=self.evaluations - start)
+
+
+def boundary_table(defenses=None, depths=(1.0,), ltvs=(None,), finder: Optional[ThresholdFinder] = None,
+                   **kwargs) -> List[Boundary]:
+    """Fronteras de cada defensa en la grilla ``depths`` x ``ltvs``; cada búsqueda arranca desde la
+    frontera del punto anterior de la misma defensa."""
+    finder = finder or ThresholdFinder(**kwargs)
+    defenses = list(SEARCH) if defenses is None else list(defenses)
+    rows = []
+    for defense in defenses:
+        guess = None
+        for depth in depths:
+            for ltv in ltvs:
+                row = finder.boundary(defense, depth, ltv, guess)
+                if row.value is not None and not row.always:
+                    guess = row.value
+                rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frontera de bloqueo de cada defensa por profundidad del pool y LTV")
+    parser.add_argument("--defenses", nargs="+", default=list(SEARCH), choices=list(SEARCH))
+    parser.add_argument("--depths", nargs="+", type=float, default=[1.0], help="factores sobre las reservas del AMM")
+    parser.add_argument("--ltvs", nargs="+", type=float, default=None)
+    parser.add_argument("--wait-blocks", type=int, default=0, help="bloques que espera el ataque antes del borrow")
+    parser.add_argument("--rtol", type=float, default=1e-3)
+    parser.add_argument("--out", default=None, help="escribe las fronteras como JSON lines")
+    args = parser.parse_args(argv)
+    finder = ThresholdFinder(AttackPlan(wait_blocks=args.wait_blocks), rtol=args.rtol)
+    rows = boundary_table(args.defenses, args.depths, args.ltvs or [None], finder)
+    for row in rows:
+        if not row.profitable:
+            value = "ataque no rentable sin defensa"
+        elif row.value is None:
+            value = f"{row.param}=nunca bloquea"
+        else:
+            value = f"{row.param}={row.value:.6g}" + (" (todo el rango)" if row.always else "")
+        print(f"{row.defense:<11} depth={row.depth:<6g} ltv={row.ltv:<5g} {value:<44} "
+              f"[{row.evaluations} corridas]")
+    print(f"{finder.evaluations} corridas, {finder.cache_hits} aciertos de caché")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out:
+            for row in rows:
+                out.write(json.dumps(asdict(row)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,189 @@
 from copy import deepcopy
 from typing import Iterable, Callable, Optional
+import sys
+import time
 import traceback
 
+from defi.events import snapshot_memo
+from utils.profiling import Profiler, snapshot_size
+
 class TransactionError(Exception):
     pass
 
+_MISSING = object()
+# entrada del log con el estado completo de un objeto que define _tx_snapshot/_tx_restore
+_STATE = object()
+
+# undo log activo para cada objeto enlistado en modo "journal" (id(obj) -> _UndoLog)
+_ACTIVE = {}
+# clases cuyo __setattr__/__delattr__ ya pasa por el journal
+_HOOKED = set()
+
+
+def _hook_class(cls):
+    """Instala en ``cls`` un ``__setattr__``/``__delattr__`` que anota en el undo log cada atributo
+    de un objeto enlistado antes de escribirlo.
+
+    Los objetos conservan su clase (``type(obj) is AMM``, ``__eq__`` de dataclasses). El gancho
+    queda instalado: los objetos no enlistados de la clase solo pagan una búsqueda en ``_ACTIVE``.
+    """
+    if cls in _HOOKED:
+        return
+    _HOOKED.add(cls)
+    if getattr(cls.__setattr__, "_tx_hook", False):
+        # lo hereda de una base ya enganchada
+        return
+    base_setattr = cls.__setattr__
+    base_delattr = cls.__delattr__
+
+    def __setattr__(self, name, value):
+        log = _ACTIVE.get(id(self))
+        if log is not None:
+            log.record(self, name)
+        base_setattr(self, name, value)
+
+    def __delattr__(self, name):
+        log = _ACTIVE.get(id(self))
+        if log is not None:
+            log.record(self, name)
+        base_delattr(self, name)
+
+    __setattr__._tx_hook = __delattr__._tx_hook = True
+    cls.__setattr__ = __setattr__
+    cls.__delattr__ = __delattr__
+
+
+class _UndoLog:
+    """Undo log: guarda el valor previo de cada atributo la primera vez que se escribe.
+
+    Los savepoints son marcas sobre el log; se identifican por su nivel (1, 2, ...).
+    """
+    def __init__(self):
+        self.entries = []  # (obj, name, old_value)
+        self.seen = set()  # (id(obj), name) ya anotados desde la última marca
+        self.marks = []    # (len(entries), seen) de cada savepoint abierto
+
+    def record(self, obj, name):
+        key = (id(obj), name)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.entries.append((obj, name, obj.__dict__.get(name, _MISSING)))
+
+    def record_state(self, obj):
+        key = (id(obj), _STATE)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.entries.append((obj, _STATE, obj._tx_snapshot()))
+
+    def savepoint(self):
+        self.marks.append((len(self.entries), self.seen))
+        self.seen = set()
+        return len(self.marks)
+
+    def rollback_to(self, level):
+        # undo everything written after the savepoint; the savepoint itself stays open
+        start = self.marks[level - 1][0]
+        self._restore(start)
+        del self.marks[level:]
+        self.seen = set()
+
+    def release(self, level):
+        # merge the savepoint (and any inner one) into the enclosing level of the log
+        start, seen = self.marks[level - 1]
+        tail = []
+        for entry in self.entries[start:]:
+            key = (id(entry[0]), entry[1])
+            if key not in seen:
+                seen.add(key)
+                tail.append(entry)
+        self.entries[start:] = tail
+        del self.marks[level - 1:]
+        self.seen = seen
+
+    def undo(self):
+        self._restore(0)
+        self.marks.clear()
+        self.seen = set()
+
+    def _restore(self, start):
+        # restore in reverse order, writing straight into __dict__ so nothing is re-journaled
+        restored = {}
+        for obj, name, old in reversed(self.entries[start:]):
+            restored[id(obj)] = obj
+            if name is _STATE:
+                obj._tx_restore(old)
+            elif old is _MISSING:
+                obj.__dict__.pop(name, None)
+            else:
+                obj.__dict__[name] = old
+        del self.entries[start:]
+        _notify_restored(restored.values())
+
+    def before(self, obj, start=0):
+        state = _view(obj)
+        for o, name, old in reversed(self.entries[start:]):
+            if o is obj:
+                if name is _STATE:
+                    state.update(old)
+                elif old is _MISSING:
+                    state.pop(name, None)
+                else:
+                    state[name] = old
+        return state
+
+
+def _notify_restored(objects):
+    # objects whose derived state lives elsewhere (e.g. prices cached by subscribers) get a
+    # _tx_restored() call once the whole rollback is done; writes it triggers are journaled anew
+    for obj in objects:
+        hook = getattr(obj, "_tx_restored", None)
+        if hook is not None:
+            hook()
+
+
+def _view(obj):
+    # fields visible to on_commit: __dict__ plus the custom state of array-backed objects
+    state = dict(obj.__dict__)
+    if hasattr(obj, "_tx_snapshot"):
+        state.update(obj._tx_snapshot())
+    return state
+
+
+def _snapshot(obj):
+    if hasattr(obj, "_tx_snapshot"):
+        return obj._tx_snapshot()
+    # subscribers are not part of the state: the snapshot keeps the same Listeners
+    return deepcopy(obj.__dict__, snapshot_memo())
+
+
+# transacciones en modo journal activas, de la más externa a la más interna
+_JOURNAL_STACK = []
+
+
 class Transaction:
+    """Transacción sobre un conjunto de objetos con rollback automático.
+
+    ``snapshot="journal"`` (por defecto) solo anota los atributos que la transacción reasigna,
+    así que el rollback y los deltas de ``on_commit`` cuestan O(campos tocados). Las mutaciones
+    in-place de contenedores (listas, dicts, deques) no se detectan: para objetos que las usen,
+    ``snapshot="deepcopy"`` copia el ``__dict__`` completo como antes.
+
+    Las transacciones se pueden anidar: una transacción interna es un savepoint sobre el log de
+    la más externa, su commit se fusiona en ese log y su rollback solo deshace lo propio. El
+    rollback de la externa deshace todo, incluidos objetos que solo enlistaron las internas.
+    ``savepoint()``/``rollback_to()`` permiten rebobinar varias veces a un mismo estado.
+
+    Los objetos cuyo estado vive fuera de sus atributos (p. ej. una cuenta dentro de arrays de
+    NumPy) pueden definir ``_tx_snapshot() -> dict`` y ``_tx_restore(dict)``: en ambos modos se
+    guarda ese estado al enlistarlos y se restaura en el rollback. Los que definen
+    ``_tx_restored()`` reciben esa llamada al terminar un rollback que los restauró (p. ej. el AMM
+    avisa a los oráculos que cachean su precio).
+
+    Si ``logger`` es un ``utils.profiling.Profiler``, la transacción registra tiempos de snapshot,
+    checks y ``on_commit``, bytes snapshoteados y commits/rollbacks bajo ``tx.<name>.*``.
+    """
     def __init__(
         self,
         objects: Iterable[object],
@@ -14,51 +192,239 @@ class Transaction:
         post_check: Optional[Callable[[], bool]] = None,
         on_commit: Optional[Callable[[dict, dict], None]] = None,
         logger: Optional[Callable[[str], None]] = None,
+        snapshot: str = "journal",
     ):
+        if snapshot not in ("journal", "deepcopy"):
+            raise ValueError(f"Unknown snapshot mode: {snapshot!r}")
         self.objects = list(objects)
         self.name = name or "tx"
         self.pre_check = pre_check
         self.post_check = post_check
         self.on_commit = on_commit
-        # logger is kept for compatibility but not used for lifecycle messages to avoid noisy output
+        # logger is kept for compatibility but not used for lifecycle messages to avoid noisy output;
+        # a Profiler passed as logger turns on the per-transaction stats
         self.logger = logger
+        self._profiler = logger if isinstance(logger, Profiler) else None
+        self.snapshot = snapshot
         self._snapshots = {}
+        self._savepoints = []
+        self._log = None
+        self._mark = 0
+        self._hooked = []
+
+    @property
+    def nested(self) -> bool:
+        return self._log is not None and self._mark > 0
 
     def __enter__(self):
-        # take snapshots of __dict__ for each object
-        self._snapshots = {id(obj): deepcopy(obj.__dict__) for obj in self.objects}
+        prof = self._profiler
+        if prof is not None:
+            start = time.perf_counter()
+        if self.snapshot == "journal":
+            self._begin_journal()
+        else:
+            # take snapshots of __dict__ for each object
+            self._snapshots = {id(obj): _snapshot(obj) for obj in self.objects}
+            if _JOURNAL_STACK:
+                # an enclosing journaled transaction must see our writes to undo them
+                _JOURNAL_STACK[0]._enlist(self.objects)
+        if prof is not None:
+            prof.add_time(f"tx.{self.name}.snapshot", time.perf_counter() - start)
         # no lifecycle prints to keep output clean
-        if self.pre_check and not self.pre_check():
+        try:
+            ok = self._check(self.pre_check, "pre_check")
+        except BaseException:
+            self._rollback()
+            self._end()
+            raise
+        if not ok:
             self._rollback()
+            self._end()
             raise TransactionError(f"Pre-check failed for transaction {self.name}")
         return self
 
     def __exit__(self, exc_type, exc, tb):
-        if exc_type is not None:
-            # exception inside tx: rollback and propagate exception
-            self._rollback()
-            # do not print stack here to keep output minimal; propagate
-            return False  # re-raise exception
-        # run post_check if provided
-        if self.post_check and not self.post_check():
-            self._rollback()
-            raise TransactionError(f"Post-check failed for transaction {self.name}")
-        # commit: compute deltas for summary if requested
-        if self.on_commit:
+        if self._log is not None and _JOURNAL_STACK[-1] is not self:
+            # las transacciones del journal se cierran en orden LIFO; cerrar otra antes
+            # corrompería los savepoints de las internas: no se toca nada
+            raise TransactionError(
+                f"Transaction {self.name} exited before the inner transaction {_JOURNAL_STACK[-1].name}")
+        try:
+            if exc_type is not None:
+                # exception inside tx: rollback and propagate exception
+                self._rollback()
+                # do not print stack here to keep output minimal; propagate
+                return False  # re-raise exception
+            # run post_check if provided
             try:
-                before = {id(obj): deepcopy(self._snapshots.get(id(obj), {})) for obj in self.objects}
-                after = {id(obj): deepcopy(obj.__dict__) for obj in self.objects}
-                # call the on_commit callback with (before, after)
-                self.on_commit(before, after)
-            except Exception:
-                # ignore on_commit errors to avoid breaking the simulation
-                pass
-        return False  # normal exit
+                ok = self._check(self.post_check, "post_check")
+            except BaseException:
+                self._rollback()
+                raise
+            if not ok:
+                self._rollback()
+                raise TransactionError(f"Post-check failed for transaction {self.name}")
+            # commit: compute deltas for summary if requested
+            if self.on_commit:
+                prof = self._profiler
+                if prof is not None:
+                    start = time.perf_counter()
+                try:
+                    before, after = self._deltas()
+                    # call the on_commit callback with (before, after)
+                    self.on_commit(before, after)
+                except Exception:
+                    # ignore on_commit errors to avoid breaking the simulation
+                    pass
+                if prof is not None:
+                    prof.add_time(f"tx.{self.name}.on_commit", time.perf_counter() - start)
+            self._commit()
+            return False  # normal exit
+        finally:
+            self._end()
+
+    def _check(self, check, label):
+        if not check:
+            return True
+        prof = self._profiler
+        if prof is None:
+            return check()
+        start = time.perf_counter()
+        try:
+            return check()
+        finally:
+            prof.add_time(f"tx.{self.name}.{label}", time.perf_counter() - start)
+
+    def _record_snapshot_size(self):
+        # approximate (shallow) size of what this transaction had to keep to be able to undo
+        if self._log is not None:
+            start = self._log.marks[self._mark - 1][0] if self._mark else 0
+            entries = self._log.entries[start:]
+            size = snapshot_size(old for _, _, old in entries) + len(entries) * sys.getsizeof((None, None, None))
+        else:
+            size = sum(sys.getsizeof(snap) + snapshot_size(snap.values()) for snap in self._snapshots.values())
+        self._profiler.count(f"tx.{self.name}.snapshot_bytes", size)
+
+    # --- savepoints ---
+    def savepoint(self) -> int:
+        """Marca el estado actual; devuelve un nivel para ``rollback_to``/``release``."""
+        if self._log is not None:
+            return self._log.savepoint()
+        self._savepoints.append({id(obj): _snapshot(obj) for obj in self.objects})
+        return len(self._savepoints)
+
+    def rollback_to(self, savepoint: int):
+        """Deshace lo escrito después del savepoint; el savepoint sigue disponible."""
+        self._check_savepoint(savepoint)
+        if self._log is not None:
+            self._log.rollback_to(savepoint)
+        else:
+            self._restore(self._savepoints[savepoint - 1])
+            del self._savepoints[savepoint:]
+
+    def release(self, savepoint: int):
+        """Descarta el savepoint conservando los cambios."""
+        self._check_savepoint(savepoint)
+        if self._log is not None:
+            self._log.release(savepoint)
+        else:
+            del self._savepoints[savepoint - 1:]
+
+    def _check_savepoint(self, savepoint):
+        # a savepoint is valid while it (and the transaction) is open: released, rolled-back-past
+        # or foreign levels would otherwise surface as IndexError from the undo-log stack
+        if self._log is not None:
+            first, last = self._mark + 1, len(self._log.marks)
+        else:
+            first, last = 1, len(self._savepoints)
+        if not isinstance(savepoint, int) or not first <= savepoint <= last:
+            raise TransactionError(
+                f"Savepoint {savepoint!r} is not open in transaction {self.name} "
+                f"(already released or rolled back, or from another transaction)")
+
+    # --- journal mode ---
+    def _begin_journal(self):
+        if _JOURNAL_STACK:
+            # nested: become a savepoint on the outermost transaction's log
+            root = _JOURNAL_STACK[0]
+            self._log = root._log
+            self._mark = self._log.savepoint()
+        else:
+            root = self
+            self._log = _UndoLog()
+            self._mark = 0
+            self._hooked = []
+        root._enlist(self.objects)
+        for obj in self.objects:
+            if hasattr(obj, "_tx_snapshot"):
+                self._log.record_state(obj)
+        _JOURNAL_STACK.append(self)
+
+    def _enlist(self, objects):
+        for obj in objects:
+            if id(obj) in _ACTIVE:
+                continue
+            _ACTIVE[id(obj)] = self._log
+            _hook_class(type(obj))
+            self._hooked.append(obj)
+
+    def _deltas(self):
+        if self._log is not None:
+            start = self._log.marks[self._mark - 1][0] if self._mark else 0
+            before = {id(obj): self._log.before(obj, start) for obj in self.objects}
+            after = {id(obj): _view(obj) for obj in self.objects}
+        else:
+            before = {id(obj): deepcopy(self._snapshots.get(id(obj), {}), snapshot_memo()) for obj in self.objects}
+            after = {id(obj): deepcopy(_view(obj), snapshot_memo()) for obj in self.objects}
+        return before, after
+
+    def _commit(self):
+        if self._profiler is not None:
+            self._record_snapshot_size()
+            self._profiler.count(f"tx.{self.name}.commits")
+        if self._log is not None and self._mark:
+            self._log.release(self._mark)
+
+    def _end(self):
+        self._savepoints = []
+        if self._log is None:
+            return
+        _JOURNAL_STACK.pop()
+        if not self._mark:
+            for obj in self._hooked:
+                _ACTIVE.pop(id(obj), None)
+            self._hooked = []
+        self._log = None
+        self._mark = 0
 
     def _rollback(self):
-        # restore snapshots
+        prof = self._profiler
+        if prof is None:
+            return self._undo()
+        self._record_snapshot_size()
+        prof.count(f"tx.{self.name}.rollbacks")
+        with prof.timer(f"tx.{self.name}.rollback"):
+            self._undo()
+
+    def _undo(self):
+        if self._log is not None:
+            if self._mark:
+                self._log.rollback_to(self._mark)
+                self._log.release(self._mark)
+            else:
+                self._log.undo()
+            return
+        self._restore(self._snapshots)
+
+    def _restore(self, snapshots):
+        # restore snapshots; setattr/delattr so an enclosing journaled transaction sees the writes
         for obj in self.objects:
-            snap = self._snapshots.get(id(obj))
-            if snap is not None:
-                obj.__dict__.clear()
-                obj.__dict__.update(deepcopy(snap))
+            snap = snapshots.get(id(obj))
+            if snap is not None and hasattr(obj, "_tx_restore"):
+                obj._tx_restore(snap)
+            elif snap is not None:
+                for key in [k for k in obj.__dict__ if k not in snap]:
+                    delattr(obj, key)
+                for key, value in deepcopy(snap, snapshot_memo()).items():
+                    setattr(obj, key, value)
+        _notify_restored(obj for obj in self.objects if id(obj) in snapshots)
@@ -0,0 +1,73 @@
+"""AMM x*y=k: las cotizaciones puras coinciden con los swaps y los montos máximos por impact
+respetan la cota, en los dos backends."""
+import copy
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.fixedpoint import WAD_MATH, to_wad
+from simulation.defenses import SlippageDefense
+
+IMPACTS = [0.0, 1e-6, 0.01, 0.05, 0.1, 0.25, 0.5, 0.9]
+
+
+def random_amms(seed, count=30):
+    rng = random.Random(seed)
+    for _ in range(count):
+        a, b = rng.uniform(100, 1e7), rng.uniform(100, 1e7)
+        fee = rng.choice([0.0, 0.003, 0.01])
+        yield AMM(a, b, fee)
+        yield AMM(to_wad(round(a, 6)), to_wad(round(b, 6)), to_wad(fee), num=WAD_MATH)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_quotes_equal_the_swaps(seed):
+    rng = random.Random(seed)
+    for amm in random_amms(seed):
+        for _ in range(5):
+            dx = amm.num.amount(rng.uniform(0.001, 2) * amm.num.to_float(amm.a))
+            dy = amm.num.amount(rng.uniform(0.001, 2) * amm.num.to_float(amm.b))
+            quote_b, quote_a = amm.quote_a_for_b(dx), amm.quote_b_for_a(dy)
+            price_after = amm.price_after_a_for_b(dx)
+            swapped = copy.deepcopy(amm)
+            assert swapped.swap_a_for_b(dx) == quote_b
+            assert swapped.price_a_in_b() == price_after
+            price_after = amm.price_after_b_for_a(dy)
+            swapped = copy.deepcopy(amm)
+            assert swapped.swap_b_for_a(dy) == quote_a
+            assert swapped.price_a_in_b() == price_after
+            # las cotizaciones no mueven el pool
+            assert amm.quote_a_for_b(dx) == quote_b
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_max_amounts_respect_the_impact_bound(seed):
+    for amm in random_amms(seed):
+        for max_impact in IMPACTS:
+            dx = amm.max_a_in_for_impact(max_impact)
+            dy = amm.max_b_in_for_impact(max_impact)
+            assert type(dx) is type(dy) is type(amm.a)
+            assert amm.price_impact_a_for_b(dx) <= max_impact if dx else max_impact == 0
+            assert amm.price_impact_b_for_a(dy) <= max_impact if dy else max_impact == 0
+            # y es (casi) el mayor: un poco más ya se pasa
+            if max_impact:
+                more = 1.000001
+                assert amm.price_impact_a_for_b(amm.num.amount(amm.num.to_float(dx) * more)) > max_impact
+                assert amm.price_impact_b_for_a(amm.num.amount(amm.num.to_float(dy) * more)) > max_impact
+
+
+def test_max_amount_at_the_slippage_limit_passes_the_defense():
+    amm = AMM(10_000.0, 10_000.0)
+    defense = SlippageDefense(0.1)
+    dx, dy = amm.max_a_in_for_impact(0.1), amm.max_b_in_for_impact(0.1)
+    assert amm.price_impact_a_for_b(dx) <= defense.max_slippage
+    assert amm.price_impact_b_for_a(dy) <= defense.max_slippage
+    assert amm.price_impact_a_for_b(dx * (1 + 1e-9)) > defense.max_slippage
+
+
+def test_unbounded_impact_keeps_the_backend_type():
+    assert AMM(10_000.0, 10_000.0).max_a_in_for_impact(1.0) == float("inf")
+    wad = AMM(to_wad(10_000), to_wad(10_000), to_wad(0.003), num=WAD_MATH)
+    unbounded = wad.max_a_in_for_impact(1.0)
+    assert type(unbounded) is int and unbounded > wad.a * 10**30
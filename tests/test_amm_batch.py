@@ -0,0 +1,67 @@
+"""BatchAMM contra el AMM escalar: mismas fórmulas, mismos resultados bit a bit."""
+import random
+
+import numpy as np
+import pytest
+
+from defi.amm import AMM
+from defi.amm_batch import BatchAMM
+
+
+def random_pools(rng, n):
+    return [AMM(10 ** rng.uniform(-3, 9), 10 ** rng.uniform(-3, 9), rng.choice([0.0, 0.003, rng.uniform(0, 0.05)]))
+            for _ in range(n)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_swap_sequences_match_the_scalar_amm_bit_for_bit(seed):
+    rng = random.Random(seed)
+    amms = random_pools(rng, 64)
+    batch = BatchAMM.from_amms(amms)
+    np_rng = np.random.default_rng(seed)
+    for _ in range(100):
+        a_for_b = rng.random() < 0.5
+        reserves = batch.a if a_for_b else batch.b
+        amounts = reserves * 10 ** np_rng.uniform(-8, 1, len(amms))
+        where = np_rng.random(len(amms)) < 0.7
+        out = batch.swap_a_for_b(amounts, where=where) if a_for_b else batch.swap_b_for_a(amounts, where=where)
+        for i, amm in enumerate(amms):
+            if not where[i]:
+                assert out[i] == 0.0
+                continue
+            expected = amm.swap_a_for_b(float(amounts[i])) if a_for_b else amm.swap_b_for_a(float(amounts[i]))
+            assert out[i] == expected
+    assert batch.a.tolist() == [amm.a for amm in amms]
+    assert batch.b.tolist() == [amm.b for amm in amms]
+    assert batch.price_a_in_b().tolist() == [amm.price_a_in_b() for amm in amms]
+
+
+def test_quotes_match_and_broadcast_over_trade_sizes():
+    rng = random.Random(7)
+    amms = random_pools(rng, 16)
+    batch = BatchAMM.from_amms(amms)
+    sizes = np.array([1e-6, 0.5, 3.0, 1e4])
+    grid_b = batch.quote_a_for_b(sizes[:, None])
+    grid_a = batch.quote_b_for_a(sizes[:, None])
+    assert grid_b.shape == grid_a.shape == (len(sizes), len(amms))
+    for j, size in enumerate(sizes.tolist()):
+        for i, amm in enumerate(amms):
+            assert grid_b[j, i] == amm.quote_a_for_b(size)
+            assert grid_a[j, i] == amm.quote_b_for_a(size)
+    # cotizar no mueve los pools
+    assert batch.a.tolist() == [amm.a for amm in amms]
+
+
+def test_replicate_and_to_amm_round_trip():
+    amm = AMM(10_000.0, 25_000.0, 0.003)
+    batch = BatchAMM.replicate(amm, 3)
+    out = batch.swap_b_for_a(np.array([10.0, 100.0, 1_000.0]))
+    for i, size in enumerate([10.0, 100.0, 1_000.0]):
+        scalar = AMM(amm.a, amm.b, amm.fee)
+        assert out[i] == scalar.swap_b_for_a(size)
+        copy = batch.to_amm(i)
+        assert (copy.a, copy.b, copy.fee) == (scalar.a, scalar.b, scalar.fee)
+    with pytest.raises(AssertionError):
+        batch.swap_a_for_b(np.array([1.0, 0.0, 1.0]))
+    # el 0 del pool excluido por ``where`` no se valida
+    batch.swap_a_for_b(np.array([1.0, 0.0, 1.0]), where=np.array([True, False, True]))
@@ -0,0 +1,87 @@
+"""Fórmulas cerradas del ataque base contra el escenario simulado."""
+import random
+from dataclasses import replace
+
+import pytest
+
+from simulation import analytic
+from simulation.analytic import AttackParams
+from simulation.engine import ScenarioSpec, base_attack, run_scenario
+
+ATTACK = ("loan_b", "swap_fraction", "deposit_fraction", "sell_fraction")
+
+
+def simulate(overrides, **attack):
+    return run_scenario(ScenarioSpec("analytic", base_attack(**attack), config=overrides))
+
+
+def random_case(rng):
+    depth = rng.uniform(0.3, 5.0)
+    overrides = {
+        "AMM_RESERVE_A": 10_000.0 * depth,
+        "AMM_RESERVE_B": 10_000.0 * depth * rng.uniform(0.5, 2.0),
+        "AMM_FEE": rng.choice([0.0005, 0.003, 0.01]),
+        "FLASH_POOL_FEE": rng.choice([0.0, 0.0009, 0.01]),
+        "LENDING_LTV": rng.uniform(0.3, 0.95),
+        "ATTACKER_INITIAL_A": rng.uniform(0.0, 2_000.0),
+    }
+    attack = {
+        "loan_b": rng.uniform(100.0, 20_000.0),
+        "swap_fraction": rng.uniform(0.5, 1.0),
+        "deposit_fraction": rng.uniform(0.5, 0.99),
+        "sell_fraction": rng.uniform(0.1, 1.0),
+    }
+    return overrides, attack
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_analytic_profit_matches_simulation(seed):
+    overrides, attack = random_case(random.Random(seed))
+    predicted = analytic.profit(AttackParams.from_config(overrides, **attack))
+    result = simulate(overrides, **attack)
+    if predicted >= 0:
+        assert result.completed
+        assert result.profit_b == pytest.approx(predicted, rel=1e-9, abs=1e-6)
+    else:
+        # sin ganancia el atacante no llega a repagar el flash loan
+        assert not result.completed and result.reverted_at == "TX-Step5"
+
+
+def test_default_config_profit():
+    params = AttackParams.from_config()
+    assert analytic.profit(params) == pytest.approx(simulate({}).profit_b, rel=1e-12)
+
+
+@pytest.mark.parametrize("loan", [500.0, 5_000.0, 15_000.0])
+def test_derivatives_match_finite_differences(loan):
+    params = AttackParams(loan_b=loan)
+    p, d1, d2 = analytic.profit_derivatives(params)
+    at = lambda x: analytic.profit(replace(params, loan_b=x))
+    h = 1e-2
+    assert d1 == pytest.approx((at(loan + h) - at(loan - h)) / (2 * h), rel=1e-6)
+    # paso más grande para la segunda: con h chico domina la cancelación
+    h = 1.0
+    assert d2 == pytest.approx((at(loan + h) - 2 * p + at(loan - h)) / (h * h), rel=1e-4)
+
+
+def test_optimal_loan_beats_a_grid():
+    params = AttackParams()
+    loan, best = analytic.optimal_loan(params)
+    assert 0 <= loan <= params.flash_liquidity_b
+    grid = [analytic.profit(replace(params, loan_b=params.flash_liquidity_b * i / 200)) for i in range(201)]
+    assert best >= max(grid) - 1e-9
+    assert simulate({}, loan_b=loan).profit_b == pytest.approx(best, rel=1e-9)
+
+
+def test_break_even_thresholds_zero_the_profit():
+    params = AttackParams()
+    ltv = analytic.break_even_ltv(params)
+    assert analytic.profit(replace(params, ltv=ltv)) == pytest.approx(0.0, abs=1e-6)
+    flash_fee = analytic.break_even_flash_fee(params)
+    assert analytic.profit(replace(params, flash_fee=flash_fee)) == pytest.approx(0.0, abs=1e-6)
+    amm_fee = analytic.break_even_amm_fee(params)
+    assert amm_fee is not None
+    assert analytic.profit(replace(params, amm_fee=amm_fee)) == pytest.approx(0.0, abs=1e-6)
+    # el escenario simulado cambia de signo en el mismo LTV
+    assert simulate({"LENDING_LTV": ltv * 1.001}).profit_b > 0
+    assert not simulate({"LENDING_LTV": ltv * 0.999}).completed
@@ -0,0 +1,61 @@
+"""Reloj y planificador de bloques, y su rollback junto con el resto del mundo."""
+from dataclasses import dataclass
+
+import pytest
+
+from simulation.clock import BlockScheduler, SimClock
+from simulation.defenses import MedianOracleDefense, TWAPDefense
+from simulation.engine import Action, AdvanceBlocks, ScenarioSpec, base_attack, build_world, run_scenario
+from simulation.transaction import TransactionError
+
+
+def test_blocks_run_subscribers_then_actions_in_schedule_order():
+    scheduler = BlockScheduler(SimClock(), block_time=12.0)
+    calls = []
+    scheduler.subscribe(lambda block, ts: calls.append(("tick", block, ts)))
+    scheduler.schedule(calls.append, "second", block=2)
+    scheduler.schedule(calls.append, "first-a", delay=1)
+    scheduler.schedule(calls.append, "first-b", delay=1)
+    scheduler.run()
+    assert calls == [("tick", 1, 12.0), "first-a", "first-b", ("tick", 2, 24.0), "second"]
+    assert scheduler.pending() == 0
+
+
+def test_scheduler_follows_a_clock_advanced_outside_it():
+    clock = SimClock()
+    scheduler = BlockScheduler(clock, block_time=12.0)
+    clock.advance(100.0)
+    scheduler.advance()
+    assert (scheduler.block, clock()) == (1, 100.0)
+    scheduler.advance()
+    assert (scheduler.block, clock()) == (2, 112.0)
+    # un reloj que no se adelantó más allá del próximo bloque no corre la grilla
+    clock.advance(5.0)
+    scheduler.advance()
+    assert (scheduler.block, clock()) == (3, 124.0)
+
+
+@dataclass
+class Fail(Action):
+    name: str = "TX-Fail"
+
+    def apply(self, world):
+        raise TransactionError("forced failure")
+
+
+@pytest.mark.parametrize("defense", [TWAPDefense(window_seconds=300), MedianOracleDefense()],
+                         ids=["twap", "median"])
+def test_reverted_multi_block_attack_restores_oracle_clock_and_scheduler(defense):
+    actions = base_attack()
+    actions[2:2] = [AdvanceBlocks(20)]
+    actions.append(Fail())
+    world = build_world(defense)
+    before = (world.oracle.price_a_in_b(), world.clock(), world.scheduler.block, world.scheduler.genesis)
+    result = run_scenario(ScenarioSpec("reverted", actions, defense), world=world)
+    assert result.reverted_at == "TX-Fail"
+    assert result.profit_b == 0
+    assert (world.oracle.price_a_in_b(), world.clock(), world.scheduler.block, world.scheduler.genesis) == before
+    assert (world.amm.a, world.amm.b) == (10_000.0, 10_000.0)
+    # el mundo sigue usable: los bloques siguientes arrancan desde el estado restaurado
+    world.scheduler.advance()
+    assert (world.scheduler.block, world.clock()) == (1, 12.0)
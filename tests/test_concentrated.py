@@ -0,0 +1,123 @@
+"""Liquidez concentrada: el estado tras cada swap contra las posiciones acuñadas, los bordes del
+rango de ticks y el pool full-range contra el AMM x*y=k."""
+import math
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.concentrated import MAX_TICK, MIN_TICK, ConcentratedAMM, sqrt_price_at
+from simulation.engine import ScenarioSpec, run_scenario
+
+
+def positions_liquidity(positions, tick):
+    return sum(liquidity for lower, upper, liquidity in positions if lower <= tick < upper)
+
+
+def assert_valid(pool, positions):
+    assert MIN_TICK <= pool.tick <= MAX_TICK
+    assert 0 < pool.sqrt_price < math.inf
+    # el tick es el del precio (salvo el borde exacto de un tick cruzado)
+    assert sqrt_price_at(pool.tick) <= pool.sqrt_price * (1 + 1e-9)
+    assert pool.sqrt_price <= sqrt_price_at(pool.tick + 1) * (1 + 1e-9)
+    expected = positions_liquidity(positions, pool.tick)
+    assert pool.liquidity == pytest.approx(expected, rel=1e-9, abs=1e-9 * max(p[2] for p in positions))
+    assert pool.a >= -1e-6 and pool.b >= -1e-6
+
+
+def random_pool(rng):
+    pool = ConcentratedAMM(rng.uniform(0.5, 2.0))
+    positions = []
+    for _ in range(rng.randint(1, 6)):
+        lower = pool.tick + rng.randint(-3_000, 2_000)
+        upper = lower + rng.randint(1, 3_000)
+        liquidity = rng.uniform(1e3, 1e6) * rng.choice([1.0, 1.0 / 3.0, 0.1])
+        pool.mint(lower, upper, liquidity)
+        positions.append((lower, upper, liquidity))
+    return pool, positions
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_concentrated_swaps_keep_a_valid_state(seed):
+    rng = random.Random(seed)
+    pool, positions = random_pool(rng)
+    for _ in range(40):
+        a_in = rng.random() < 0.5
+        capacity = pool._walk(a_in, math.inf)[0] / (1 - pool.fee)
+        amount = capacity * rng.choice([rng.uniform(0, 0.5), rng.uniform(0.9, 1.0), 1.5])
+        swap = pool.swap_a_for_b if a_in else pool.swap_b_for_a
+        before = (pool.a, pool.b, pool.sqrt_price, pool.liquidity, pool.tick)
+        if amount <= 0:
+            continue
+        if amount > capacity:
+            # sin liquidez suficiente el swap se rechaza sin tocar el pool
+            with pytest.raises(AssertionError):
+                swap(amount)
+            assert (pool.a, pool.b, pool.sqrt_price, pool.liquidity, pool.tick) == before
+            continue
+        try:
+            swap(amount)
+        except AssertionError:
+            # en el borde exacto de la capacidad el redondeo puede rechazarlo
+            assert amount > capacity * (1 - 1e-9)
+            continue
+        assert_valid(pool, positions)
+
+
+def test_crossing_the_last_tick_leaves_no_residual_liquidity():
+    pool = ConcentratedAMM(1.0)
+    # con esta liquidez sumar y restar la neta de cada tick no vuelve exactamente a 0 en float
+    for lower, upper in ((-600, 600), (-200, 900), (100, 300)):
+        pool.mint(lower, upper, 12345.6789)
+    used, _, _, liquidity, tick = pool._walk(False, math.inf)
+    assert used < math.inf
+    assert (liquidity, tick) == (0.0, 900)
+    capacity = used / (1 - pool.fee)
+    pool.swap_b_for_a(capacity * (1 - 1e-9))
+    before = (pool.sqrt_price, pool.liquidity, pool.tick)
+    # más allá de la capacidad se rechaza en lugar de llevar el precio más allá de MAX_TICK
+    with pytest.raises(AssertionError):
+        pool.swap_b_for_a(1e6)
+    assert (pool.sqrt_price, pool.liquidity, pool.tick) == before
+    assert pool.tick < 900
+
+
+def test_walk_never_leaves_the_tick_range():
+    pool = ConcentratedAMM.from_reserves(10_000.0, 10_000.0)
+    for a_in in (True, False):
+        used, _, sp, _, tick = pool._walk(a_in, math.inf)
+        assert used < math.inf
+        assert MIN_TICK <= tick <= MAX_TICK
+        assert sqrt_price_at(MIN_TICK) <= sp <= sqrt_price_at(MAX_TICK)
+
+
+def test_full_range_pool_matches_constant_product():
+    pool = ConcentratedAMM.from_reserves(10_000.0, 10_000.0)
+    cpmm = AMM(10_000.0, 10_000.0)
+    for amount in (1.0, 100.0, 5_000.0, 50_000.0):
+        assert pool.quote_a_for_b(amount) == pytest.approx(cpmm.quote_a_for_b(amount), rel=1e-9)
+        assert pool.quote_b_for_a(amount) == pytest.approx(cpmm.quote_b_for_a(amount), rel=1e-9)
+    concentrated = run_scenario(ScenarioSpec("concentrated", amm_factory=ConcentratedAMM.from_reserves))
+    assert concentrated.profit_b == pytest.approx(run_scenario(ScenarioSpec("cpmm")).profit_b, rel=1e-9)
+
+
+def test_concentrated_split_swaps_equal_one_swap():
+    rng = random.Random(11)
+    whole, positions = random_pool(rng)
+    split, _ = random_pool(random.Random(11))
+    capacity = whole._walk(False, math.inf)[0] / (1 - whole.fee)
+    amount = capacity * 0.8
+    out = whole.swap_b_for_a(amount)
+    parts = [amount * f for f in (0.1, 0.3, 0.6)]
+    assert sum(split.swap_b_for_a(p) for p in parts) == pytest.approx(out, rel=1e-9)
+    assert split.sqrt_price == pytest.approx(whole.sqrt_price, rel=1e-9)
+    assert split.tick == whole.tick
+
+
+def test_concentrated_exact_out_round_trip():
+    pool = ConcentratedAMM.from_reserves(10_000.0, 10_000.0, width=2_000)
+    for dy in (1.0, 1_000.0, 5_000.0):
+        assert pool.quote_a_for_b(pool.amount_in_a_for_b(dy)) == pytest.approx(dy, rel=1e-9)
+        assert pool.quote_b_for_a(pool.amount_in_b_for_a(dy)) == pytest.approx(dy, rel=1e-9)
+    dx = pool.max_a_in_for_impact(0.05)
+    assert pool.price_impact_a_for_b(dx) == pytest.approx(0.05, rel=1e-9)
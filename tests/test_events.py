@@ -0,0 +1,56 @@
+"""Listeners: los suscriptores siguen a su componente en las copias y no en los snapshots."""
+import copy
+
+import pytest
+
+from defi.amm import AMM
+from defi.oracle import Oracle
+from simulation.defenses import CircuitBreakerDefense, Defense, MedianOracleDefense, TWAPDefense
+from simulation.engine import ScenarioSpec, build_world, run_scenario
+from simulation.transaction import Transaction
+
+
+def test_deepcopied_amm_publishes_to_its_own_oracle():
+    amm = AMM(10_000.0, 10_000.0)
+    oracle = Oracle(amm)
+    copied_amm, copied_oracle = copy.deepcopy((amm, oracle))
+    copied_amm.swap_b_for_a(5_000.0)
+    assert copied_oracle.price_a_in_b() == copied_amm.price_a_in_b() > 2
+    assert oracle.price_a_in_b() == amm.price_a_in_b() == 1.0
+    amm.swap_a_for_b(1_000.0)
+    assert oracle.price_a_in_b() == amm.price_a_in_b()
+    assert copied_oracle.price_a_in_b() == copied_amm.price_a_in_b() > 2
+
+
+@pytest.mark.parametrize("defense", [Defense(), CircuitBreakerDefense(0.2), TWAPDefense(300.0),
+                                     MedianOracleDefense()], ids=lambda d: type(d).__name__)
+def test_deepcopied_world_oracle_tracks_only_its_own_amm(defense):
+    world = build_world(defense)
+    copied = copy.deepcopy(world)
+    copied.amm.swap_b_for_a(5_000.0)
+    assert (world.amm.price_a_in_b(), world.oracle.price_a_in_b()) == (1.0, 1.0)
+    assert copied.amm.listeners is not world.amm.listeners
+    # cada suscriptor de la copia está ligado a un componente de la copia
+    originals = {id(o) for o in world.components()}
+    for listener in copied.amm.listeners:
+        target = getattr(listener, "__self__", None) or listener.func.__self__
+        assert id(target) not in originals
+    # la copia corre el escenario igual que un mundo nuevo y no toca al original
+    spec = ScenarioSpec("copy", defense=defense)
+    assert run_scenario(spec, world=copy.deepcopy(world)) == run_scenario(spec, world=build_world(defense))
+    assert world.attacker.b == 0.0 and world.amm.a == 10_000.0
+
+
+def test_deepcopy_snapshots_keep_the_subscribers():
+    amm = AMM(10_000.0, 10_000.0)
+    oracle = Oracle(amm)
+    listeners = amm.listeners
+    with pytest.raises(ZeroDivisionError):
+        with Transaction([amm], snapshot="deepcopy"):
+            amm.swap_b_for_a(5_000.0)
+            1 / 0
+    # el rollback restauró las reservas sin reemplazar la lista de suscriptores
+    assert amm.listeners is listeners
+    assert oracle.price_a_in_b() == 1.0
+    amm.swap_b_for_a(5_000.0)
+    assert oracle.price_a_in_b() == amm.price_a_in_b()
@@ -0,0 +1,142 @@
+"""Backend de punto fijo (WAD): redondeo a favor del protocolo y mismos resultados que el backend
+float en los componentes y en los escenarios con cada defensa."""
+import copy
+import importlib
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.concentrated import ConcentratedAMM
+from defi.fixedpoint import (WAD, WAD_MATH, div_down, div_up, from_wad, mul_down, mul_up,
+                             quote_a_for_b_many, quote_b_for_a_many, to_wad)
+from simulation.defenses import (CircuitBreakerDefense, Defense, MedianOracleDefense, PerTxCapDefense,
+                                 SlippageDefense, TWAPDefense, VolatilityCircuitDefense)
+from simulation.engine import AdvanceBlocks, ScenarioSpec, base_attack, build_world, run_scenario
+
+SCENARIOS = ("flashloan_attack", "circuit", "slippage", "per_tx_cap", "silent", "twap")
+
+
+def test_to_wad_is_exact_for_decimal_literals():
+    assert to_wad(0.003) == 3 * 10**15
+    assert to_wad(1) == WAD
+    assert to_wad("12345.678901234567890123") == 12345678901234567890123
+    assert from_wad(to_wad(0.7)) == 0.7
+
+
+def test_rounding_directions():
+    rng = random.Random(0)
+    for _ in range(200):
+        a, b = rng.randrange(1, 10**24), rng.randrange(1, 10**24)
+        assert mul_down(a, b) * WAD <= a * b <= mul_up(a, b) * WAD
+        assert mul_up(a, b) - mul_down(a, b) <= 1
+        assert div_up(a, b) - div_down(a, b) <= 1
+        assert div_down(a, b) * b <= a * WAD <= div_up(a, b) * b
+
+
+def test_wad_swaps_round_in_favour_of_the_pool():
+    rng = random.Random(1)
+    wad = AMM(to_wad(10_000), to_wad(10_000), to_wad(0.003), WAD_MATH)
+    flt = AMM(10_000.0, 10_000.0, 0.003)
+    for _ in range(200):
+        k = wad.a * wad.b
+        amount = rng.uniform(0.001, 2_000)
+        if rng.random() < 0.5:
+            quoted = wad.quote_a_for_b(to_wad(amount))
+            out = wad.swap_a_for_b(to_wad(amount))
+            expected = flt.swap_a_for_b(amount)
+        else:
+            quoted = wad.quote_b_for_a(to_wad(amount))
+            out = wad.swap_b_for_a(to_wad(amount))
+            expected = flt.swap_b_for_a(amount)
+        assert isinstance(out, int) and out == quoted
+        # el pool nunca entrega de más: k no baja y la salida no supera la exacta
+        assert wad.a * wad.b >= k
+        assert from_wad(out) <= expected * (1 + 1e-12) + 1e-18
+        assert from_wad(out) == pytest.approx(expected, rel=1e-9)
+    assert from_wad(wad.a) == pytest.approx(flt.a, rel=1e-9)
+    assert from_wad(wad.b) == pytest.approx(flt.b, rel=1e-9)
+
+
+def test_wad_amount_in_is_the_least_input_that_delivers_the_output():
+    rng = random.Random(3)
+    for _ in range(300):
+        amm = AMM(to_wad(rng.uniform(1, 1e6)), to_wad(rng.uniform(1, 1e6)), to_wad(rng.choice([0, 0.003, 0.01])),
+                  WAD_MATH)
+        want_b = rng.randrange(1, amm.b // 2)
+        want_a = rng.randrange(1, amm.a // 2)
+        dx, dy = amm.amount_in_a_for_b(want_b), amm.amount_in_b_for_a(want_a)
+        assert isinstance(dx, int) and isinstance(dy, int)
+        # redondea hacia arriba: alcanza, y un wei menos ya no
+        assert amm.quote_a_for_b(dx) >= want_b > amm.quote_a_for_b(dx - 1)
+        assert amm.quote_b_for_a(dy) >= want_a > amm.quote_b_for_a(dy - 1)
+        assert copy.deepcopy(amm).swap_a_for_b(dx) >= want_b
+        assert copy.deepcopy(amm).swap_b_for_a(dy) >= want_a
+        # el precio tras el swap redondea hacia abajo, como price_a_in_b
+        swapped = copy.deepcopy(amm)
+        swapped.swap_a_for_b(dx)
+        assert amm.price_after_a_for_b(dx) == swapped.price_a_in_b() == swapped.b * WAD // swapped.a
+
+
+def test_batched_wad_quotes_match_the_amm():
+    rng = random.Random(2)
+    pools = [(to_wad(rng.uniform(1e3, 1e6)), to_wad(rng.uniform(1e3, 1e6))) for _ in range(20)]
+    amounts = [to_wad(rng.uniform(1, 1e4)) for _ in pools]
+    fee = to_wad(0.003)
+    out_b = quote_a_for_b_many([a for a, _ in pools], [b for _, b in pools], fee, amounts)
+    out_a = quote_b_for_a_many([a for a, _ in pools], [b for _, b in pools], fee, amounts)
+    for (a, b), dx, dy, dx_out in zip(pools, amounts, out_b, out_a):
+        amm = AMM(a, b, fee, WAD_MATH)
+        assert amm.quote_a_for_b(dx) == dy
+        assert amm.quote_b_for_a(dx) == dx_out
+
+
+def test_backends_are_shared_by_copies():
+    world = build_world(backend="fixed")
+    assert copy.deepcopy(world).amm.num is WAD_MATH
+    assert world.fork().protocol.num is WAD_MATH
+
+
+@pytest.mark.parametrize("defense", [
+    Defense(),
+    CircuitBreakerDefense(0.2),
+    SlippageDefense(0.1),
+    PerTxCapDefense(5_000.0),
+    TWAPDefense(300.0),
+    VolatilityCircuitDefense(),
+    MedianOracleDefense(),
+], ids=lambda d: type(d).__name__)
+@pytest.mark.parametrize("wait", [0, 3])
+def test_fixed_backend_matches_float_outcomes(defense, wait):
+    actions = base_attack()
+    if wait:
+        actions[2:2] = [AdvanceBlocks(wait)]
+    flt = run_scenario(ScenarioSpec("float", actions, defense))
+    wad = run_scenario(ScenarioSpec("fixed", actions, defense, backend="fixed"))
+    assert (wad.completed, wad.reverted_at, wad.steps) == (flt.completed, flt.reverted_at, flt.steps)
+    assert wad.profit_b == pytest.approx(flt.profit_b, rel=1e-9, abs=1e-9)
+
+
+def test_fixed_world_holds_integers():
+    world = build_world(backend="fixed")
+    assert world.num is WAD_MATH
+    for value in (world.amm.a, world.amm.b, world.amm.fee, world.pool.b, world.attacker.a):
+        assert isinstance(value, int)
+
+
+def test_fixed_backend_needs_the_constant_product_amm():
+    with pytest.raises(ValueError):
+        build_world(amm_factory=ConcentratedAMM.from_reserves, backend="fixed")
+    with pytest.raises(ValueError):
+        build_world(backend="decimal")
+
+
+def test_float_scenarios_are_unchanged():
+    results = {name: importlib.import_module(f"simulation.scenario_{name}").run_flashloan_attack(False)
+               for name in SCENARIOS}
+    assert results["flashloan_attack"].profit_b == 6762.644377518147
+    assert results["silent"].profit_b == 6762.644377518147
+    assert results["circuit"].reverted_at == "TX-Step3"
+    assert results["slippage"].reverted_at == "TX-Step2"
+    assert results["per_tx_cap"].reverted_at == "TX-Step2"
+    assert results["twap"].reverted_at == "TX-Step5"
@@ -0,0 +1,101 @@
+"""Forks del mundo: independientes del original y equivalentes a un ``deepcopy`` o a un mundo
+armado desde cero que llegó al mismo estado."""
+import copy
+
+import pytest
+
+from defi.fixedpoint import to_wad
+from simulation.defenses import (CircuitBreakerDefense, Defense, MedianOracleDefense, TWAPDefense,
+                                 VolatilityCircuitDefense)
+from simulation.engine import AdvanceBlocks, ScenarioSpec, base_attack, build_world, run_scenario
+from simulation.fork import fork
+from simulation.transaction import Transaction
+
+DEFENSES = [Defense(), CircuitBreakerDefense(0.2), TWAPDefense(300.0), VolatilityCircuitDefense(),
+            MedianOracleDefense()]
+
+
+def snapshot(world):
+    return (world.amm.a, world.amm.b, world.oracle.price_a_in_b(), world.pool.b, world.protocol.collateral_a,
+            world.protocol.debt_b, world.attacker.a, world.attacker.b, world.clock(), world.scheduler.block)
+
+
+def warm_up(world):
+    # estado intermedio no trivial: swaps y bloques (historia de oráculos, reloj, planificador)
+    world.amm.swap_b_for_a(world.num.amount(500))
+    world.scheduler.advance(5)
+    world.amm.swap_a_for_b(world.num.amount(300))
+    world.scheduler.advance(2)
+
+
+@pytest.mark.parametrize("defense", DEFENSES, ids=lambda d: type(d).__name__)
+def test_fork_runs_like_a_rebuilt_world_and_leaves_the_original_alone(defense):
+    actions = base_attack()
+    actions[2:2] = [AdvanceBlocks(3)]
+    spec = ScenarioSpec("fork", actions, defense)
+    world, rebuilt = build_world(defense), build_world(defense)
+    warm_up(world)
+    warm_up(rebuilt)
+    original = snapshot(world)
+    forked = world.fork()
+    assert snapshot(forked) == snapshot(rebuilt) == original
+    assert run_scenario(spec, world=forked) == run_scenario(spec, world=rebuilt)
+    assert run_scenario(spec, world=world.fork()) == run_scenario(spec, world=copy.deepcopy(world))
+    assert snapshot(forked) == snapshot(rebuilt)
+    assert snapshot(world) == original
+    # los suscriptores del fork son los suyos: los swaps de uno no llegan a los oráculos del otro
+    assert forked.amm.listeners is not world.amm.listeners
+    world.amm.swap_b_for_a(100.0)
+    assert snapshot(forked) == snapshot(rebuilt)
+    assert run_scenario(spec, world=world.fork()) == run_scenario(spec, world=world)
+
+
+def test_forks_of_a_fixed_point_world():
+    world, rebuilt = build_world(backend="fixed"), build_world(backend="fixed")
+    warm_up(world)
+    warm_up(rebuilt)
+    forked = world.fork()
+    forked.amm.swap_b_for_a(to_wad(1_000))
+    assert world.oracle.price_a_in_b() != forked.oracle.price_a_in_b()
+    assert run_scenario(ScenarioSpec("fork"), world=world.fork()) == run_scenario(ScenarioSpec("fork"), world=rebuilt)
+
+
+def test_fork_inside_a_transaction_copies_the_current_state_unenlisted():
+    world = build_world(TWAPDefense(300.0))
+    with Transaction(world.components()):
+        world.amm.swap_b_for_a(1_000.0)
+        world.scheduler.advance(3)
+        forked = fork(world)
+        assert type(forked.amm) is type(world.amm)
+        assert snapshot(forked) == snapshot(world)
+        inside = snapshot(world)
+    assert snapshot(forked) == inside
+    # el rollback del original no deshace lo que copió el fork
+    with pytest.raises(ZeroDivisionError):
+        with Transaction(world.components()):
+            world.amm.swap_b_for_a(1_000.0)
+            other = fork(world)
+            1 / 0
+    assert snapshot(world) == inside
+    assert snapshot(other) != inside
+    assert type(other.amm) is type(world.amm)
+
+
+def test_fork_shares_the_twap_history_copy_on_write():
+    world = build_world(TWAPDefense(300.0))
+    warm_up(world)
+    forked = world.fork()
+    assert forked.oracle._times is world.oracle._times
+    n, price = world.oracle._n, world.oracle.price_a_in_b()
+    # el fork agrega observaciones más allá del largo lógico del original, que no las ve
+    forked.scheduler.advance(4)
+    forked.amm.swap_b_for_a(2_000.0)
+    assert (world.oracle._n, world.oracle.price_a_in_b()) == (n, price)
+    fork_times = list(forked.oracle._times[:forked.oracle._n])
+    # cuando el original agrega las suyas trabaja sobre su propia copia
+    world.scheduler.advance()
+    world.amm.swap_a_for_b(10.0)
+    assert world.oracle._times is not forked.oracle._times
+    assert list(forked.oracle._times[:forked.oracle._n]) == fork_times
+    # una observación por el bloque nuevo (el swap es del mismo instante)
+    assert world.oracle._n == n + 1
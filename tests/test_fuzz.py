@@ -0,0 +1,60 @@
+"""Fuzzer de invariantes: el chequeo de LTV no depende de la tolerancia del componente, un bug
+plantado se encuentra y se achica, y el lote vectorizado coincide con los componentes reales."""
+import pytest
+
+from defi.lending import LendingProtocol
+from simulation.fuzz import Case, FuzzConfig, check, fuzz, fuzz_batch, lane_case, run_lanes, shrink
+
+NOISE = (("swap_a_for_b", 37.5), ("flash_loan", 123.0), ("swap_b_for_a", 12.25))
+
+
+def planted_case():
+    ops = NOISE + (("deposit", 100.0),) + NOISE + (("borrow", 20.0), ("borrow", 58.5)) + NOISE
+    return Case(1_000.0, 1_000.0, 0.003, 10_000.0, 0.0009, 0.5, ops)
+
+
+def test_planted_ltv_bug_is_found_and_shrunk(monkeypatch):
+    case = planted_case()
+    assert check(case) is None
+    # bug plantado: el margen ignora el LTV y valúa el colateral completo
+    monkeypatch.setattr(LendingProtocol, "max_borrowable_b",
+                        lambda self: self.collateral_a * self.oracle.price_a_in_b() - self.debt_b)
+    step, invariant = check(case)
+    assert invariant == "ltv_respected" and case.ops[step][0] == "borrow"
+    minimal = shrink(case, invariant)
+    assert [op for op, _ in minimal.ops] == ["deposit", "borrow"]
+    assert (minimal.amm_fee, minimal.flash_fee) == (0.0, 0.0)
+    assert check(minimal) == (1, "ltv_respected")
+
+
+def test_ltv_check_is_independent_of_the_component_tolerance():
+    # sin colateral, borrow_b acepta hasta su tolerancia absoluta: el invariante lo ve
+    case = Case(1.0, 1.0, 0.0, 0.0, 0.0, 0.7, (("borrow", 1e-10),))
+    assert check(case) == (0, "ltv_respected")
+    # justo en el límite no es falla
+    at_limit = Case(3.0, 7.0, 0.0, 0.0, 0.0, 0.7, (("deposit", 1.0 / 3), ("borrow", 7.0 / 3 * 0.7)))
+    assert check(at_limit) is None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_failures_are_confirmed_by_the_scalar_components(seed):
+    config = FuzzConfig(steps=16)
+    initial, kinds, amounts, first_step, first_invariant = run_lanes(seed, 0, 512, config)
+    for lane in range(512):
+        found = check(lane_case(initial, kinds, amounts, lane), config.k_rtol)
+        if first_step[lane] < 0:
+            assert found is None
+        else:
+            assert found is not None and found[0] == first_step[lane]
+    report = fuzz_batch((seed, 0, 512, config))
+    assert report.unconfirmed == 0
+    for failure in report.failures:
+        assert check(failure.case)[1] == failure.invariant
+        assert len(failure.case.ops) <= failure.original_steps
+
+
+def test_fuzz_reports_the_shortest_failure_per_invariant():
+    report = fuzz(3_000, lanes=1_000, workers=1, config=FuzzConfig(steps=8))
+    assert report.sequences == 3_000 and report.operations == 24_000
+    assert "ltv_respected" in report.failing
+    assert len({f.invariant for f in report.failures}) == len(report.failures)
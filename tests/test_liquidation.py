@@ -0,0 +1,127 @@
+"""Índice de liquidación contra el recorrido completo del book, y cascadas a través del AMM."""
+import numpy as np
+import pytest
+
+from defi.amm import AMM
+from defi.liquidation import LiquidationIndex, cascade, index_for
+from defi.multi_lending import MultiAccountLendingProtocol
+from defi.oracle import ExternalFeed, Oracle
+from simulation.engine import LiquidationCascade, ScenarioSpec, SwapAForB, build_world, run_scenario
+from simulation.transaction import Transaction
+
+
+def underwater(book, price):
+    return set(np.flatnonzero(book.liquidatable(price)).tolist())
+
+
+def random_book(rng, n, oracle):
+    book = MultiAccountLendingProtocol(oracle, ltv=0.8)
+    collateral = rng.uniform(0, 100, n)
+    collateral[rng.random(n) < 0.05] = 0.0
+    book.open_accounts(collateral)
+    book.borrow_many(np.arange(n), collateral * 0.8 * rng.uniform(0, 1, n))
+    return book
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_index_matches_a_full_scan(seed):
+    rng = np.random.default_rng(seed)
+    feed = ExternalFeed(1.0)
+    book = random_book(rng, 3_000, feed)
+    index = LiquidationIndex(book)
+    assert set(index.underwater()) == underwater(book, 1.0) == set()
+    price = 1.0
+    for _ in range(200):
+        op = rng.integers(5)
+        i = int(rng.integers(len(book)))
+        if op == 0:
+            book.repay_b(i, float(book.debt_b[i]) * rng.random())
+        elif op == 1:
+            book.deposit_collateral_a(i, rng.uniform(0, 10))
+        elif op == 2:
+            book.open_accounts(rng.uniform(0, 10, int(rng.integers(1, 50))), rng.uniform(0, 5))
+        elif op == 3:
+            accounts = rng.integers(len(book), size=200)
+            book.deposit_many(accounts, rng.uniform(0, 1, 200))
+        price = float(price * rng.uniform(0.85, 1.15))
+        # el feed publica el precio: el índice no necesita on_price()
+        feed.set_price(price)
+        now = underwater(book, price)
+        assert set(index.underwater()) == now
+        assert index.price == price
+        assert all(index.is_underwater(i) == (i in now) for i in rng.integers(len(book), size=50).tolist())
+    # cada cruce se reporta una vez, las más hundidas primero
+    crossed = []
+    index.listeners.append(crossed.extend)
+    before = underwater(book, price)
+    returned = index.on_price(price * 0.7)
+    assert crossed == returned and set(returned) == underwater(book, price * 0.7) - before
+    thresholds = [index.liquidation_price(i) for i in returned]
+    assert thresholds == sorted(thresholds, reverse=True)
+    assert index.on_price(price * 0.7) == []
+    index.close()
+    assert index.update not in book.listeners and index.on_price not in feed.listeners
+
+
+def test_index_follows_book_rollbacks():
+    feed = ExternalFeed(1.0)
+    book = MultiAccountLendingProtocol(feed)
+    book.open_accounts([100.0] * 10)
+    index = LiquidationIndex(book)
+    with pytest.raises(ZeroDivisionError):
+        with Transaction([book]):
+            book.borrow_many(range(10), 70.0)
+            book.open_accounts([1.0] * 5, 0.7)
+            feed.set_price(0.5)
+            assert len(index.underwater()) == 15
+            1 / 0
+    assert index.underwater() == []
+    feed.set_price(0.1)
+    assert index.underwater() == []
+
+
+def test_bulk_index_handles_a_large_book():
+    rng = np.random.default_rng(0)
+    book = random_book(rng, 200_000, ExternalFeed(1.0))
+    index = LiquidationIndex(book)
+    for price in (0.9, 0.6, 1.2, 0.3):
+        book.oracle.set_price(price)
+        assert np.array_equal(np.flatnonzero(book.liquidatable(price)), index.underwater())
+
+
+def cascade_book(amm):
+    # cuentas escalonadas: cada venta de colateral baja el precio y arrastra a la siguiente
+    book = MultiAccountLendingProtocol(Oracle(amm), ltv=0.8)
+    book.open_accounts([100.0] * 20)
+    book.borrow_many(range(20), 80.0 * np.linspace(0.80, 0.99, 20))
+    return book
+
+
+def test_cascade_liquidates_accounts_pulled_under_by_earlier_sales():
+    amm = AMM(10_000.0, 10_000.0)
+    book = cascade_book(amm)
+    index = index_for(book)
+    assert index_for(book) is index
+    amm.swap_a_for_b(150.0)  # el oráculo publica: el índice ya ve el precio nuevo
+    first = set(index.underwater())
+    assert first and len(first) < 20
+    report = cascade(index, amm)
+    assert set(report.accounts) > first
+    assert report.end_price < report.start_price == report.liquidations[0].price
+    assert not book.liquidatable().any() and index.underwater() == []
+    sold = sum(l.seized_a for l in report.liquidations)
+    assert amm.a == pytest.approx(10_000.0 + 150.0 * 0.997 + sold * 0.997)
+
+
+def test_liquidation_cascade_action_in_a_scenario():
+    world = build_world()
+    book = MultiAccountLendingProtocol(world.oracle, ltv=0.8)
+    book.open_accounts([100.0] * 20)
+    book.borrow_many(range(20), 80.0 * np.linspace(0.80, 0.99, 20))
+    world.protocol = book.account(0)
+    world.attacker.a = 1_000.0
+    spec = ScenarioSpec("cascade", [SwapAForB(0.15), LiquidationCascade()])
+    result = run_scenario(spec, world=world)
+    assert result.completed and result.steps == 2
+    assert len({l.account for l in world.liquidations}) > 1
+    assert not book.liquidatable().any()
@@ -0,0 +1,70 @@
+"""Oráculo de mediana: los estadísticos incrementales contra ordenar todos los feeds, el rollback
+de su orden y la defensa que lo usa frente al ataque base."""
+import random
+import statistics
+
+import pytest
+
+from defi.amm import AMM
+from defi.oracle import ExternalFeed, MedianOracle, Oracle, TWAPOracle
+from simulation.clock import SimClock
+from simulation.defenses import MedianOracleDefense
+from simulation.engine import ScenarioSpec, run_scenario
+from simulation.transaction import Transaction
+
+
+@pytest.mark.parametrize("trim", [0.0, 0.2])
+def test_median_oracle_matches_sorting_all_feeds(trim):
+    rng = random.Random(7)
+    feeds = [ExternalFeed(rng.uniform(0.5, 2)) for _ in range(6)]
+    amm = AMM(10_000.0, 10_000.0)
+    feeds.append(Oracle(amm))
+    median = MedianOracle(feeds, trim=trim)
+    for _ in range(300):
+        if rng.random() < 0.7:
+            rng.choice(feeds[:-1]).set_price(rng.choice([1.0, rng.uniform(0.5, 2)]))
+        else:
+            amm.swap_a_for_b(rng.uniform(1, 500))
+        values = sorted(feed.price_a_in_b() for feed in feeds)
+        if trim:
+            k = int(len(values) * trim)
+            expected = statistics.fmean(values[k:len(values) - k])
+        else:
+            expected = statistics.median(values)
+        assert median.price_a_in_b() == pytest.approx(expected, rel=1e-12)
+
+
+def test_rollback_restores_the_order_statistics():
+    feeds = [ExternalFeed(p) for p in (1.0, 2.0, 3.0, 4.0, 5.0)]
+    median = MedianOracle(feeds, trim=0.2)
+    assert median.price_a_in_b() == 3.0
+    with pytest.raises(ZeroDivisionError):
+        with Transaction([median]):
+            feeds[0].set_price(10.0)
+            feeds[1].set_price(9.0)
+            assert median.price_a_in_b() == pytest.approx(6.0)
+            1 / 0
+    assert median._sorted == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert median.price_a_in_b() == 3.0
+    # los feeds no se revirtieron: el próximo refresh los relee
+    median.refresh()
+    assert median.price_a_in_b() == pytest.approx(6.0)
+
+
+def test_twap_feeds_are_reread_on_block():
+    clock = SimClock()
+    amm = AMM(10_000.0, 10_000.0)
+    twap = TWAPOracle(amm, clock, window_seconds=60.0, history_seconds=60.0)
+    median = MedianOracle([twap, ExternalFeed(1.0), ExternalFeed(3.0)])
+    amm.swap_b_for_a(5_000.0)
+    assert median.price_a_in_b() == 1.0
+    clock.advance(120.0)
+    # el TWAP no publica: la mediana lo ve recién en el bloque
+    assert median.price_a_in_b() == 1.0
+    median.on_block(10, clock())
+    assert median.price_a_in_b() == pytest.approx(amm.price_a_in_b())
+
+
+def test_median_defense_blocks_the_base_attack():
+    result = run_scenario(ScenarioSpec("median", defense=MedianOracleDefense()))
+    assert result.blocked and not result.completed
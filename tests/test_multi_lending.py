@@ -0,0 +1,106 @@
+"""Lending multi-cuenta: operaciones en bloque contra las escalares, vistas vectorizadas contra el
+cálculo por cuenta y rollback de filas."""
+import random
+
+import numpy as np
+import pytest
+
+from defi.amm import AMM
+from defi.multi_lending import MultiAccountLendingProtocol
+from defi.oracle import ExternalFeed, Oracle
+from simulation.transaction import Transaction
+
+
+def book_with(collateral, price=1.0, ltv=0.7):
+    book = MultiAccountLendingProtocol(ExternalFeed(price), ltv=ltv, capacity=2)
+    book.open_accounts(collateral)
+    return book
+
+
+def test_borrow_many_checks_the_total_of_repeated_accounts():
+    book = book_with([100.0, 100.0])
+    with pytest.raises(AssertionError):
+        book.borrow_many([0, 0, 0], [60.0, 60.0, 60.0])
+    assert book.total_debt_b() == 0.0
+    # repetida pero dentro del margen: se suman como borrows sucesivos
+    book.borrow_many([0, 1, 0], [30.0, 10.0, 35.0])
+    assert list(book.debt_b[:2]) == [65.0, 10.0]
+    assert np.all(book.health_factors() >= 1.0)
+    with pytest.raises(AssertionError):
+        book.borrow_many([0, 0], [3.0, 3.0])
+
+
+def test_borrow_many_matches_sequential_borrows():
+    rng = random.Random(4)
+    collateral = [rng.uniform(0, 1_000) for _ in range(50)]
+    bulk, scalar = book_with(collateral), book_with(collateral)
+    for _ in range(20):
+        accounts = [rng.randrange(50) for _ in range(10)]
+        amounts = [rng.uniform(0, 40) for _ in accounts]
+        try:
+            for i, amount in zip(accounts, amounts):
+                with Transaction([scalar]):
+                    scalar.borrow_b(i, amount)
+            accepted = True
+        except AssertionError:
+            accepted = False
+        try:
+            bulk.borrow_many(accounts, amounts)
+            assert accepted
+        except AssertionError:
+            assert not accepted
+            # deshace lo que la secuencia escalar alcanzó a aplicar
+            scalar.debt_b[:scalar.n] = bulk.debt_b[:bulk.n]
+        assert bulk.debt_b[:bulk.n] == pytest.approx(scalar.debt_b[:scalar.n], rel=1e-12)
+
+
+def test_bulk_operations_validate_their_inputs():
+    book = book_with([100.0, 100.0])
+    with pytest.raises(AssertionError):
+        book.deposit_many([0, 1], [10.0, -1.0])
+    with pytest.raises(AssertionError):
+        book.deposit_many([2], [10.0])
+    with pytest.raises(AssertionError):
+        book.borrow_many([-1], [1.0])
+    assert book.total_collateral_a() == 200.0
+    book.deposit_many([1, 1], 5.0)
+    assert book.collateral_a[1] == 110.0
+
+
+def test_vectorized_views_match_per_account_math():
+    rng = np.random.default_rng(0)
+    collateral = rng.uniform(0, 1_000, 300)
+    book = book_with(collateral, price=1.5, ltv=0.8)
+    book.borrow_many(np.arange(300), collateral * 1.5 * 0.8 * rng.uniform(0, 1, 300))
+    for price in (1.5, 1.2, 0.9):
+        hf = book.health_factors(price)
+        liquidatable = book.liquidatable(price)
+        for i in range(300):
+            debt, value = book.debt_b[i], book.collateral_a[i] * price
+            expected = value * 0.8 / debt if debt > 0 else np.inf
+            assert hf[i] == pytest.approx(expected, rel=1e-12)
+            assert liquidatable[i] == (debt > value * 0.8 + 1e-9)
+
+
+def test_accounts_grow_past_capacity_and_roll_back():
+    amm = AMM(10_000.0, 10_000.0)
+    book = MultiAccountLendingProtocol(Oracle(amm), capacity=1)
+    first = book.open_account(100.0)
+    with pytest.raises(ZeroDivisionError):
+        with Transaction([book]):
+            book.open_accounts([10.0] * 5, 1.0)
+            book.borrow_b(first, 50.0)
+            1 / 0
+    assert len(book) == 1 and book.debt_b[first] == 0.0
+    assert not book.collateral_a[1:].any() and not book.debt_b[1:].any()
+    assert book.open_accounts([10.0] * 5) == range(1, 6) and book.total_collateral_a() == 150.0
+    view = book.account(first)
+    with pytest.raises(ZeroDivisionError):
+        with Transaction([view]):
+            view.borrow_b(70.0)
+            1 / 0
+    assert view.debt_b == 0.0
+    view.borrow_b(70.0)
+    assert view.max_borrowable_b() == 0.0 and not view.liquidatable()
+    amm.swap_a_for_b(1_000.0)
+    assert view.liquidatable()
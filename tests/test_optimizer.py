@@ -0,0 +1,42 @@
+"""Optimizador de ataques contra el óptimo conocido de un mundo chico sin defensas."""
+import math
+
+import pytest
+
+from simulation.analytic import AttackParams
+from simulation.optimizer import optimize_attack
+
+CONFIG = {
+    "AMM_RESERVE_A": 1_000.0,
+    "AMM_RESERVE_B": 2_000.0,
+    "FLASH_POOL_LIQUIDITY_B": 3_000.0,
+    "ATTACKER_INITIAL_A": 100.0,
+}
+
+
+def known_optimum():
+    # el borrow crece con el cuadrado del precio manipulado: préstamo y manipulación al máximo, y
+    # vender toda la A no depositada. Queda d, donde el borrow marginal iguala a la venta marginal:
+    # ltv * H * p1 = k * γ * H / a2²  =>  a2 = sqrt(k * γ / (ltv * p1))
+    p = AttackParams.from_config(CONFIG)
+    gamma, k, loan = 1 - p.amm_fee, p.reserve_a * p.reserve_b, p.flash_liquidity_b
+    b1 = p.reserve_b + gamma * loan
+    a1 = k / b1
+    p1 = b1 * b1 / k
+    held = p.attacker_a + p.reserve_a - a1
+    a2 = math.sqrt(k * gamma / (p.ltv * p1))
+    deposit = 1 - (a2 - a1) / (gamma * held)
+    # se vende toda la A: la ganancia valuada resta la A inicial al precio previo
+    value = p.ltv * deposit * held * p1 + b1 - k / a2 - loan * (1 + p.flash_fee)
+    return loan, deposit, value - p.attacker_a * p.reserve_b / p.reserve_a
+
+
+def test_optimizer_finds_the_known_optimum():
+    loan, deposit, value = known_optimum()
+    out = optimize_attack(config=CONFIG, max_parts=1)
+    assert out.result.completed and out.structures == 1
+    assert out.plan.loan_b == pytest.approx(loan)
+    assert out.plan.swap_fraction == pytest.approx(1.0) and out.plan.sell_fraction == pytest.approx(1.0)
+    assert out.plan.deposit_fraction == pytest.approx(deposit, abs=1e-4)
+    assert out.value_b == pytest.approx(value, rel=1e-8)
+    assert out.value_b <= value * (1 + 1e-12)
@@ -0,0 +1,70 @@
+"""Oráculos: el TWAP incremental contra la integral a fuerza bruta del precio escalonado."""
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.oracle import TWAPOracle
+from simulation.clock import SimClock
+
+
+def brute_twap(segments, now, window):
+    """Promedio del precio escalonado ``segments`` ([(desde, precio)], ordenado) en
+    ``[now - window, now]``, recortado al inicio de la historia."""
+    start = max(now - window, segments[0][0])
+    if now <= start:
+        return segments[-1][1]
+    total = 0.0
+    for (t0, price), (t1, _) in zip(segments, segments[1:] + [(now, None)]):
+        lo, hi = max(t0, start), min(t1, now)
+        if hi > lo:
+            total += price * (hi - lo)
+    return total / (now - start)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_twap_matches_brute_force_integral(seed):
+    rng = random.Random(seed)
+    clock = SimClock(1_000.0)
+    amm = AMM(10_000.0, 10_000.0)
+    window, history = rng.choice([(60.0, 60.0), (300.0, 0.0), (30.0, 600.0)])
+    twap = TWAPOracle(amm, clock, window_seconds=window, history_seconds=history, max_window=1_000.0)
+    segments = [(clock() - history, amm.price_a_in_b())]
+    for _ in range(200):
+        if rng.random() < 0.6:
+            clock.advance(rng.choice([0.0, rng.uniform(0, 5), rng.uniform(0, 120)]))
+        else:
+            if rng.random() < 0.5:
+                amm.swap_a_for_b(rng.uniform(1, 300))
+            else:
+                amm.swap_b_for_a(rng.uniform(1, 300))
+            segments.append((clock(), amm.price_a_in_b()))
+        now = clock()
+        assert twap.price_a_in_b() == pytest.approx(brute_twap(segments, now, window), rel=1e-9)
+        other = rng.uniform(1, 1_000.0)
+        assert twap.price_a_in_b(other) == pytest.approx(brute_twap(segments, now, other), rel=1e-9)
+
+
+def test_twap_compaction_keeps_the_window():
+    clock = SimClock()
+    amm = AMM(10_000.0, 10_000.0)
+    twap = TWAPOracle(amm, clock, window_seconds=10.0)
+    segments = [(0.0, amm.price_a_in_b())]
+    for i in range(5_000):
+        clock.advance(1.0)
+        amm.swap_a_for_b(1.0) if i % 2 else amm.swap_b_for_a(1.0)
+        segments.append((clock(), amm.price_a_in_b()))
+        expected = brute_twap(segments[-20:], clock(), 10.0)
+        assert twap.price_a_in_b() == pytest.approx(expected, rel=1e-9)
+    # la historia vieja se descartó
+    assert twap._n < 5_000
+
+
+def test_twap_ignores_a_same_block_manipulation():
+    clock = SimClock()
+    amm = AMM(10_000.0, 10_000.0)
+    twap = TWAPOracle(amm, clock, window_seconds=300.0, history_seconds=300.0)
+    amm.swap_b_for_a(9_000.0)
+    assert amm.price_a_in_b() > 3
+    assert twap.price_a_in_b() == 1.0
+
@@ -0,0 +1,91 @@
+"""Grafo de pools: la detección incremental de arbitraje (SPFA sobre los pools tocados) contra un
+Bellman-Ford completo desde cero."""
+import math
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.pools import PoolGraph
+
+
+def bellman_ford_has_cycle(graph, eps=1e-12):
+    """Ciclo negativo con pesos ``-log(tasa)`` sobre todas las aristas, desde potenciales cero."""
+    dist = {token: 0.0 for token in graph.tokens}
+    edges = [(u, v, pool) for u in graph.adjacency for pool, v in graph.adjacency[u]]
+    for _ in range(len(dist)):
+        changed = False
+        for u, v, pool in edges:
+            candidate = dist[u] - math.log(graph.rate(pool, u))
+            if candidate < dist[v] - eps:
+                dist[v] = candidate
+                changed = True
+        if not changed:
+            return False
+    return True
+
+
+def random_graph(rng, tokens=5, pools=9, noise=0.0):
+    prices = {f"T{i}": rng.uniform(0.5, 2.0) for i in range(tokens)}
+    names = list(prices)
+    graph = PoolGraph()
+    # un árbol que conecta todos los tokens y pools extra al azar (incluidos pares repetidos)
+    pairs = [(names[i], names[rng.randrange(i)]) for i in range(1, tokens)]
+    pairs += [tuple(rng.sample(names, 2)) for _ in range(pools - len(pairs))]
+    for x, y in pairs:
+        depth = rng.uniform(1_000, 10_000)
+        skew = 1 + rng.uniform(-noise, noise)
+        graph.add_pool(x, y, AMM(depth, depth * prices[x] / prices[y] * skew, rng.choice([0.0005, 0.003])))
+    return graph
+
+
+def check_cycle(graph, found):
+    product, cycle = found
+    assert product > 1
+    assert product == pytest.approx(math.prod(graph.rate(pool, t) for pool, t, _ in cycle))
+    # cada salto sale del token donde terminó el anterior y el último vuelve al primero
+    for (_, _, out), (_, nxt, _) in zip(cycle, cycle[1:] + cycle[:1]):
+        assert out == nxt
+    for pool, token_in, token_out in cycle:
+        assert set(graph.pairs[pool]) == {token_in, token_out}
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_incremental_arbitrage_matches_bellman_ford(seed):
+    rng = random.Random(seed)
+    graph = random_graph(rng, noise=rng.choice([0.0, 0.0, 0.002, 0.05]))
+    # swaps chicos dejan casi todo el tiempo el mercado sin arbitraje; grandes, casi nunca
+    size = rng.choice([5.0, 300.0])
+    for _ in range(30):
+        found = graph.find_arbitrage()
+        assert (found is not None) == bellman_ford_has_cycle(graph)
+        if found is not None:
+            check_cycle(graph, found)
+            if rng.random() < 0.5:
+                # ejecutar el ciclo con poco monto lo achica (y toca sus pools)
+                graph.execute(found[1], rng.uniform(1, 50))
+                continue
+        pool = rng.randrange(len(graph.pools))
+        token_in = rng.choice(graph.pairs[pool])
+        graph.swap(pool, token_in, rng.uniform(1, size))
+
+
+def test_no_arbitrage_in_a_consistent_market():
+    graph = random_graph(random.Random(1), tokens=6, pools=12)
+    assert graph.find_arbitrage() is None
+    assert not bellman_ford_has_cycle(graph)
+
+
+def test_best_route_quote_matches_its_path():
+    rng = random.Random(3)
+    graph = random_graph(rng, tokens=5, pools=10, noise=0.02)
+    for _ in range(20):
+        x, y = rng.sample(list(graph.tokens), 2)
+        amount = rng.uniform(1, 500)
+        out, path = graph.best_route(x, y, amount)
+        assert path and path[0][1] == x and path[-1][2] == y
+        assert len({pool for pool, _, _ in path}) == len(path)
+        assert out == graph.quote_path(path, amount)
+        # al menos tan buena como cualquier salto directo
+        direct = [graph.quote(pool, x, amount) for pool in graph.pools_between(x, y)]
+        assert out >= max(direct, default=0.0)
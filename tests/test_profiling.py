@@ -0,0 +1,45 @@
+"""Profiler: instrumenta los hot paths de un escenario completo y los restaura al salir."""
+import json
+
+import numpy as np
+
+from defi import liquidation
+from defi.multi_lending import MultiAccountLendingProtocol
+from defi.oracle import MedianOracle
+from simulation.defenses import MedianOracleDefense
+from simulation.engine import LiquidationCascade, ScenarioSpec, SwapAForB, build_world, run_scenario
+from utils.profiling import Profiler, default_targets
+
+
+def test_profiler_instruments_a_scenario_and_restores_the_targets():
+    originals = {(target, m): target.__dict__[m] for target, methods in default_targets().items() for m in methods}
+    profiler = Profiler()
+    with profiler.instrument():
+        # la mediana no se mueve dentro del bloque: el ataque base la ejercita y la cascada corre
+        # sobre el spot
+        assert run_scenario(ScenarioSpec("median", defense=MedianOracleDefense()), profiler=profiler).blocked
+        world = build_world()
+        book = MultiAccountLendingProtocol(world.oracle, ltv=0.8)
+        book.open_accounts([100.0] * 20)
+        book.borrow_many(range(20), 80.0 * np.linspace(0.80, 0.99, 20))
+        world.protocol = book.account(0)
+        world.attacker.a = 1_000.0
+        spec = ScenarioSpec("profiled", [SwapAForB(0.15), LiquidationCascade()])
+        result = run_scenario(spec, profiler=profiler, world=world)
+    assert result.completed
+    assert all(target.__dict__[m] is original for (target, m), original in originals.items())
+    timers = profiler.stats()["timers"]
+    for key in ("AMM.swap_a_for_b", "MedianOracle.price_a_in_b", "MedianOracle._set",
+                "MultiAccountLendingProtocol.borrow_many", "MultiAccountLendingProtocol.repay_b",
+                "LiquidationIndex.underwater", "defi.liquidation.cascade", "defi.liquidation.liquidate", "defi.liquidation._thresholds",
+                "tx.median.snapshot", "tx.profiled.snapshot", "tx.TX-Liquidations.snapshot"):
+        assert timers[key]["calls"] > 0, key
+    assert timers["defi.liquidation.liquidate"]["calls"] == len(world.liquidations)
+    assert profiler.stats()["counters"]["tx.TX-Liquidations.commits"] == 1
+    assert json.loads(profiler.to_json())["timers"].keys() == timers.keys()
+    assert "MedianOracle.price_a_in_b" in profiler.table()
+    # fuera del bloque nada queda envuelto
+    profiler.reset()
+    MedianOracle([world.amm]).price_a_in_b()
+    liquidation.index_for(book).underwater()
+    assert not profiler.stats()["timers"]
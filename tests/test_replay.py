@@ -0,0 +1,53 @@
+"""Replay de un log chico: el CSV y su binario dan el mismo reporte, y los borrows pasan por
+``borrow_b`` de cada defensa."""
+import numpy as np
+
+from simulation.replay import BORROW, read_binary, read_csv, replay, write_binary
+
+ROWS = [
+    # timestamp, kind, amount_a, amount_b
+    (1_000.0, "swap_a_for_b", 10.0, 0.0),
+    (1_003.0, "swap_b_for_a", 0.0, 25.0),
+    (1_015.0, "add_liquidity", 500.0, 500.0),
+    (1_020.0, "borrow", 100.0, 50.0),
+    (1_030.0, "swap_a_for_b", 0.0, 0.0),      # monto inválido: falla
+    (1_040.0, "remove_liquidity", 100.0, 100.0),
+    # manipulación y borrow en el mismo bloque: el spot sube y el préstamo queda sobre el LTV real
+    (1_050.0, "swap_b_for_a", 0.0, 4_000.0),
+    (1_050.0, "borrow", 100.0, 120.0),
+    (1_200.0, "swap_a_for_b", 2_000.0, 0.0),
+    (1_260.0, str(BORROW), 10.0, 5.0),
+]
+
+
+def write_csv(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("timestamp,kind,amount_a,amount_b\n")
+        for row in ROWS:
+            f.write(",".join(str(value) for value in row) + "\n")
+
+
+def test_csv_and_binary_replays_are_identical(tmp_path):
+    csv_path, bin_path = tmp_path / "events.csv", tmp_path / "events.bin"
+    write_csv(csv_path)
+    assert write_binary(read_csv(str(csv_path)), str(bin_path)) == len(ROWS)
+    from_csv = np.concatenate(list(read_csv(str(csv_path), chunk_rows=3)))
+    assert np.array_equal(from_csv, np.concatenate(list(read_binary(str(bin_path), chunk_rows=4))))
+    report = replay(str(csv_path))
+    assert replay(str(bin_path)) == report
+    # el tamaño de bloque de lectura no cambia el resultado
+    assert replay(str(bin_path), chunk_rows=2) == replay(str(csv_path), chunk_rows=3) == report
+    assert (report.events, report.swaps, report.liquidity_events, report.borrows, report.failed) == (10, 4, 2, 3, 1)
+
+
+def test_borrows_go_through_each_defense(tmp_path):
+    csv_path = tmp_path / "events.csv"
+    write_csv(csv_path)
+    defenses = replay(str(csv_path)).defenses
+    # sin defensa el spot manipulado respalda el préstamo; el breaker pausa y la TWAP no se movió
+    assert defenses["none"].rejected_borrows == 0
+    assert defenses["none"].borrowed_b == 175.0
+    assert defenses["circuit"].rejected_borrows == 1 and defenses["circuit"].paused_events
+    assert defenses["twap"].rejected_borrows == defenses["median"].rejected_borrows == 1
+    for stats in defenses.values():
+        assert stats.borrowed_b <= 175.0
@@ -0,0 +1,81 @@
+"""StableSwap: solvers de Newton contra el invariante, cotizaciones en bloque contra las
+escalares y el pool contra el AMM x*y=k."""
+import random
+
+import numpy as np
+import pytest
+
+from defi.amm import AMM
+from defi.stableswap import StableSwapAMM, get_d, get_y
+from simulation.engine import ScenarioSpec, run_scenario
+
+
+def invariant_gap(x, y, d, amp):
+    ann = 4 * amp
+    return (ann * (x + y) + d - ann * d - d ** 3 / (4 * x * y)) / d
+
+
+@pytest.mark.parametrize("amp", [1.0, 100.0, 5_000.0])
+def test_get_d_and_get_y_solve_the_invariant(amp):
+    rng = random.Random(int(amp))
+    for _ in range(50):
+        x, y = rng.uniform(1, 1e6), rng.uniform(1, 1e6)
+        d = get_d(x, y, amp)
+        assert abs(invariant_gap(x, y, d, amp)) < 1e-10
+        new_x = x * rng.uniform(0.5, 2.0)
+        assert abs(invariant_gap(new_x, get_y(new_x, d, amp), d, amp)) < 1e-10
+        # el punto de partida solo cambia las iteraciones, no el resultado
+        assert get_d(x, y, amp, d0=d * 1.01) == pytest.approx(d, rel=1e-12)
+
+
+def test_stableswap_batched_quotes_match_scalar_quotes():
+    pool = StableSwapAMM(1_000_000.0, 1_200_000.0, amp=200.0)
+    amounts = np.array([1.0, 10.0, 1_000.0, 100_000.0, 900_000.0])
+    batched = pool.quote_a_for_b(amounts)
+    for amount, out in zip(amounts, batched):
+        assert out == pytest.approx(pool.quote_a_for_b(float(amount)), rel=1e-12)
+    batched = pool.quote_b_for_a(amounts)
+    for amount, out in zip(amounts, batched):
+        assert out == pytest.approx(pool.quote_b_for_a(float(amount)), rel=1e-12)
+
+
+def test_stableswap_swaps_match_quotes_and_keep_the_fee_in_the_pool():
+    rng = random.Random(2)
+    pool = StableSwapAMM(1_000_000.0, 1_000_000.0, fee=0.0004, amp=100.0)
+    for _ in range(100):
+        d = pool.d
+        if rng.random() < 0.5:
+            dx = rng.uniform(1, 100_000)
+            quoted = pool.quote_a_for_b(dx)
+            assert pool.swap_a_for_b(dx) == quoted
+        else:
+            dy = rng.uniform(1, 100_000)
+            quoted = pool.quote_b_for_a(dy)
+            assert pool.swap_b_for_a(dy) == quoted
+        assert pool.d >= d
+        assert pool.d == pytest.approx(get_d(pool.a, pool.b, pool.amp), rel=1e-12)
+
+
+def test_stableswap_exact_out_and_impact_bounds():
+    pool = StableSwapAMM(1_000_000.0, 800_000.0, amp=50.0)
+    for dy in (1.0, 5_000.0, 400_000.0):
+        assert pool.quote_a_for_b(pool.amount_in_a_for_b(dy)) == pytest.approx(dy, rel=1e-9)
+        assert pool.quote_b_for_a(pool.amount_in_b_for_a(dy)) == pytest.approx(dy, rel=1e-9)
+    for impact in (0.001, 0.05, 0.5):
+        dx = pool.max_a_in_for_impact(impact)
+        assert pool.price_impact_a_for_b(dx) <= impact
+        assert pool.price_impact_a_for_b(dx * (1 + 1e-6)) > impact
+        dy = pool.max_b_in_for_impact(impact)
+        assert pool.price_impact_b_for_a(dy) <= impact
+
+
+def test_stableswap_is_flatter_than_constant_product_near_the_peg():
+    stable = StableSwapAMM(10_000.0, 10_000.0, fee=0.003, amp=100.0)
+    cpmm = AMM(10_000.0, 10_000.0, fee=0.003)
+    assert stable.price_a_in_b() == pytest.approx(1.0)
+    assert stable.quote_b_for_a(5_000.0) > cpmm.quote_b_for_a(5_000.0)
+    # con la misma liquidez el mismo préstamo mueve menos el precio: el ataque rinde menos
+    stable_attack = run_scenario(ScenarioSpec("stableswap", amm_factory=StableSwapAMM.factory(100.0)))
+    cpmm_attack = run_scenario(ScenarioSpec("cpmm"))
+    assert stable_attack.completed
+    assert 0 < stable_attack.profit_b < cpmm_attack.profit_b
@@ -0,0 +1,60 @@
+"""Fronteras de las defensas: el valor devuelto bloquea y uno apenas más laxo ya no."""
+import pytest
+
+from simulation import analytic
+from simulation.analytic import AttackParams
+from simulation.optimizer import AttackPlan
+from simulation.thresholds import SEARCH, ThresholdFinder, boundary_table
+
+
+def looser(defense, value, rtol):
+    higher_is_stricter = SEARCH[defense][2]
+    return value / (1 + 2 * rtol) if higher_is_stricter else value * (1 + 2 * rtol)
+
+
+@pytest.mark.parametrize("defense", ["circuit", "slippage", "per_tx_cap"])
+@pytest.mark.parametrize("depth", [0.5, 1.0, 3.0])
+def test_boundary_blocks_and_a_looser_value_does_not(defense, depth):
+    finder = ThresholdFinder()
+    row = finder.boundary(defense, depth)
+    assert row.profitable and not row.always
+    assert finder.blocked(defense, row.value, depth)
+    assert not finder.blocked(defense, looser(defense, row.value, finder.rtol), depth)
+
+
+def test_twap_boundary_with_a_waiting_attack():
+    finder = ThresholdFinder(AttackPlan(wait_blocks=2))
+    row = finder.boundary("twap")
+    assert row.profitable and not row.always
+    assert finder.blocked("twap", row.value)
+    assert not finder.blocked("twap", looser("twap", row.value, finder.rtol))
+    # sin esperar bloques el TWAP bloquea con cualquier ventana
+    assert ThresholdFinder().boundary("twap").always
+
+
+def test_unprofitable_attack_has_no_threshold():
+    params = AttackParams.from_config()
+    ltv = analytic.break_even_ltv(params)
+    finder = ThresholdFinder()
+    below = finder.boundary("circuit", ltv=ltv * 0.9)
+    assert not below.profitable and below.value is None and not below.always
+    above = finder.boundary("circuit", ltv=ltv * 1.1)
+    assert above.profitable and above.value is not None
+
+
+def test_repeated_searches_are_memoized():
+    finder = ThresholdFinder()
+    first = finder.boundary("slippage")
+    again = finder.boundary("slippage")
+    assert again.evaluations == 0 and again.value == first.value
+    assert finder.cache_hits > 0
+
+
+def test_boundary_table_covers_the_grid_and_reuses_neighbours():
+    finder = ThresholdFinder()
+    rows = boundary_table(["circuit"], depths=(1.0, 1.1), ltvs=(0.6, 0.7), finder=finder)
+    assert [(r.depth, r.ltv) for r in rows] == [(1.0, 0.6), (1.0, 0.7), (1.1, 0.6), (1.1, 0.7)]
+    cold = ThresholdFinder().boundary("circuit", 1.1, 0.7)
+    assert rows[-1].value == pytest.approx(cold.value, rel=3 * finder.rtol)
+    # arrancar desde la frontera vecina ahorra corridas
+    assert rows[-1].evaluations <= cold.evaluations
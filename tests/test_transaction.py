@@ -0,0 +1,183 @@
+"""Transaction: el modo journal tiene que dejar exactamente el mismo estado que el deepcopy."""
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.models import Actor
+from simulation.transaction import Transaction, TransactionError
+
+
+class Boom(Exception):
+    pass
+
+
+def state(amm, actor):
+    return (amm.a, amm.b, amm.fee, actor.a, actor.b, getattr(actor, "extra", None))
+
+
+def run_script(mode, seed, steps=60):
+    """Secuencia aleatoria (determinista por ``seed``) de swaps, savepoints, rollbacks, releases y
+    transacciones anidadas que commitean o fallan; devuelve el estado tras cada operación."""
+    rng = random.Random(seed)
+    amm = AMM(10_000.0, 10_000.0)
+    actor = Actor(a=1_000.0, b=500.0)
+    trace = []
+    outer_fails = rng.random() < 0.5
+    try:
+        with Transaction([amm, actor], name="outer", snapshot=mode) as tx:
+            open_savepoints = []
+            for _ in range(steps):
+                op = rng.choice(("swap", "swap", "attr", "savepoint", "rollback_to", "release", "nested"))
+                if op == "swap":
+                    dy = amm.swap_b_for_a(rng.uniform(1, 500))
+                    actor.a += dy
+                elif op == "attr":
+                    if hasattr(actor, "extra") and rng.random() < 0.3:
+                        del actor.extra
+                    else:
+                        actor.extra = rng.random()
+                elif op == "savepoint":
+                    open_savepoints.append(tx.savepoint())
+                elif op == "rollback_to" and open_savepoints:
+                    i = rng.randrange(len(open_savepoints))
+                    tx.rollback_to(open_savepoints[i])
+                    del open_savepoints[i + 1:]
+                elif op == "release" and open_savepoints:
+                    i = rng.randrange(len(open_savepoints))
+                    tx.release(open_savepoints[i])
+                    del open_savepoints[i:]
+                elif op == "nested":
+                    fail = rng.random() < 0.5
+                    try:
+                        with Transaction([amm, actor], name="inner", snapshot=mode):
+                            actor.b += rng.uniform(1, 10)
+                            amm.swap_a_for_b(rng.uniform(1, 100))
+                            if fail:
+                                raise Boom()
+                    except Boom:
+                        pass
+                trace.append(state(amm, actor))
+            if outer_fails:
+                raise Boom()
+    except Boom:
+        pass
+    trace.append(state(amm, actor))
+    return trace, outer_fails
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_journal_matches_deepcopy(seed):
+    journal, outer_fails = run_script("journal", seed)
+    deepcopied, _ = run_script("deepcopy", seed)
+    assert journal == deepcopied
+    if outer_fails:
+        assert journal[-1] == (10_000.0, 10_000.0, 0.003, 1_000.0, 500.0, None)
+
+
+def test_rollback_restores_only_the_inner_transaction():
+    amm, actor = AMM(100.0, 100.0), Actor(a=1.0)
+    with Transaction([amm, actor]):
+        amm.swap_a_for_b(10.0)
+        after_outer = (amm.a, amm.b)
+        with pytest.raises(Boom):
+            with Transaction([amm, actor]):
+                amm.swap_a_for_b(10.0)
+                actor.a = 0.0
+                raise Boom()
+        assert (amm.a, amm.b) == after_outer
+        assert actor.a == 1.0
+    assert (amm.a, amm.b) == after_outer
+    assert type(amm) is AMM and type(actor) is Actor
+
+
+def test_outer_rollback_undoes_objects_enlisted_by_inner_transactions():
+    amm, actor = AMM(100.0, 100.0), Actor(a=1.0)
+    with pytest.raises(Boom):
+        with Transaction([amm]):
+            with Transaction([actor]):
+                actor.a = 5.0
+            raise Boom()
+    assert actor.a == 1.0
+
+
+def test_post_check_failure_rolls_back():
+    amm = AMM(100.0, 100.0)
+    with pytest.raises(TransactionError):
+        with Transaction([amm], post_check=lambda: False):
+            amm.swap_a_for_b(10.0)
+    assert (amm.a, amm.b) == (100.0, 100.0)
+
+
+@pytest.mark.parametrize("mode", ["journal", "deepcopy"])
+def test_savepoint_can_be_rolled_back_to_repeatedly(mode):
+    actor = Actor(a=1.0)
+    with Transaction([actor], snapshot=mode) as tx:
+        sp = tx.savepoint()
+        for value in (2.0, 3.0):
+            actor.a = value
+            tx.rollback_to(sp)
+            assert actor.a == 1.0
+
+
+@pytest.mark.parametrize("mode", ["journal", "deepcopy"])
+def test_stale_savepoints_raise_transaction_error(mode):
+    actor = Actor(a=1.0)
+    with Transaction([actor], snapshot=mode) as tx:
+        first = tx.savepoint()
+        second = tx.savepoint()
+        tx.rollback_to(first)
+        # rollback_to(first) descarta los savepoints posteriores
+        with pytest.raises(TransactionError):
+            tx.rollback_to(second)
+        tx.release(first)
+        with pytest.raises(TransactionError):
+            tx.release(first)
+        with pytest.raises(TransactionError):
+            tx.rollback_to(first)
+        with pytest.raises(TransactionError):
+            tx.rollback_to(0)
+
+
+def test_inner_transaction_cannot_use_outer_savepoints():
+    actor = Actor(a=1.0)
+    with Transaction([actor]) as outer:
+        sp = outer.savepoint()
+        with Transaction([actor]) as inner:
+            with pytest.raises(TransactionError):
+                inner.rollback_to(sp)
+
+
+def test_enlisted_objects_keep_their_type_and_equality():
+    amm, actor = AMM(1_000.0, 1_000.0), Actor(a=1.0, b=2.0)
+    with Transaction([amm, actor]):
+        assert type(amm) is AMM and type(actor) is Actor
+        assert actor == Actor(a=1.0, b=2.0) and Actor(a=1.0, b=2.0) == actor
+        actor.b = 5.0
+        assert actor != Actor(a=1.0, b=2.0)
+        with Transaction([actor]):
+            assert actor == Actor(a=1.0, b=5.0)
+    # objetos no enlistados de la misma clase no pasan por el log
+    other = Actor()
+    with pytest.raises(ZeroDivisionError):
+        with Transaction([actor]):
+            other.a = 3.0
+            actor.a = 3.0
+            1 / 0
+    assert (actor, other) == (Actor(a=1.0, b=5.0), Actor(a=3.0))
+
+
+def test_transactions_must_exit_in_lifo_order():
+    amm, actor = AMM(1_000.0, 1_000.0), Actor()
+    outer, inner = Transaction([amm], name="outer"), Transaction([actor], name="inner")
+    outer.__enter__()
+    inner.__enter__()
+    actor.a = 1.0
+    with pytest.raises(TransactionError, match="inner"):
+        outer.__exit__(None, None, None)
+    # el cierre fuera de orden no tocó nada: las dos siguen abiertas y se cierran bien
+    assert inner.nested and actor.a == 1.0
+    inner.__exit__(None, None, None)
+    amm.swap_b_for_a(10.0)
+    outer.__exit__(ZeroDivisionError, ZeroDivisionError(), None)
+    assert (amm.a, amm.b, actor.a) == (1_000.0, 1_000.0, 0.0)
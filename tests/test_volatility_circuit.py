@@ -0,0 +1,75 @@
+"""Circuit breaker por volatilidad: dispara con una manipulación dentro del bloque, se rearma al
+vencer el cooldown y el piso ``min_rel_std`` evita falsos disparos sobre un historial plano."""
+import random
+
+import pytest
+
+from defi.amm import AMM
+from defi.lending import CircuitBreakerError, LendingProtocolWithVolatilityCircuit
+from defi.oracle import ExternalFeed, Oracle
+from simulation.clock import SimClock
+from simulation.defenses import VolatilityCircuitDefense
+from simulation.engine import ScenarioSpec, run_scenario
+
+
+def noisy_market(seed=0, blocks=100):
+    # un bloque cada 12 s con swaps chicos en los dos sentidos
+    rng = random.Random(seed)
+    clock = SimClock()
+    amm = AMM(10_000.0, 10_000.0)
+    protocol = LendingProtocolWithVolatilityCircuit(Oracle(amm), clock=clock, windows=(300.0, 3_600.0))
+    protocol.deposit_collateral_a(1_000.0)
+    for _ in range(blocks):
+        clock.advance(12.0)
+        amm.swap_b_for_a(rng.uniform(1, 30)) if rng.random() < 0.5 else amm.swap_a_for_b(rng.uniform(1, 30))
+    return clock, amm, protocol
+
+
+def test_noise_does_not_trip_and_an_in_block_manipulation_does():
+    clock, amm, protocol = noisy_market()
+    assert not protocol.paused()
+    protocol.borrow_b(1.0)
+    received = amm.swap_b_for_a(2_000.0)  # mismo bloque: el precio no tuvo tiempo de entrar en las medias
+    assert protocol.paused()
+    with pytest.raises(CircuitBreakerError):
+        protocol.borrow_b(1.0)
+    # revertir el precio no rearma el breaker: queda pausado hasta el cooldown
+    amm.swap_a_for_b(received)
+    assert protocol.paused()
+    assert protocol.debt_b == 1.0
+
+
+def test_cooldown_expires():
+    clock, amm, protocol = noisy_market()
+    received = amm.swap_b_for_a(2_000.0)
+    amm.swap_a_for_b(received)
+    assert protocol.cooldown == 300.0
+    tripped_at = clock()
+    clock.advance(299.0)
+    assert protocol.paused()
+    clock.advance(2.0)
+    assert clock() - tripped_at > protocol.cooldown and not protocol.paused()
+    protocol.borrow_b(1.0)
+
+
+def test_scenario_reverts_at_the_borrow():
+    result = run_scenario(ScenarioSpec("volatility", defense=VolatilityCircuitDefense()))
+    assert not result.completed and result.reverted_at == "TX-Step3"
+    assert "volatilidad" in result.reason
+
+
+@pytest.mark.parametrize("min_rel_std, trips", [(0.005, False), (0.0, True)])
+def test_relative_std_floor_on_flat_history(min_rel_std, trips):
+    clock = SimClock()
+    feed = ExternalFeed(100.0)
+    protocol = LendingProtocolWithVolatilityCircuit(feed, clock=clock, min_rel_std=min_rel_std)
+    clock.advance(3_600.0)
+    protocol.on_block(300, clock())
+    assert protocol.variances == (0.0,)
+    # 0.1% sobre un precio que nunca se movió: ruido con el piso, 4 sigmas sin él
+    feed.set_price(100.1)
+    assert protocol.paused() is trips
+    # con el piso hace falta moverse más de max_sigma * min_rel_std para disparar
+    if not trips:
+        feed.set_price(100.0 * (1 + 4 * min_rel_std) * 1.01)
+        assert protocol.paused()
@@ -1,10 +1,15 @@
 """Funciónes de presentación (sin lógica de negocio)."""
-def pretty(title: str, amm, pool, prot, attacker):
+from defi.fixedpoint import FLOAT
+
+
+def pretty(title: str, amm, pool, prot, attacker, num=FLOAT):
+    # ``num`` es el backend de los montos (defi.fixedpoint): los WAD se muestran como decimales
+    f = num.to_float
     print(f"\n== {title} ==")
-    print(f"AMM reserves: A={amm.a:.2f}, B={amm.b:.2f} | spot B per A = {amm.price_a_in_b():.4f}")
-    print(f"Flash pool B liquidity: {pool.b:.2f}")
-    print(f"Protocol: collateral A={prot.collateral_a:.2f}, debt B={prot.debt_b:.2f}, liquidatable={prot.liquidatable()}")
-    print(f"Attacker: A={attacker.a:.2f}, B={attacker.b:.2f}")
+    print(f"AMM reserves: A={f(amm.a):.2f}, B={f(amm.b):.2f} | spot B per A = {f(amm.price_a_in_b()):.4f}")
+    print(f"Flash pool B liquidity: {f(pool.b):.2f}")
+    print(f"Protocol: collateral A={f(prot.collateral_a):.2f}, debt B={f(prot.debt_b):.2f}, liquidatable={prot.liquidatable()}")
+    print(f"Attacker: A={f(attacker.a):.2f}, B={f(attacker.b):.2f}")
 
 
 # --- Ejemplos de checks (comentados) que podrías usar en production ---
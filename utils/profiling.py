@@ -0,0 +1,157 @@
+"""Instrumentación opt-in de los hot paths (sin costo cuando no se usa).
+
+``Profiler`` acumula contadores y timers. Se engancha de dos formas:
+
+- como ``logger`` de ``Transaction`` (o ``run_scenario(..., profiler=...)``): tiempos de snapshot,
+  checks, ``on_commit`` y rollback, bytes snapshoteados y cantidad de commits/rollbacks por nombre
+  de transacción;
+- con ``with profiler.instrument():`` envuelve temporalmente los métodos de los componentes de
+  ``defi`` (swaps por pool, lecturas de oráculos, borrow...) y los restaura al salir.
+
+Al final, ``to_json()`` o ``table()`` exportan las estadísticas.
+"""
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Profiler:
+    def __init__(self, echo=None):
+        # echo: callable opcional para los mensajes recibidos como logger
+        self.echo = echo
+        self.counters = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def __call__(self, message: str):
+        # sigue sirviendo como logger de texto de Transaction
+        if self.echo is not None:
+            self.echo(message)
+
+    def count(self, key: str, n: int = 1):
+        self.counters[key] += n
+
+    def add_time(self, key: str, seconds: float):
+        self.calls[key] += 1
+        self.seconds[key] += seconds
+
+    @contextmanager
+    def timer(self, key: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(key, time.perf_counter() - start)
+
+    def reset(self):
+        self.counters.clear()
+        self.calls.clear()
+        self.seconds.clear()
+
+    @contextmanager
+    def instrument(self, targets=None):
+        """Envuelve los métodos de ``targets`` ({clase o módulo: (método, ...)}) mientras dure el
+        bloque."""
+        if targets is None:
+            targets = default_targets()
+        patched = []
+        try:
+            for cls, methods in targets.items():
+                for method in methods:
+                    if method in cls.__dict__:
+                        original = cls.__dict__[method]
+                        setattr(cls, method, self._wrap(cls, method, original))
+                        patched.append((cls, method, original))
+            yield self
+        finally:
+            for cls, method, original in reversed(patched):
+                setattr(cls, method, original)
+
+    def _wrap(self, cls, method, original):
+        key = f"{getattr(cls, '__qualname__', cls.__name__)}.{method}"
+        per_instance = method in PER_INSTANCE_METHODS
+        profiler = self
+
+        def wrapper(obj, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(obj, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                profiler.add_time(key, elapsed)
+                if per_instance:
+                    profiler.count(f"{key}[{_label(obj)}]")
+        wrapper.__name__ = method
+        wrapper.__wrapped__ = original
+        return wrapper
+
+    # --- exportación ---
+    def stats(self) -> dict:
+        timers = {
+            key: {
+                "calls": self.calls[key],
+                "total_s": self.seconds[key],
+                "mean_us": self.seconds[key] / self.calls[key] * 1e6,
+            }
+            for key in sorted(self.calls)
+        }
+        return {"counters": dict(sorted(self.counters.items())), "timers": timers}
+
+    def to_json(self, path: str = None) -> str:
+        text = json.dumps(self.stats(), indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def table(self) -> str:
+        stats = self.stats()
+        lines = [f"{'métrica':48} {'llamadas':>10} {'total ms':>10} {'media us':>10}"]
+        for key, t in stats["timers"].items():
+            lines.append(f"{key:48} {t['calls']:10d} {t['total_s'] * 1e3:10.3f} {t['mean_us']:10.2f}")
+        for key, value in stats["counters"].items():
+            lines.append(f"{key:48} {value:10d}")
+        return "\n".join(lines)
+
+
+# métodos cuyo contador se desagrega por instancia (p. ej. swaps por pool)
+PER_INSTANCE_METHODS = {"swap_a_for_b", "swap_b_for_a"}
+
+
+def default_targets() -> dict:
+    # los suscriptores ya ligados (``Listeners``) no pasan por el método envuelto: se mide lo que
+    # ellos llaman (p. ej. ``MedianOracle._set``) y no el callback mismo
+    from defi import liquidation
+    from defi.amm import AMM
+    from defi.flashloan import FlashLoanPool
+    from defi.lending import LendingProtocol, LendingProtocolWithCircuit
+    from defi.liquidation import LiquidationIndex
+    from defi.multi_lending import MultiAccountLendingProtocol
+    from defi.oracle import MedianOracle, Oracle, TWAPOracle
+    return {
+        AMM: ("swap_a_for_b", "swap_b_for_a"),
+        Oracle: ("price_a_in_b",),
+        TWAPOracle: ("price_a_in_b", "update"),
+        MedianOracle: ("price_a_in_b", "refresh", "_set"),
+        LendingProtocol: ("deposit_collateral_a", "max_borrowable_b", "borrow_b"),
+        LendingProtocolWithCircuit: ("borrow_b",),
+        MultiAccountLendingProtocol: ("borrow_b", "repay_b", "seize_collateral_a", "deposit_many",
+                                      "borrow_many", "health_factors", "liquidatable"),
+        LiquidationIndex: ("underwater", "_resort"),
+        # funciones del módulo: se buscan en el módulo en cada llamada (``_thresholds`` es el
+        # recálculo en bloque de ``LiquidationIndex.update``)
+        liquidation: ("cascade", "liquidate", "_thresholds"),
+        FlashLoanPool: ("borrow", "repay"),
+    }
+
+
+def snapshot_size(values) -> int:
+    """Tamaño aproximado (superficial) en bytes de los valores snapshoteados."""
+    return sum(sys.getsizeof(v) for v in values)
+
+
+def _label(obj) -> str:
+    name = getattr(obj, "name", None)
+    return name if isinstance(name, str) else f"0x{id(obj):x}"